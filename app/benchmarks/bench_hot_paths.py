@@ -0,0 +1,186 @@
+"""
+Micro-benchmarks of the per-request hot paths, run with pytest-benchmark.
+
+Covers the schema handling of ``Stub.call`` (with a canned proxy response), the
+memory store (``save_generation`` and ``find_similar_prompts`` at several corpus
+sizes), the system prompt assembly of ``enhance_prompt`` and the response parsing
+of both LLM layers (with a canned Ollama response).
+
+Benchmarks whose dependencies are not installed are skipped. The memory store
+benchmarks run on a temporary database.
+
+Usage (from the ``app`` directory):
+    python -m pytest benchmarks/bench_hot_paths.py --benchmark-autosave     # record a baseline
+    python -m pytest benchmarks/bench_hot_paths.py --benchmark-compare \\
+        --benchmark-compare-fail=min:25%                                    # fail on regressions
+    python -m pytest benchmarks/bench_hot_paths.py -k parse                 # only the parsing cases
+    BENCH_CORPUS_SIZES=100,1000,10000 python -m pytest benchmarks/bench_hot_paths.py -k memory
+
+Baselines are stored under ``.benchmarks/`` per machine, since timings from
+different hardware cannot be compared.
+"""
+import json
+import os
+
+import pytest
+
+from benchmarks.canned_llm import ENHANCED_JSON, INTENT_RESPONSES, LLM_RESPONSES, canned_chat, history_of
+
+# Memory corpus sizes the memory store benchmarks run at
+CORPUS_SIZES = [int(size) for size in os.getenv("BENCH_CORPUS_SIZES", "100,1000").split(",") if size]
+
+# Session history lengths the prompt assembly benchmarks run at
+HISTORY_SIZES = [2, 10, 50]
+
+os.environ.setdefault("TRACE_EXPORTER", "none")
+
+
+# ----------------------------------------------------------------------
+# System prompt assembly of enhance_prompt
+
+@pytest.mark.parametrize("size", HISTORY_SIZES)
+def test_prompt_history_dumps(benchmark, size):
+    history = history_of(size)
+    benchmark(json.dumps, history, indent=2)
+
+
+@pytest.mark.parametrize("size", HISTORY_SIZES)
+def test_prompt_history_compact(benchmark, size):
+    from src.history import compact_history
+
+    benchmark(compact_history, history_of(size))
+
+
+@pytest.mark.parametrize("size", HISTORY_SIZES)
+def test_prompt_system_format(benchmark, size):
+    from src.llm import SYSTEM_PROMPT
+
+    history = history_of(size)
+    benchmark(lambda: str(SYSTEM_PROMPT).format(pastContext="Not provided",
+                                                currentSessionHistory=json.dumps(history, indent=2)))
+
+
+@pytest.mark.parametrize("size", HISTORY_SIZES)
+def test_prompt_system_render(benchmark, size):
+    from src.llm import build_system_prompt
+
+    benchmark(build_system_prompt, history_of(size))
+
+
+def test_prompt_user_format(benchmark):
+    from src.llm import USER_PROMPT
+
+    benchmark(USER_PROMPT.render, userPrompt="generate an aggressive dragon")
+
+
+# ----------------------------------------------------------------------
+# enhance_prompt and check_for_memory_intent end to end with a canned LLM
+
+def test_parse_extract_enhanced_prompt(benchmark):
+    from src.response_parser import extract_enhanced_prompt
+
+    assert benchmark(extract_enhanced_prompt, ENHANCED_JSON)
+
+
+@pytest.mark.parametrize("name", list(LLM_RESPONSES))
+def test_parse_enhance_prompt(benchmark, monkeypatch, name):
+    import src.llm
+
+    monkeypatch.setattr(src.llm, "chat", canned_chat(LLM_RESPONSES[name]))
+    assert benchmark(src.llm.enhance_prompt, "a dragon", current_session_history=history_of(2))
+
+
+@pytest.mark.parametrize("name", list(INTENT_RESPONSES))
+def test_parse_intent(benchmark, monkeypatch, name):
+    import src.user_intent_llm
+
+    monkeypatch.setattr(src.user_intent_llm, "chat", canned_chat(INTENT_RESPONSES[name]))
+    benchmark(src.user_intent_llm.check_for_memory_intent, "remake my dragon", history_of(2))
+
+
+# ----------------------------------------------------------------------
+# Stub.call with a canned proxy response, i.e. the output schema handling
+
+def test_stub_call_schema(benchmark):
+    pytest.importorskip("openfabric_pysdk")
+    pytest.importorskip("requests")
+    from benchmarks.mock_openfabric import SCHEMAS
+    from core.remote import Remote
+    from core.stub import Stub
+
+    class CannedRemote(Remote):
+        def execute(self, inputs: dict, uid: str):
+            return {"result": "0" * 32}
+
+        @staticmethod
+        def get_response(output):
+            return output
+
+    stub = Stub([])
+    stub._schema["mock-image"] = (SCHEMAS["image"]["input"], SCHEMAS["image"]["output"])
+    stub._connections["mock-image"] = CannedRemote("ws://127.0.0.1/app")
+    benchmark(stub.call, "mock-image", {"prompt": "a dragon"})
+
+
+# ----------------------------------------------------------------------
+# save_generation and find_similar_prompts at growing corpus sizes
+
+@pytest.fixture(scope="module", params=sorted(CORPUS_SIZES), ids=lambda size: f"corpus{size}")
+def memory_store(request, tmp_path_factory):
+    """The memory manager on a temporary database and vector index of the given size."""
+    pytest.importorskip("chromadb")
+    from database import memory_manager
+
+    directory = tmp_path_factory.mktemp("bench-memory")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(memory_manager, "DB_PATH", str(directory / "memory.db"))
+        patch.setattr(memory_manager, "CHROMA_DIR", str(directory / "chroma_data"))
+        patch.setattr(memory_manager, "_sqlite_ready", False)
+        memory_manager.reset_chromadb()
+        try:
+            _, collection = memory_manager.init_chromadb()
+        except Exception as e:
+            pytest.skip(f"ChromaDB could not be initialized: {e}")
+        if collection is None:
+            pytest.skip("ChromaDB could not be initialized")
+        fill_corpus(memory_manager, collection, request.param)
+        yield memory_manager
+        memory_manager.reset_chromadb()
+
+
+def fill_corpus(memory_manager, collection, size: int, batch_size: int = 256) -> None:
+    """Grows the benchmark corpus to the given size with batched inserts."""
+    conn = memory_manager.get_db_connection()
+    try:
+        missing = size - conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0]
+        while missing > 0:
+            batch = min(batch_size, missing)
+            ids, documents = [], []
+            for i in range(batch):
+                text = f"A {['red', 'bronze', 'glass', 'wooden'][i % 4]} {['dragon', 'castle', 'robot', 'ship'][i // 4 % 4]} scene {missing - i}"
+                cursor = conn.execute(
+                    "INSERT INTO prompts (session_id, user_prompt, enhanced_prompt) VALUES (?, ?, ?)",
+                    ("bench", text, text)
+                )
+                ids.append(str(cursor.lastrowid))
+                documents.append(text)
+            conn.commit()
+            collection.add(ids=ids, documents=documents, metadatas=[{"session_id": "bench"}] * batch)
+            missing -= batch
+    finally:
+        conn.close()
+
+
+def test_memory_save_generation(benchmark, memory_store):
+    counter = [0]
+
+    def save():
+        counter[0] += 1
+        return memory_store.save_generation("bench", f"prompt {counter[0]}", f"A dragon variation number {counter[0]}")
+
+    # A handful of rounds, so the corpus stays close to its nominal size
+    assert benchmark.pedantic(save, rounds=20, iterations=1) > 0
+
+
+def test_memory_find_similar_prompts(benchmark, memory_store):
+    benchmark(memory_store.find_similar_prompts, "a bronze dragon", k=3)
@@ -0,0 +1,39 @@
+"""
+Canned LLM answers and session histories shared by the benchmarks, covering the
+parsing paths of both LLM layers without a running Ollama.
+"""
+import json
+from typing import Callable, Dict, List
+
+# Canned model outputs covering the parsing paths of both LLM layers
+ENHANCED_JSON = json.dumps({"newEnhancedPrompt": "A towering bronze dragon perched on a basalt cliff at golden hour, "
+                                                 "wings half spread, mist rolling through the valley below"})
+THINK_BLOCK = "<think>" + "The user wants a dragon; consider the lighting, scale and mood. " * 40 + "</think>\n"
+LLM_RESPONSES = {
+    "json": ENHANCED_JSON,
+    "think_json": THINK_BLOCK + ENHANCED_JSON,
+    "think_fallback": THINK_BLOCK + '"A towering bronze dragon perched on a basalt cliff at golden hour"',
+}
+INTENT_RESPONSES = {
+    "json": '{"requiresMemory": true}',
+    "think_json": THINK_BLOCK + '{"requiresMemory": true}',
+    "think_regex_fallback": THINK_BLOCK + 'Sure! {"requiresMemory": false} is my answer.',
+}
+
+
+def history_of(messages: int) -> List[Dict[str, str]]:
+    """Builds a session history with the given number of alternating messages."""
+    return [
+        {"role": "user", "content": f"make the dragon bigger, variation {i}"} if i % 2 == 0
+        else {"role": "assistant", "content": f"**Enhanced Prompt:** {json.loads(ENHANCED_JSON)['newEnhancedPrompt']}"}
+        for i in range(messages)
+    ]
+
+
+def canned_chat(content: str) -> Callable:
+    """Returns a replacement for src.ollama_client.chat answering with fixed content."""
+    response = {"message": {"role": "assistant", "content": content}}
+
+    def chat(messages, options=None, **kwargs):
+        return response
+    return chat
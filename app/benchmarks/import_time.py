@@ -0,0 +1,113 @@
+"""
+Import-time regression benchmark.
+
+Imports each application module in a fresh interpreter with ``-X importtime`` and
+checks that (a) none of the heavy dependencies is pulled in at import time and
+(b) the cumulative import time stays within a tolerance of the stored baseline.
+
+Usage (from the ``app`` directory):
+    python -m benchmarks.import_time            # compare against the baseline
+    python -m benchmarks.import_time --update   # record a new baseline
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(APP_DIR, "benchmarks", "baselines", "import_time.json")
+
+# Modules on the server start and Streamlit rerun paths
+MODULES = ["main", "database.memory_manager", "src.llm", "src.user_intent_llm", "core.stub"]
+
+# Dependencies that must only be loaded on first use
+HEAVY_MODULES = ["chromadb", "sentence_transformers", "torch", "ollama", "requests"]
+
+
+def profile_import(module: str, repeat: int = 5) -> Optional[Dict]:
+    """
+    Imports a module in fresh interpreters and parses the ``-X importtime`` output.
+
+    Args:
+        module: Dotted name of the module to import.
+        repeat: Number of interpreters to start; the fastest run is kept.
+
+    Returns:
+        A dict with the cumulative import time in microseconds and the heavy modules
+        that were imported, or None if the module cannot be imported here.
+    """
+    best: Optional[Dict] = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=APP_DIR, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(f"{module}: import failed, skipping\n{proc.stderr.strip().splitlines()[-1]}")
+            return None
+
+        cumulative_us = 0
+        imported: List[str] = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = [part.strip() for part in line.split(":", 1)[1].split("|")]
+            if not cumulative.isdigit():
+                continue
+            imported.append(name)
+            if name == module:
+                cumulative_us = int(cumulative)
+
+        heavy = sorted(name for name in set(imported) if name in HEAVY_MODULES)
+        if best is None or cumulative_us < best["cumulative_us"]:
+            best = {"cumulative_us": cumulative_us, "heavy_imports": heavy}
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update", action="store_true", help="Write the measured times as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown (default 0.25).")
+    parser.add_argument("--repeat", type=int, default=5, help="Interpreter starts per module.")
+    args = parser.parse_args()
+
+    baseline: Dict[str, Dict] = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    results: Dict[str, Dict] = {}
+    failed = False
+    for module in MODULES:
+        result = profile_import(module, args.repeat)
+        if result is None:
+            continue
+        results[module] = result
+
+        line = f"{module:<28} {result['cumulative_us'] / 1000:8.1f} ms"
+        if result["heavy_imports"]:
+            failed = True
+            line += f"  FAIL heavy imports: {', '.join(result['heavy_imports'])}"
+        elif module in baseline:
+            limit = baseline[module]["cumulative_us"] * (1 + args.tolerance)
+            line += f"  (baseline {baseline[module]['cumulative_us'] / 1000:.1f} ms)"
+            if result["cumulative_us"] > limit:
+                failed = True
+                line += "  FAIL regression"
+        print(line)
+
+    if args.update:
+        baseline.update(results)
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Load test of the full ``main.execute`` workflow.
+
+Starts the local stand-ins for Ollama and the two Openfabric apps (see
+``benchmarks.mock_ollama`` and ``benchmarks.mock_openfabric``), then submits
+executions at a fixed rate (open loop: a slow request never delays the next
+submission) and reports the achieved throughput, the outcome and error rates and
+the p50/p95/p99 latency of every traced stage.
+
+The memory stores default to a temporary directory so that runs do not pollute
+``database/memory.db``; pass ``--keep-memory`` to use the configured stores.
+``--app-ids`` and ``--ollama-host`` point the run at real services instead.
+
+Usage (from the ``app`` directory):
+    python -m benchmarks.load_test [--rps 2] [--duration 60] [--concurrency 32]
+        [--llm-latency 0.5] [--image-latency 2] [--model-latency 5] [--failure-rate 0.01]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Dict, List
+
+PROMPTS = [
+    "a knight riding a mechanical horse through a desert",
+    "a lighthouse on a cliff during a storm",
+    "a tiny robot watering plants on a windowsill",
+    "an ancient tree house city in a rainforest",
+    "remake the dragon I created last week but with golden scales",
+    "a vintage race car parked in front of a neon diner",
+]
+
+OUTCOMES = ("success", "partial", "invalid", "error")
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """
+    Sets the environment read by the app modules at import time, so it has to run
+    before main is imported.
+
+    Args:
+        args: The parsed command line.
+    """
+    os.environ.setdefault("TRACE_EXPORTER", "none")
+    os.environ["TRACE_STAGE_WINDOW"] = str(max(1024, int(args.rps * args.duration) + 1))
+    if args.ollama_host:
+        os.environ["OLLAMA_HOST"] = args.ollama_host
+    if not args.keep_memory:
+        memory_dir = tempfile.mkdtemp(prefix="loadtest-memory-")
+        os.environ["MEMORY_DB_PATH"] = os.path.join(memory_dir, "memory.db")
+        os.environ["MEMORY_CHROMA_DIR"] = os.path.join(memory_dir, "chroma_data")
+
+
+def start_mocks(args: argparse.Namespace) -> List[str]:
+    """
+    Starts the stand-in servers that were not replaced by real services.
+
+    Args:
+        args: The parsed command line.
+
+    Returns:
+        The app IDs of the Text-to-Image and Image-to-3D apps.
+    """
+    from benchmarks.mock_ollama import MockOllamaSettings, start_mock_ollama
+    from benchmarks.mock_openfabric import MockAppSettings, start_mock_app
+
+    if not args.ollama_host:
+        settings = MockOllamaSettings(args.llm_latency, think_chars=args.think_chars, memory_rate=args.memory_rate)
+        server = start_mock_ollama("127.0.0.1", 0, settings)
+        os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{server.server_address[1]}"
+
+    if args.app_ids:
+        return args.app_ids
+
+    return [
+        start_mock_app("image", "127.0.0.1", args.image_port,
+                       MockAppSettings(args.image_latency, payload_bytes=args.image_bytes, failure_rate=args.failure_rate)),
+        start_mock_app("model", "127.0.0.1", args.model_port,
+                       MockAppSettings(args.model_latency, payload_bytes=args.model_bytes, failure_rate=args.failure_rate)),
+    ]
+
+
+def run_load(rps: float, duration: float, concurrency: int, use_cache: bool = False) -> Dict[str, float]:
+    """
+    Submits executions at a fixed rate and waits for all of them to finish.
+
+    Args:
+        rps: Target executions per second.
+        duration: Seconds during which executions are submitted.
+        concurrency: Maximum number of executions running at once.
+        use_cache: Whether executions may be served from the semantic cache.
+
+    Returns:
+        The number of submitted and failed calls, the wall-clock time and the
+        largest delay between the planned and the actual start of an execution.
+    """
+    import main
+    from ontology_dc8f06af066e4a7880a5938933236037.input import InputClass
+    from ontology_dc8f06af066e4a7880a5938933236037.output import OutputClass
+
+    total = max(1, int(rps * duration))
+    lock = threading.Lock()
+    stats = {"submitted": total, "exceptions": 0, "max_start_lag": 0.0}
+
+    def one(planned: float) -> None:
+        lag = time.perf_counter() - planned
+        model = SimpleNamespace(request=InputClass(prompt=random.choice(PROMPTS), use_cache=use_cache), response=OutputClass())
+        try:
+            main.execute(model)
+        except Exception:
+            with lock:
+                stats["exceptions"] += 1
+        with lock:
+            stats["max_start_lag"] = max(stats["max_start_lag"], lag)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load") as executor:
+        for i in range(total):
+            planned = started + i / rps
+            delay = planned - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(one, planned)
+    stats["elapsed"] = time.perf_counter() - started
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=2.0, help="Target executions per second.")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of load.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Maximum executions in flight.")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Mean seconds per mock Ollama call.")
+    parser.add_argument("--think-chars", type=int, default=2000, help="Size of the mock <think> blocks.")
+    parser.add_argument("--memory-rate", type=float, default=0.2, help="Share of prompts that need memory retrieval.")
+    parser.add_argument("--image-latency", type=float, default=2.0, help="Mean seconds per mock Text-to-Image call.")
+    parser.add_argument("--model-latency", type=float, default=5.0, help="Mean seconds per mock Image-to-3D call.")
+    parser.add_argument("--image-bytes", type=int, default=1024 * 1024, help="Size of the mock image.")
+    parser.add_argument("--model-bytes", type=int, default=4 * 1024 * 1024, help="Size of the mock 3D model.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of failed mock app executions.")
+    parser.add_argument("--image-port", type=int, default=9101)
+    parser.add_argument("--model-port", type=int, default=9102)
+    parser.add_argument("--app-ids", nargs=2, metavar=("TEXT_TO_IMAGE", "IMAGE_TO_3D"),
+                        help="Use these Openfabric apps instead of the mocks.")
+    parser.add_argument("--ollama-host", help="Use this Ollama server instead of the mock.")
+    parser.add_argument("--semantic-cache", action="store_true",
+                        help="Let repeated prompts be served from the semantic cache.")
+    parser.add_argument("--keep-memory", action="store_true", help="Use the configured memory stores.")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this file.")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    app_ids = start_mocks(args)
+
+    import main as app_main
+    from observability.metrics import REQUESTS
+    from observability.tracing import stage_summary
+    from ontology_dc8f06af066e4a7880a5938933236037.config import ConfigClass
+
+    # Also replaces a config stored by an earlier run in the shared config store
+    app_main.config({'super-user': ConfigClass(app_ids=app_ids)}, None)
+    before = {outcome: REQUESTS.value(outcome=outcome) for outcome in OUTCOMES}
+
+    print(f"Driving execute at {args.rps} rps for {args.duration}s against {app_ids}", file=sys.stderr)
+    stats = run_load(args.rps, args.duration, args.concurrency, args.semantic_cache)
+
+    outcomes = {outcome: REQUESTS.value(outcome=outcome) - before[outcome] for outcome in OUTCOMES}
+    completed = sum(outcomes.values())
+    report = {
+        "target_rps": args.rps,
+        "submitted": stats["submitted"],
+        "completed": completed,
+        "elapsed_seconds": stats["elapsed"],
+        "throughput_rps": completed / stats["elapsed"],
+        "max_start_lag_seconds": stats["max_start_lag"],
+        "outcomes": outcomes,
+        "error_rate": (outcomes["error"] + stats["exceptions"]) / stats["submitted"],
+        "exceptions": stats["exceptions"],
+        "stages": stage_summary(),
+    }
+
+    print(f"\nsubmitted {report['submitted']}, completed {completed} in {stats['elapsed']:.1f}s "
+          f"-> {report['throughput_rps']:.2f} rps (target {args.rps})")
+    print("outcomes: " + ", ".join(f"{name}={count:g}" for name, count in outcomes.items())
+          + f", exceptions={stats['exceptions']}, error rate {report['error_rate']:.1%}")
+    print(f"max start lag: {stats['max_start_lag']:.3f}s\n")
+    print(f"{'stage':<28}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for name, summary in sorted(report["stages"].items(), key=lambda item: -item[1]["p50"]):
+        print(f"{name:<28}{summary['count']:>7}{summary['p50']:>10.3f}{summary['p95']:>10.3f}"
+              f"{summary['p99']:>10.3f}{summary['max']:>10.3f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
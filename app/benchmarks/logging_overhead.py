@@ -0,0 +1,86 @@
+"""
+Per-request logging overhead benchmark.
+
+Replays the log calls of one execute() request (including a multi-KB raw LLM
+response and a manifest-sized payload) against two pipelines and reports the time
+spent on the calling thread per request:
+
+  sync   - the previous setup: FileHandler on the request thread, eager f-strings
+  async  - logger.logging: deferred QueueHandler, %-style arguments, truncation
+
+Usage (from the ``app`` directory):
+    python -m benchmarks.logging_overhead [--requests N]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+RAW_RESPONSE = "<think>" + "Reasoning about the request. " * 150 + "</think>\n{\"newEnhancedPrompt\": \"A dragon\"}"
+MANIFEST = {"name": "text-to-image", "schema": {f"field_{i}": {"type": "string", "description": "x" * 40} for i in range(60)}}
+PROMPT = "generate an aggressive dragon standing on a cliff at sunset"
+
+
+def eager_request(log: logging.Logger) -> None:
+    """The log calls of one request, formatted eagerly with f-strings."""
+    log.info(f"Received prompt: {PROMPT}")
+    log.info(f"[app] Manifest loaded: {MANIFEST}")
+    log.info(f"[Intent Analyzer] Raw response: '{RAW_RESPONSE}'")
+    log.info(f"Intent Analyzer for prompt '{PROMPT}': requires_memory={False}")
+    log.info(f"[LLM] Raw response: '{RAW_RESPONSE}'")
+    log.info(f"[LLM] Generated Enhanced Prompt: {PROMPT}")
+    for stage in ("text_to_image", "image_to_3d", "persistence"):
+        log.info(f"Stage {stage} completed for session {'0' * 36}")
+
+
+def lazy_request(log: logging.Logger) -> None:
+    """The same log calls with lazy %-style arguments."""
+    log.info("Received prompt: %s", PROMPT)
+    log.debug("[%s] Manifest: %s", "app", MANIFEST)
+    log.debug("[Intent Analyzer] Raw response: '%s'", RAW_RESPONSE)
+    log.info("Intent Analyzer for prompt '%s': requires_memory=%s", PROMPT, False)
+    log.debug("[LLM] Raw response: '%s'", RAW_RESPONSE)
+    log.info("[LLM] Generated Enhanced Prompt: %s", PROMPT)
+    for stage in ("text_to_image", "image_to_3d", "persistence"):
+        log.info("Stage %s completed for session %s", stage, "0" * 36)
+
+
+def measure(request, log: logging.Logger, requests: int) -> float:
+    """Returns the mean time per request on the calling thread in microseconds."""
+    for _ in range(50):
+        request(log)
+    started = time.perf_counter()
+    for _ in range(requests):
+        request(log)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="Number of simulated requests.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sync_log = logging.getLogger("benchmark_sync")
+        sync_log.propagate = False
+        sync_log.setLevel(logging.INFO)
+        handler = logging.FileHandler(os.path.join(tmp, "sync.log"))
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        sync_log.addHandler(handler)
+        sync_us = measure(eager_request, sync_log, args.requests)
+        handler.close()
+
+        from logger.logging import flush_logs, logger
+        async_us = measure(lazy_request, logger, args.requests)
+        drain_started = time.perf_counter()
+        flush_logs()
+        drain_ms = (time.perf_counter() - drain_started) * 1e3
+
+    print(f"sync  (FileHandler, f-strings):        {sync_us:8.1f} us/request on the request thread")
+    print(f"async (queue, lazy args, truncation):  {async_us:8.1f} us/request on the request thread")
+    print(f"      listener drained the backlog in {drain_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
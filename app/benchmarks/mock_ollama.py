@@ -0,0 +1,217 @@
+"""
+Ollama-compatible stand-in server for load tests.
+
+Answers ``POST /api/chat`` in the shape of a non-streaming Ollama response,
+including the token and duration stats, after a configurable latency. The intent
+analyzer gets a ``requiresMemory`` verdict and the prompt enhancer a
+``newEnhancedPrompt`` JSON (or a ranked ``variants`` list when asked for several),
+all optionally preceded by a <think> block of a given size, so that the parsing
+paths of both LLM layers are exercised. Requests with a ``format`` schema or
+``think: false`` are answered with the bare JSON, as by structured-output mode.
+
+Usage (from the ``app`` directory):
+    python -m benchmarks.mock_ollama [--port 11435] [--latency 0.5] [--think-chars 2000]
+
+Point the app at it with ``OLLAMA_HOST=http://127.0.0.1:11435``.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+
+class MockOllamaSettings:
+    """
+    Behaviour of the stand-in server.
+
+    Attributes:
+        latency (float): Mean seconds spent per chat call.
+        jitter (float): Fraction of the latency added or removed at random.
+        think_chars (int): Size of the <think> block preceding every answer.
+        memory_rate (float): Share of intent analyses answered with requiresMemory=true.
+        tokens_per_second (float): Generation speed reported in the response stats.
+        realtime_generation (bool): Whether to also spend the reported generation time,
+            so that latency grows with the number of generated tokens.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, latency: float = 0.5, jitter: float = 0.2, think_chars: int = 0,
+                 memory_rate: float = 0.0, tokens_per_second: float = 40.0, realtime_generation: bool = False):
+        self.latency = latency
+        self.jitter = jitter
+        self.think_chars = think_chars
+        self.memory_rate = memory_rate
+        self.tokens_per_second = tokens_per_second
+        self.realtime_generation = realtime_generation
+
+
+def build_answer(messages: List[Dict[str, str]], settings: MockOllamaSettings, think: bool = True) -> str:
+    """
+    Picks the JSON answer the calling LLM layer expects.
+
+    Args:
+        messages: The chat messages of the request.
+        settings: The server settings.
+        think: Whether to precede the answer with the <think> block.
+
+    Returns:
+        The assistant message content.
+    """
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+
+    variants = re.search(r"create (\d+) distinct variants", user)
+    if "requiresMemory" in system:
+        answer = json.dumps({"requiresMemory": random.random() < settings.memory_rate})
+    elif variants:
+        answer = json.dumps({"variants": [
+            {"prompt": f"Variant {i + 1}: a highly detailed, cinematic rendering of {user[:200]}", "score": 9 - i}
+            for i in range(int(variants.group(1)))
+        ]})
+    else:
+        answer = json.dumps({"newEnhancedPrompt": f"A highly detailed, cinematic rendering of {user[:200]}"})
+
+    if settings.think_chars and think:
+        thought = ("Considering the scene, lighting and composition. " * (settings.think_chars // 50 + 1))[:settings.think_chars]
+        answer = f"<think>{thought}</think>\n{answer}"
+    return answer
+
+
+def build_response(body: Dict[str, Any], settings: MockOllamaSettings, started: float) -> Dict[str, Any]:
+    """
+    Builds a non-streaming /api/chat response with Ollama's stats fields.
+
+    Args:
+        body: The decoded request body.
+        settings: The server settings.
+        started: The perf_counter value when the request arrived.
+
+    Returns:
+        The response document.
+    """
+    messages = body.get("messages") or []
+    # Structured-output requests get the bare JSON
+    think = body.get("think") is not False and not body.get("format")
+    content = build_answer(messages, settings, think)
+
+    # Roughly four characters per token
+    prompt_tokens = max(1, sum(len(m.get("content", "")) for m in messages) // 4)
+    eval_tokens = max(1, len(content) // 4)
+    eval_ns = int(eval_tokens / settings.tokens_per_second * 1e9)
+    total_ns = int((time.perf_counter() - started) * 1e9)
+
+    return {
+        "model": body.get("model", "mock"),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "message": {"role": "assistant", "content": content},
+        "done": True,
+        "done_reason": "stop",
+        "total_duration": total_ns,
+        "load_duration": 0,
+        "prompt_eval_count": prompt_tokens,
+        "prompt_eval_duration": max(1, total_ns - eval_ns),
+        "eval_count": eval_tokens,
+        "eval_duration": eval_ns,
+    }
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    """Serves the subset of the Ollama API used by the app."""
+
+    settings = MockOllamaSettings()
+
+    # ----------------------------------------------------------------------
+    def send_json(self, payload: Any, status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # ----------------------------------------------------------------------
+    def do_GET(self) -> None:
+        if self.path == "/api/version":
+            self.send_json({"version": "0.0.0-mock"})
+        elif self.path == "/api/tags":
+            self.send_json({"models": [{"name": "deepseek-r1:14b", "model": "deepseek-r1:14b"}]})
+        else:
+            self.send_json({"error": "not found"}, status=404)
+
+    # ----------------------------------------------------------------------
+    def do_POST(self) -> None:
+        started = time.perf_counter()
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self.send_json({"error": "invalid JSON body"}, status=400)
+            return
+
+        if self.path != "/api/chat":
+            self.send_json({"error": "not found"}, status=404)
+            return
+
+        settings = self.settings
+        delay = settings.latency * (1 + random.uniform(-settings.jitter, settings.jitter))
+        response = build_response(body, settings, started)
+        if settings.realtime_generation:
+            delay += response["eval_duration"] / 1e9
+        time.sleep(max(0.0, delay))
+        self.send_json(response)
+
+    # ----------------------------------------------------------------------
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def start_mock_ollama(host: str = "127.0.0.1", port: int = 11435,
+                      settings: Optional[MockOllamaSettings] = None) -> ThreadingHTTPServer:
+    """
+    Starts the stand-in server on a daemon thread.
+
+    Args:
+        host: The interface to bind.
+        port: The port to bind, 0 for any free port.
+        settings: The server settings.
+
+    Returns:
+        The running server; its address is server.server_address.
+    """
+    handler = type("ConfiguredMockOllamaHandler", (MockOllamaHandler,), {"settings": settings or MockOllamaSettings()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-ollama", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean seconds per chat call.")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative latency jitter.")
+    parser.add_argument("--think-chars", type=int, default=0, help="Size of the <think> block in every answer.")
+    parser.add_argument("--memory-rate", type=float, default=0.0, help="Share of requiresMemory=true verdicts.")
+    parser.add_argument("--realtime-generation", action="store_true",
+                        help="Add the generation time of the answer's tokens to the latency.")
+    args = parser.parse_args()
+
+    settings = MockOllamaSettings(args.latency, args.jitter, args.think_chars, args.memory_rate,
+                                  realtime_generation=args.realtime_generation)
+    server = start_mock_ollama(args.host, args.port, settings)
+    print(f"Mock Ollama listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Local stand-in for the Openfabric Text-to-Image and Image-to-3D apps.
+
+Each mock app serves the HTTP endpoints the Stub reads (``/manifest``,
+``/schema?type=input|output`` and ``/resource?reid=...``) and the Socket.IO proxy
+protocol used by ``core.remote.Remote``: the client emits a zlib-compressed
+``execute`` event on the ``/app`` namespace, the app answers with ``submitted``
+and, after the configured latency, ``response`` carrying the ``ray`` status and
+the output. Binary outputs are returned as resource ids and fetched through
+``/resource``, like on the real nodes.
+
+Flask and Flask-SocketIO come with openfabric-pysdk.
+
+Usage (from the ``app`` directory):
+    python -m benchmarks.mock_openfabric [--image-port 9101] [--model-port 9102]
+        [--image-latency 2] [--model-latency 5] [--image-bytes 1048576] [--model-bytes 4194304]
+
+The printed app IDs ("http://127.0.0.1:<port>") go into the ``app_ids`` config.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Kind of app -> (output field, magic bytes of the generated file)
+APP_KINDS: Dict[str, Tuple[str, bytes]] = {
+    "image": ("result", b"\x89PNG\r\n\x1a\n"),
+    "model": ("generated_object", b"glTF"),
+}
+
+SCHEMAS: Dict[str, Dict[str, dict]] = {
+    "image": {
+        "input": {"type": "object", "properties": {"prompt": {"type": "string"}}},
+        "output": {"type": "object", "properties": {"result": {"type": "string", "format": "binary"}}},
+    },
+    "model": {
+        "input": {"type": "object", "properties": {"input_image": {"type": "string", "format": "binary"}}},
+        "output": {"type": "object", "properties": {"generated_object": {"type": "string", "format": "binary"}}},
+    },
+}
+
+# Number of generated resources kept for download
+RESOURCE_CAPACITY = 256
+
+
+class MockAppSettings:
+    """
+    Behaviour of one mock app.
+
+    Attributes:
+        latency (float): Mean seconds between submission and response.
+        jitter (float): Fraction of the latency added or removed at random.
+        payload_bytes (int): Size of the generated resource.
+        failure_rate (float): Share of executions answered with status FAILED.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, latency: float = 1.0, jitter: float = 0.2, payload_bytes: int = 1024 * 1024,
+                 failure_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.payload_bytes = payload_bytes
+        self.failure_rate = failure_rate
+
+
+def create_mock_app(kind: str, settings: Optional[MockAppSettings] = None):
+    """
+    Builds the Flask app and Socket.IO server of one mock Openfabric app.
+
+    Args:
+        kind: "image" for Text-to-Image or "model" for Image-to-3D.
+        settings: The app behaviour.
+
+    Returns:
+        The Flask app and its SocketIO server.
+
+    Raises:
+        ValueError: If the kind is unknown.
+    """
+    from flask import Flask, Response, jsonify, request
+    from flask_socketio import SocketIO
+
+    if kind not in APP_KINDS:
+        raise ValueError(f"Unknown mock app kind: {kind}")
+
+    settings = settings or MockAppSettings()
+    output_field, magic = APP_KINDS[kind]
+    payload = magic + os.urandom(max(0, settings.payload_bytes - len(magic)))
+    resources: "OrderedDict[str, bytes]" = OrderedDict()
+    responses: Dict[str, dict] = {}
+    lock = threading.Lock()
+
+    app = Flask(f"mock-{kind}")
+    # The proxy client connects to "<scheme>://<host>/app", so Socket.IO lives under /app
+    socketio = SocketIO(app, async_mode="threading", path="/app/socket.io", cors_allowed_origins="*")
+
+    @app.get("/manifest")
+    def manifest():
+        return jsonify({"name": f"mock-{kind}", "version": "1.0", "sdk": "0.3.0",
+                        "description": f"Local stand-in for the {kind} app"})
+
+    @app.get("/schema")
+    def schema():
+        schema_type = request.args.get("type", "input")
+        if schema_type not in ("input", "output"):
+            return jsonify({"error": "type must be input or output"}), 400
+        return jsonify(SCHEMAS[kind][schema_type])
+
+    @app.get("/resource")
+    def resource():
+        with lock:
+            data = resources.get(request.args.get("reid", ""))
+        if data is None:
+            return jsonify({"error": "resource not found"}), 404
+        return Response(data, mimetype="application/octet-stream")
+
+    def run_execution(sid: str, rid: str, qid: str) -> None:
+        socketio.emit("submitted", {"rid": rid, "qid": qid, "status": "QUEUED"}, to=sid, namespace="/app")
+        socketio.sleep(max(0.0, settings.latency * (1 + random.uniform(-settings.jitter, settings.jitter))))
+
+        if random.random() < settings.failure_rate:
+            message = {"ray": {"rid": rid, "qid": qid, "status": "FAILED"}, "output": None}
+        else:
+            reid = uuid.uuid4().hex
+            with lock:
+                resources[reid] = payload
+                while len(resources) > RESOURCE_CAPACITY:
+                    resources.popitem(last=False)
+            message = {"ray": {"rid": rid, "qid": qid, "status": "COMPLETED"}, "output": {output_field: reid}}
+
+        with lock:
+            responses[qid] = message
+        socketio.emit("response", message, to=sid, namespace="/app")
+
+    @socketio.on("execute", namespace="/app")
+    def on_execute(data: bytes, access: Any = True):
+        message = json.loads(zlib.decompress(data).decode("utf-8"))
+        rid = message.get("header", {}).get("rid") or uuid.uuid4().hex
+        socketio.start_background_task(run_execution, request.sid, rid, uuid.uuid4().hex)
+
+    @socketio.on("restore", namespace="/app")
+    def on_restore(qid: str):
+        with lock:
+            message = responses.get(qid)
+        if message is not None:
+            socketio.emit("response", message, to=request.sid, namespace="/app")
+
+    @socketio.on("delete", namespace="/app")
+    def on_delete(qid: str):
+        with lock:
+            responses.pop(qid, None)
+
+    return app, socketio
+
+
+def start_mock_app(kind: str, host: str = "127.0.0.1", port: int = 9101,
+                   settings: Optional[MockAppSettings] = None) -> str:
+    """
+    Starts a mock app on a daemon thread and waits until it accepts connections.
+
+    Args:
+        kind: "image" or "model".
+        host: The interface to bind.
+        port: The port to bind.
+        settings: The app behaviour.
+
+    Returns:
+        The app ID to put into the app_ids config.
+
+    Raises:
+        RuntimeError: If the app did not come up within ten seconds.
+    """
+    from warmup import wait_for_port
+
+    app, socketio = create_mock_app(kind, settings)
+    thread = threading.Thread(
+        target=socketio.run, name=f"mock-{kind}", daemon=True,
+        kwargs={"app": app, "host": host, "port": port, "use_reloader": False, "log_output": False,
+                "allow_unsafe_werkzeug": True},
+    )
+    thread.start()
+    if not wait_for_port(host, port, timeout=10):
+        raise RuntimeError(f"Mock {kind} app did not start on {host}:{port}")
+    return f"http://{host}:{port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--image-port", type=int, default=9101)
+    parser.add_argument("--model-port", type=int, default=9102)
+    parser.add_argument("--image-latency", type=float, default=2.0, help="Mean seconds per Text-to-Image call.")
+    parser.add_argument("--model-latency", type=float, default=5.0, help="Mean seconds per Image-to-3D call.")
+    parser.add_argument("--image-bytes", type=int, default=1024 * 1024, help="Size of the generated image.")
+    parser.add_argument("--model-bytes", type=int, default=4 * 1024 * 1024, help="Size of the generated model.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of FAILED executions.")
+    args = parser.parse_args()
+
+    image_app = start_mock_app("image", args.host, args.image_port,
+                               MockAppSettings(args.image_latency, payload_bytes=args.image_bytes, failure_rate=args.failure_rate))
+    model_app = start_mock_app("model", args.host, args.model_port,
+                               MockAppSettings(args.model_latency, payload_bytes=args.model_bytes, failure_rate=args.failure_rate))
+    print(json.dumps({"super-user": {"app_ids": [image_app, model_app]}}, indent=2))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Free-form vs. structured-output Ollama calls.
+
+Runs ``enhance_prompt`` and ``check_for_memory_intent`` in both modes and reports
+per call the mean latency, the generated (eval) and prompt tokens and the parse
+paths taken. In free-form mode the model reasons in a <think> block before its
+JSON; in structured-output mode the JSON schema is passed as ``format`` and
+thinking is disabled.
+
+By default the calls go to the mock Ollama server with a <think> block of
+``--think-chars`` characters and generation time proportional to the tokens;
+``--ollama-host`` measures a real server instead.
+
+Usage (from the ``app`` directory):
+    python -m benchmarks.structured_output [--calls 20] [--think-chars 2000]
+    python -m benchmarks.structured_output --ollama-host http://127.0.0.1:11434 --calls 5
+"""
+import argparse
+import json
+import os
+import sys
+import statistics
+import time
+from typing import Callable, Dict, List
+
+os.environ.setdefault("TRACE_EXPORTER", "none")
+
+PROMPTS = [
+    "a knight riding a mechanical horse through a desert",
+    "make the lighthouse from yesterday stormier",
+    "a tiny robot watering plants on a windowsill",
+]
+PARSE_PATHS = ("json", "stripped", "search", "failed")
+
+
+def measure_layer(call: Callable[[str], object], layer: str, calls: int, model: str) -> Dict[str, float]:
+    """
+    Calls one LLM layer repeatedly and collects latency, tokens and parse paths.
+
+    Args:
+        call: Calls the layer with a prompt.
+        layer: The layer name used by the parse metric.
+        calls: The number of calls.
+        model: The model whose token counters are read.
+
+    Returns:
+        The per-call means and the parse path counts.
+    """
+    from observability.metrics import LLM_PARSE_RESULTS, OLLAMA_TOKENS
+
+    before = {kind: OLLAMA_TOKENS.value(model=model, kind=kind) for kind in ("prompt", "eval")}
+    paths_before = {path: LLM_PARSE_RESULTS.value(layer=layer, path=path) for path in PARSE_PATHS}
+    latencies: List[float] = []
+    for i in range(calls):
+        started = time.perf_counter()
+        call(PROMPTS[i % len(PROMPTS)])
+        latencies.append(time.perf_counter() - started)
+
+    result = {
+        "latency_ms": statistics.mean(latencies) * 1000,
+        "eval_tokens": (OLLAMA_TOKENS.value(model=model, kind="eval") - before["eval"]) / calls,
+        "prompt_tokens": (OLLAMA_TOKENS.value(model=model, kind="prompt") - before["prompt"]) / calls,
+    }
+    for path in PARSE_PATHS:
+        result[f"parse_{path}"] = LLM_PARSE_RESULTS.value(layer=layer, path=path) - paths_before[path]
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20, help="Calls per layer and mode.")
+    parser.add_argument("--think-chars", type=int, default=2000, help="Size of the mock <think> block.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock latency before generation.")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0, help="Mock generation speed.")
+    parser.add_argument("--ollama-host", help="Measure this Ollama server instead of the mock.")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    if args.ollama_host:
+        os.environ["OLLAMA_HOST"] = args.ollama_host
+    else:
+        from benchmarks.mock_ollama import MockOllamaSettings, start_mock_ollama
+
+        settings = MockOllamaSettings(latency=args.latency, jitter=0.0, think_chars=args.think_chars,
+                                      tokens_per_second=args.tokens_per_second, realtime_generation=True)
+        server = start_mock_ollama(port=0, settings=settings)
+        os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{server.server_address[1]}"
+
+    import src.ollama_client
+    from src.llm import enhance_prompt
+    from src.user_intent_llm import check_for_memory_intent
+
+    layers = {
+        "enhancement": lambda prompt: enhance_prompt(prompt),
+        "intent_analysis": lambda prompt: check_for_memory_intent(prompt, []),
+    }
+    results = {}
+    for mode, structured in (("free-form", False), ("structured", True)):
+        src.ollama_client.OLLAMA_STRUCTURED_OUTPUT = structured
+        for layer, call in layers.items():
+            results[f"{layer}/{mode}"] = measure_layer(call, layer, args.calls, src.ollama_client.DEFAULT_MODEL)
+
+    print(f"{'case':<28} {'latency ms':>11} {'eval tok':>9} {'prompt tok':>11}  parse paths")
+    for name, result in results.items():
+        paths = ", ".join(f"{path}={int(result[f'parse_{path}'])}" for path in PARSE_PATHS if result[f"parse_{path}"])
+        print(f"{name:<28} {result['latency_ms']:>11.1f} {result['eval_tokens']:>9.1f} {result['prompt_tokens']:>11.1f}  {paths}")
+
+    # enhance_prompt and check_for_memory_intent fall back silently when the call fails
+    failed = [name for name, result in results.items()
+              if not result["eval_tokens"] or not any(result[f"parse_{path}"] for path in PARSE_PATHS)]
+    if failed:
+        print(f"FAIL no tokens or parse paths were recorded for: {', '.join(failed)}. "
+              f"The LLM calls failed; check that the ollama package is installed and the server "
+              f"is reachable, and see app/log for the errors.", file=sys.stderr)
+        return 1
+
+    for layer in layers:
+        free, structured = results[f"{layer}/free-form"], results[f"{layer}/structured"]
+        if free["latency_ms"] and free["eval_tokens"]:
+            print(f"{layer}: {1 - structured['latency_ms'] / free['latency_ms']:.0%} lower latency, "
+                  f"{1 - structured['eval_tokens'] / free['eval_tokens']:.0%} fewer generated tokens")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Throughput and memory of forked worker processes at growing worker counts.
+
+Every worker runs the CPU-bound part of a request in a closed loop: the query
+embedding of the memory lookup (when sentence-transformers is installed), the
+system prompt assembly and the parsing of a canned LLM answer. The workers are
+forked from a parent that preloaded the embedding model and froze the garbage
+collector, exactly like ``workers.py``, so the report also shows how much of each
+worker's memory is still shared with the others (PSS vs. RSS, Linux only).
+
+Usage (from the ``app`` directory):
+    python -m benchmarks.worker_scaling                      # 1, 2, 4, ... up to the core count
+    python -m benchmarks.worker_scaling --workers 1,2,4,8 --duration 10
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+os.environ.setdefault("TRACE_EXPORTER", "none")
+
+PROMPT = "generate an aggressive bronze dragon perched on a cliff at golden hour"
+
+
+def build_workload(embed: bool) -> Callable[[], None]:
+    """
+    Builds the per-request CPU work.
+
+    Args:
+        embed: Whether to include the query embedding.
+
+    Returns:
+        A callable performing one request's worth of work.
+    """
+    import src.llm
+    from benchmarks.canned_llm import LLM_RESPONSES, canned_chat, history_of
+
+    src.llm.chat = canned_chat(LLM_RESPONSES["think_json"])
+    history = history_of(10)
+    embedding_function = None
+    if embed:
+        from database.memory_manager import get_embedding_function
+
+        embedding_function = get_embedding_function()
+
+    def request() -> None:
+        if embedding_function is not None:
+            embedding_function([PROMPT])
+        src.llm.enhance_prompt(PROMPT, current_session_history=history)
+    return request
+
+
+def memory_usage() -> Dict[str, float]:
+    """
+    Reads the resident and the proportional set size of this process.
+
+    Returns:
+        RSS and PSS in MiB, empty where /proc/self/smaps_rollup is not available.
+    """
+    usage: Dict[str, float] = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in ("Rss", "Pss"):
+                    usage[name.lower()] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return usage
+
+
+def run_worker(workload: Callable[[], None], barrier, duration: float, results) -> None:
+    """Runs the workload in a closed loop for the given duration and reports the count."""
+    barrier.wait()
+    deadline = time.perf_counter() + duration
+    count = 0
+    while time.perf_counter() < deadline:
+        workload()
+        count += 1
+    results.put({"requests": count, **memory_usage()})
+
+
+def measure(workload: Callable[[], None], workers: int, duration: float) -> Dict[str, float]:
+    """
+    Forks the given number of workers and measures their combined throughput.
+
+    Args:
+        workload: The per-request work.
+        workers: The number of worker processes.
+        duration: Seconds each worker runs.
+
+    Returns:
+        The requests per second and the mean RSS and PSS per worker.
+    """
+    context = multiprocessing.get_context("fork")
+    barrier, results = context.Barrier(workers), context.Queue()
+    processes = [context.Process(target=run_worker, args=(workload, barrier, duration, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    summary = {"rps": sum(report["requests"] for report in reports) / duration}
+    for key in ("rss", "pss"):
+        values = [report[key] for report in reports if key in report]
+        if values:
+            summary[key] = sum(values) / len(values)
+    return summary
+
+
+def main() -> None:
+    cores = os.cpu_count() or 1
+    default_counts: List[int] = sorted({1, *(2 ** i for i in range(1, 8) if 2 ** i <= cores), cores})
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=",".join(map(str, default_counts)),
+                        help="Comma-separated worker counts.")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per measurement.")
+    parser.add_argument("--no-embedding", action="store_true", help="Leave out the query embedding.")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    # The embedding model must not touch the real memory store
+    memory_dir = tempfile.mkdtemp(prefix="bench-workers-")
+    os.environ["MEMORY_DB_PATH"] = os.path.join(memory_dir, "memory.db")
+    os.environ["MEMORY_CHROMA_DIR"] = os.path.join(memory_dir, "chroma_data")
+
+    embed = not args.no_embedding
+    if embed:
+        from database.memory_manager import preload_embedding_model
+
+        embed = preload_embedding_model()
+        if not embed:
+            print("embedding: skipped (model not available)")
+
+    workload = build_workload(embed)
+    workload()
+    gc.freeze()
+
+    single: Optional[float] = None
+    results = []
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8} {'efficiency':>10} {'RSS MiB':>9} {'PSS MiB':>9}")
+    for workers in (int(count) for count in args.workers.split(",") if count):
+        summary = measure(workload, workers, args.duration)
+        single = single or summary["rps"] / workers
+        speedup = summary["rps"] / single
+        results.append({"workers": workers, "speedup": speedup, **summary})
+        print(f"{workers:>8} {summary['rps']:>10.1f} {speedup:>8.2f} {speedup / workers:>10.0%} "
+              f"{summary.get('rss', float('nan')):>9.1f} {summary.get('pss', float('nan')):>9.1f}")
+    print(f"({cores} cores)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"cores": cores, "embedding": embed, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
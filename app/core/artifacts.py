@@ -0,0 +1,124 @@
+import hashlib
+import os
+import re
+from typing import Optional
+
+# Content-addressed storage for generated images and 3D models
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACT_DIR = os.path.join(BASE_DIR, '..', 'artifacts')
+
+# A reference is "<sha256>.<extension>", which is also the file name on disk
+REFERENCE_PATTERN = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]{1,8}$')
+
+MIME_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "webp": "image/webp",
+    "glb": "model/gltf-binary",
+    "bin": "application/octet-stream",
+}
+
+
+def guess_extension(data: bytes, default: str = "bin") -> str:
+    """
+    Guesses a file extension from the leading magic bytes of an artifact.
+
+    Args:
+        data: The raw artifact bytes.
+        default: The extension to use when the format is not recognised.
+
+    Returns:
+        The file extension without a leading dot.
+    """
+    if data.startswith(b'\x89PNG'):
+        return "png"
+    if data.startswith(b'\xff\xd8'):
+        return "jpg"
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return "webp"
+    if data.startswith(b'glTF'):
+        return "glb"
+    return default
+
+
+def save_artifact(data: bytes, extension: Optional[str] = None) -> str:
+    """
+    Stores an artifact under its content hash. Saving the same bytes twice is a no-op.
+
+    Args:
+        data: The raw artifact bytes.
+        extension: The file extension, guessed from the content if omitted.
+
+    Returns:
+        The artifact reference ("<sha256>.<extension>").
+    """
+    reference = f"{hashlib.sha256(data).hexdigest()}.{extension or guess_extension(data)}"
+    path = artifact_path(reference)
+
+    if not os.path.exists(path):
+        os.makedirs(ARTIFACT_DIR, exist_ok=True)
+        # Write to a temporary file first so readers never see a partial artifact
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    return reference
+
+
+def is_reference(reference: str) -> bool:
+    """
+    Checks whether a string is a well-formed artifact reference.
+
+    Args:
+        reference: The string to check.
+
+    Returns:
+        True if the string is a valid reference, False otherwise.
+    """
+    return isinstance(reference, str) and REFERENCE_PATTERN.match(reference) is not None
+
+
+def artifact_path(reference: str) -> str:
+    """
+    Resolves an artifact reference to its path on disk.
+
+    Args:
+        reference: The artifact reference.
+
+    Returns:
+        The absolute file path of the artifact.
+
+    Raises:
+        ValueError: If the reference is malformed.
+    """
+    if not is_reference(reference):
+        raise ValueError(f"Invalid artifact reference: {reference!r}")
+    return os.path.abspath(os.path.join(ARTIFACT_DIR, reference))
+
+
+def load_artifact(reference: str) -> bytes:
+    """
+    Reads the bytes of a stored artifact.
+
+    Args:
+        reference: The artifact reference.
+
+    Returns:
+        The raw artifact bytes.
+    """
+    with open(artifact_path(reference), 'rb') as f:
+        return f.read()
+
+
+def mime_type(reference: str) -> str:
+    """
+    Returns the MIME type of an artifact based on its extension.
+
+    Args:
+        reference: The artifact reference.
+
+    Returns:
+        The MIME type string.
+    """
+    return MIME_TYPES.get(reference.rsplit('.', 1)[-1], MIME_TYPES["bin"])
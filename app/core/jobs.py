@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Finished jobs are kept this long for polling clients
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+MAX_JOBS = int(os.getenv("MAX_JOBS", "1000"))
+
+# Job states
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+
+class Job:
+    """
+    Progress of one workflow run that clients poll while it is running. Every
+    stage publishes its result as soon as it is available, so the enhanced prompt
+    and the image can be shown long before the 3D model is ready.
+
+    Attributes:
+        job_id (str): The ID clients poll with.
+        session_id (str): The session ID of the workflow run.
+        status (str): "running", "completed" or "failed".
+        stage (Optional[str]): The last stage that published a result.
+        outcome (Optional[str]): The workflow outcome once finished.
+        results (Dict[str, Any]): The results published so far, e.g. enhanced_prompt or image_ref.
+        events (List[Dict[str, Any]]): One entry per published stage with its time.
+        version (int): Incremented on every change, for long polling.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, session_id: str):
+        """
+        Initializes a running job.
+
+        Args:
+            session_id (str): The session ID of the workflow run.
+        """
+        self.job_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.status = STATUS_RUNNING
+        self.stage: Optional[str] = None
+        self.outcome: Optional[str] = None
+        self.results: Dict[str, Any] = {}
+        self.events: List[Dict[str, Any]] = []
+        self.version = 0
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self._changed = threading.Condition()
+
+    # ----------------------------------------------------------------------
+    def publish(self, stage: str, **results: Any) -> None:
+        """
+        Records the result of a finished stage and wakes up waiting pollers.
+
+        Args:
+            stage (str): The stage name, e.g. "enhancement" or "text_to_image".
+            **results (Any): The stage results, e.g. image_ref.
+        """
+        with self._changed:
+            self.stage = stage
+            self.results.update(results)
+            self.updated_at = time.time()
+            self.events.append({"stage": stage, "elapsed": round(self.updated_at - self.created_at, 3)})
+            self.version += 1
+            self._changed.notify_all()
+
+    # ----------------------------------------------------------------------
+    def finish(self, outcome: str, message: Optional[str]) -> None:
+        """
+        Marks the job as finished.
+
+        Args:
+            outcome (str): The workflow outcome ("success", "partial", "invalid" or "error").
+            message (Optional[str]): The final response message.
+        """
+        with self._changed:
+            self.status = STATUS_COMPLETED if outcome in ("success", "partial") else STATUS_FAILED
+            self.outcome = outcome
+            self.results["message"] = message
+            self.updated_at = time.time()
+            self.version += 1
+            self._changed.notify_all()
+
+    # ----------------------------------------------------------------------
+    def wait_for_update(self, since: int, timeout: float) -> None:
+        """
+        Blocks until the job changed after the given version, finished or the timeout elapsed.
+
+        Args:
+            since (int): The version the client has already seen.
+            timeout (float): Maximum number of seconds to wait.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self.version > since or self.status != STATUS_RUNNING, timeout)
+
+    # ----------------------------------------------------------------------
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns a JSON-serializable snapshot of the job.
+
+        Returns:
+            Dict[str, Any]: The job state and results.
+        """
+        with self._changed:
+            return {
+                "job_id": self.job_id,
+                "session_id": self.session_id,
+                "status": self.status,
+                "stage": self.stage,
+                "outcome": self.outcome,
+                "version": self.version,
+                "results": dict(self.results),
+                "events": list(self.events),
+            }
+
+
+_jobs: "OrderedDict[str, Job]" = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+def _evict_jobs() -> None:
+    """Drops expired finished jobs and, above MAX_JOBS, the oldest finished ones."""
+    now = time.time()
+    for job_id, job in list(_jobs.items()):
+        if job.status != STATUS_RUNNING and (now - job.updated_at > JOB_TTL_SECONDS or len(_jobs) > MAX_JOBS):
+            del _jobs[job_id]
+
+
+def create_job(session_id: str) -> Job:
+    """
+    Registers a new running job.
+
+    Args:
+        session_id: The session ID of the workflow run.
+
+    Returns:
+        The job.
+    """
+    job = Job(session_id)
+    with _jobs_lock:
+        _evict_jobs()
+        _jobs[job.job_id] = job
+    return job
+
+
+def get_job(job_id: str) -> Optional[Job]:
+    """
+    Looks up a job.
+
+    Args:
+        job_id: The job ID.
+
+    Returns:
+        The job, or None if it is unknown or expired.
+    """
+    with _jobs_lock:
+        return _jobs.get(job_id)
@@ -1,7 +1,14 @@
-from typing import Optional, Union
+from typing import TYPE_CHECKING, Optional, Union
 
-from openfabric_pysdk.helper import Proxy
-from openfabric_pysdk.helper.proxy import ExecutionResult
+from core.resilience import DeadlineExceeded
+
+if TYPE_CHECKING:
+    from openfabric_pysdk.helper import Proxy
+    from openfabric_pysdk.helper.proxy import ExecutionResult
+
+
+class RemoteExecutionError(Exception):
+    """Raised when the proxy app reports a failed or cancelled execution."""
 
 
 class Remote:
@@ -27,7 +34,7 @@ class Remote:
         """
         self.proxy_url = proxy_url
         self.proxy_tag = proxy_tag
-        self.client: Optional[Proxy] = None
+        self.client: Optional['Proxy'] = None
 
     # ----------------------------------------------------------------------
     def connect(self) -> 'Remote':
@@ -37,11 +44,13 @@ class Remote:
         Returns:
             Remote: The current instance for chaining.
         """
+        from openfabric_pysdk.helper import Proxy
+
         self.client = Proxy(self.proxy_url, self.proxy_tag, ssl_verify=False)
         return self
 
     # ----------------------------------------------------------------------
-    def execute(self, inputs: dict, uid: str) -> Union[ExecutionResult, None]:
+    def execute(self, inputs: dict, uid: str) -> Union['ExecutionResult', None]:
         """
         Executes an asynchronous request using the proxy client.
 
@@ -59,32 +68,38 @@ class Remote:
 
     # ----------------------------------------------------------------------
     @staticmethod
-    def get_response(output: ExecutionResult) -> Union[dict, None]:
+    def get_response(output: 'ExecutionResult', timeout: Optional[float] = None) -> Union[dict, None]:
         """
         Waits for the result and processes the output.
 
         Args:
             output (ExecutionResult): The result returned from a proxy request.
+            timeout (Optional[float]): Maximum number of seconds to wait, None to wait indefinitely.
 
         Returns:
             Union[dict, None]: The response data if successful, None otherwise.
 
         Raises:
-            Exception: If the request failed or was cancelled.
+            RemoteExecutionError: If the request failed or was cancelled.
+            DeadlineExceeded: If no response arrived within the timeout; the request is cancelled.
         """
         if output is None:
             return None
 
-        output.wait()
+        # The SDK treats a timeout of 0 as "wait forever"
+        finished = output.wait(timeout) if timeout else output.wait()
         status = str(output.status()).lower()
         if status == "completed":
             return output.data()
         if status in ("cancelled", "failed"):
-            raise Exception("The request to the proxy app failed or was cancelled!")
+            raise RemoteExecutionError(f"The request to the proxy app ended with status {status}!")
+        if timeout and not finished:
+            output.cancel()
+            raise DeadlineExceeded(f"The proxy app did not respond within {timeout:.0f}s")
         return None
 
     # ----------------------------------------------------------------------
-    def execute_sync(self, inputs: dict, configs: dict, uid: str) -> Union[dict, None]:
+    def execute_sync(self, inputs: dict, configs: dict, uid: str, timeout: Optional[float] = None) -> Union[dict, None]:
         """
         Executes a synchronous request with configuration parameters.
 
@@ -92,6 +107,7 @@ class Remote:
             inputs (dict): The input payload.
             configs (dict): Additional configuration parameters.
             uid (str): A unique identifier for the request.
+            timeout (Optional[float]): Maximum number of seconds to wait for the result.
 
         Returns:
             Union[dict, None]: The processed response, or None if not connected.
@@ -100,4 +116,4 @@ class Remote:
             return None
 
         output = self.client.execute(inputs, configs, uid)
-        return Remote.get_response(output)
+        return Remote.get_response(output, timeout)
@@ -0,0 +1,278 @@
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, Type, TypeVar
+
+from logger.logging import logger
+from observability.metrics import CIRCUIT_STATE, CIRCUIT_TRIPS, DEADLINES_EXCEEDED, RETRIES
+
+T = TypeVar("T")
+
+# Deadline of each external stage in seconds, retries included
+STAGE_TIMEOUTS: Dict[str, float] = {
+    "intent_analysis": float(os.getenv("INTENT_ANALYSIS_TIMEOUT", "60")),
+    "enhancement": float(os.getenv("ENHANCEMENT_TIMEOUT", "180")),
+    "text_to_image": float(os.getenv("TEXT_TO_IMAGE_TIMEOUT", "180")),
+    "image_to_3d": float(os.getenv("IMAGE_TO_3D_TIMEOUT", "600")),
+}
+
+# Retry and circuit breaker configuration
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "10"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+# Values of the app_circuit_state gauge
+STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when an operation did not finish before its deadline."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency after consecutive failures, so that requests fail
+    fast instead of waiting for a degraded node. After the reset timeout a single
+    trial call is let through (half-open); its result closes or reopens the circuit.
+
+    Attributes:
+        name (str): The protected dependency, e.g. an app ID or "ollama".
+        failure_threshold (int): Consecutive failures that open the circuit.
+        reset_timeout (float): Seconds the circuit stays open before a trial call.
+        state (str): "closed", "open" or "half_open".
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_SECONDS):
+        """
+        Initializes a closed circuit breaker.
+
+        Args:
+            name (str): The protected dependency.
+            failure_threshold (int): Consecutive failures that open the circuit.
+            reset_timeout (float): Seconds the circuit stays open before a trial call.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.set(STATE_VALUES["closed"], name=name)
+
+    # ----------------------------------------------------------------------
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        CIRCUIT_STATE.set(STATE_VALUES[state], name=self.name)
+
+    # ----------------------------------------------------------------------
+    def allow(self) -> bool:
+        """
+        Checks whether a call may go through and claims the trial call when the
+        reset timeout has elapsed.
+
+        Returns:
+            bool: True if the call may be made.
+        """
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._set_state("half_open")
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    # ----------------------------------------------------------------------
+    def record_success(self) -> None:
+        """Closes the circuit and resets the failure count."""
+        with self._lock:
+            self._failures = 0
+            self._trial_running = False
+            if self.state != "closed":
+                logger.info("[Circuit %s] Closed after a successful call.", self.name)
+                self._set_state("closed")
+
+    # ----------------------------------------------------------------------
+    def record_failure(self) -> None:
+        """Counts a failure and opens the circuit at the threshold or after a failed trial."""
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self.state == "half_open" or (self.state == "closed" and self._failures >= self.failure_threshold):
+                logger.warning("[Circuit %s] Opened after %s consecutive failures.", self.name, self._failures)
+                self._opened_at = time.monotonic()
+                self._set_state("open")
+                CIRCUIT_TRIPS.inc(name=self.name)
+
+    # ----------------------------------------------------------------------
+    def release(self) -> None:
+        """Ends a call that neither failed nor proved the dependency healthy, e.g. a rejected request."""
+        with self._lock:
+            self._trial_running = False
+
+    # ----------------------------------------------------------------------
+    def call(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Calls a function through the breaker.
+
+        Args:
+            func (Callable): The function to call.
+            *args: Positional arguments for the function.
+            **kwargs: Keyword arguments for the function.
+
+        Returns:
+            The return value of the function.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit for '{self.name}' is open, failing fast")
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Returns the process-wide circuit breaker of a dependency, creating it on first use.
+
+    Args:
+        name: The protected dependency, e.g. an app ID or "ollama".
+
+    Returns:
+        The shared circuit breaker.
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def backoff_delay(attempt: int, base_delay: float = RETRY_BASE_DELAY, max_delay: float = RETRY_MAX_DELAY) -> float:
+    """
+    Exponential backoff with full jitter.
+
+    Args:
+        attempt: The number of the failed attempt, starting at 1.
+        base_delay: The delay cap after the first failure.
+        max_delay: The upper bound of the delay cap.
+
+    Returns:
+        A random delay between 0 and min(max_delay, base_delay * 2 ** (attempt - 1)).
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+
+def call_with_retries(
+    operation: str,
+    func: Callable[[float], T],
+    timeout: float,
+    breaker: Optional[CircuitBreaker] = None,
+    attempts: int = RETRY_ATTEMPTS,
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+    retryable: Optional[Callable[[BaseException], bool]] = None,
+) -> T:
+    """
+    Calls a function until it succeeds, the attempts are used up or the deadline
+    passes. Each attempt gets the time left until the deadline, and the backoff
+    sleeps never run past it. The breaker is consulted once and records one
+    success or failure for the whole call, not one per attempt. Errors that are
+    not retried, e.g. a request the dependency rejected, do not count as failures.
+
+    Args:
+        operation: Name used in logs and the retry metrics, e.g. "text_to_image".
+        func: The operation; it receives the seconds left for this attempt.
+        timeout: The deadline in seconds for all attempts together.
+        breaker: Optional circuit breaker the attempts go through.
+        attempts: The maximum number of attempts.
+        retry_on: Exception types that are worth another attempt.
+        retryable: Optional check that narrows retry_on, e.g. to server errors;
+            errors it rejects are raised at once.
+
+    Returns:
+        The return value of the first successful attempt.
+
+    Raises:
+        CircuitOpenError: If the breaker is open.
+        DeadlineExceeded: If the deadline passed before an attempt succeeded.
+        Exception: The error of the last attempt when it is not retryable or the
+            attempts are used up.
+    """
+    if breaker is not None and not breaker.allow():
+        raise CircuitOpenError(f"Circuit for '{breaker.name}' is open, failing fast")
+
+    try:
+        result = _attempt_until_deadline(operation, func, timeout, attempts, retry_on, retryable)
+    except Exception as e:
+        if breaker is not None:
+            if _is_retryable(e, retry_on, retryable) or isinstance(e, DeadlineExceeded):
+                breaker.record_failure()
+            else:
+                breaker.release()
+        raise
+    if breaker is not None:
+        breaker.record_success()
+    return result
+
+
+def _is_retryable(error: BaseException, retry_on: Tuple[Type[BaseException], ...],
+                  retryable: Optional[Callable[[BaseException], bool]]) -> bool:
+    """Whether call_with_retries treats an error as a failure of the dependency."""
+    return isinstance(error, retry_on) and (retryable is None or retryable(error))
+
+
+def _attempt_until_deadline(
+    operation: str,
+    func: Callable[[float], T],
+    timeout: float,
+    attempts: int,
+    retry_on: Tuple[Type[BaseException], ...],
+    retryable: Optional[Callable[[BaseException], bool]] = None,
+) -> T:
+    """The retry loop of call_with_retries, without the circuit breaker."""
+    deadline = time.monotonic() + timeout
+    timed_out = False
+    for attempt in range(1, attempts + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            if not timed_out:
+                DEADLINES_EXCEEDED.inc(operation=operation)
+            raise DeadlineExceeded(f"{operation} did not complete within {timeout:.0f}s")
+
+        try:
+            return func(remaining)
+        except retry_on as e:
+            if retryable is not None and not retryable(e):
+                raise
+            timed_out = isinstance(e, TimeoutError)
+            if timed_out:
+                DEADLINES_EXCEEDED.inc(operation=operation)
+            delay = backoff_delay(attempt)
+            if attempt == attempts or time.monotonic() + delay >= deadline:
+                raise
+            RETRIES.inc(operation=operation)
+            logger.warning("[%s] Attempt %s/%s failed (%s), retrying in %.2fs.", operation, attempt, attempts, e, delay)
+            time.sleep(delay)
+
+    raise DeadlineExceeded(f"{operation} did not complete within {timeout:.0f}s")
@@ -1,19 +1,60 @@
 import json
-import logging
-import pprint
-from typing import Any, Dict, List, Literal, Tuple
+import os
+import threading
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
-import requests
-
-from core.remote import Remote
-from openfabric_pysdk.helper import has_resource_fields, json_schema_to_marshmallow, resolve_resources
-from openfabric_pysdk.loader import OutputSchemaInst
+from core.remote import Remote, RemoteExecutionError
+from core.resilience import call_with_retries, get_breaker
+from logger.logging import logger
+from observability.metrics import STUB_CONNECTED
+from observability.tracing import span
 
 # Type aliases for clarity
 Manifests = Dict[str, dict]
 Schemas = Dict[str, Tuple[dict, dict]]
 Connections = Dict[str, Remote]
 
+# Deadline of a call whose caller does not set one, retries included
+REMOTE_CALL_TIMEOUT = float(os.getenv("REMOTE_CALL_TIMEOUT", "300"))
+
+# Connected stubs shared by all requests, by their tuple of app IDs
+_stubs: Dict[Tuple[str, ...], 'Stub'] = {}
+_stubs_lock = threading.Lock()
+
+
+def app_urls(app_id: str) -> Tuple[str, str]:
+    """
+    Derives the HTTP base URL and the proxy WebSocket URL of an application.
+
+    App IDs are normally bare hostnames served over TLS; an explicit "http://" or
+    "https://" prefix selects the scheme, e.g. for a local stand-in server.
+
+    Args:
+        app_id (str): The application ID (hostname or URL).
+
+    Returns:
+        Tuple[str, str]: The HTTP base URL and the WebSocket URL of the proxy.
+    """
+    base_url = app_id.strip('/')
+    if not base_url.startswith(("http://", "https://")):
+        base_url = f"https://{base_url}"
+    return base_url, "ws" + base_url[len("http"):] + "/app"
+
+
+class StubCallError(Exception):
+    """
+    Raised when a call to an Openfabric app fails, times out or is rejected by the
+    app's circuit breaker.
+
+    Attributes:
+        app_id (str): The application the call was routed to.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, app_id: str, message: str):
+        super().__init__(f"[{app_id}] {message}")
+        self.app_id = app_id
+
 
 class Stub:
     """
@@ -36,68 +77,118 @@ class Stub:
         Args:
             app_ids (List[str]): A list of application identifiers (hostnames or URLs).
         """
+        import requests
+
+        self._app_ids = list(app_ids)
         self._schema: Schemas = {}
         self._manifest: Manifests = {}
         self._connections: Connections = {}
 
         for app_id in app_ids:
-            base_url = app_id.strip('/')
+            base_url, proxy_url = app_urls(app_id)
 
             try:
                 # Fetch manifest
-                manifest = requests.get(f"https://{base_url}/manifest", timeout=5).json()
-                logging.info(f"[{app_id}] Manifest loaded: {manifest}")
+                manifest = requests.get(f"{base_url}/manifest", timeout=5).json()
+                logger.info("[%s] Manifest loaded.", app_id)
+                logger.debug("[%s] Manifest: %s", app_id, manifest)
                 self._manifest[app_id] = manifest
 
                 # Fetch input schema
-                input_schema = requests.get(f"https://{base_url}/schema?type=input", timeout=5).json()
-                logging.info(f"[{app_id}] Input schema loaded: {input_schema}")
+                input_schema = requests.get(f"{base_url}/schema?type=input", timeout=5).json()
+                logger.debug("[%s] Input schema loaded: %s", app_id, input_schema)
 
                 # Fetch output schema
-                output_schema = requests.get(f"https://{base_url}/schema?type=output", timeout=5).json()
-                logging.info(f"[{app_id}] Output schema loaded: {output_schema}")
+                output_schema = requests.get(f"{base_url}/schema?type=output", timeout=5).json()
+                logger.debug("[%s] Output schema loaded: %s", app_id, output_schema)
                 self._schema[app_id] = (input_schema, output_schema)
 
                 # Establish Remote WebSocket connection
-                self._connections[app_id] = Remote(f"wss://{base_url}/app", f"{app_id}-proxy").connect()
-                logging.info(f"[{app_id}] Connection established.")
+                self._connections[app_id] = Remote(proxy_url, f"{app_id}-proxy").connect()
+                STUB_CONNECTED.set(1 if self._connections[app_id].client.is_connected() else 0, app_id=app_id)
+                logger.info("[%s] Connection established.", app_id)
             except Exception as e:
-                logging.error(f"[{app_id}] Initialization failed: {e}")
+                STUB_CONNECTED.set(0, app_id=app_id)
+                logger.error("[%s] Initialization failed: %s", app_id, e)
 
     # ----------------------------------------------------------------------
-    def call(self, app_id: str, data: Any, uid: str = 'super-user') -> dict:
+    def is_connected(self) -> bool:
         """
-        Sends a request to the specified app via its Remote connection.
+        Checks that every app was initialized and its Remote connection is up.
+
+        Returns:
+            bool: True if all apps can be called.
+        """
+        return len(self._connections) == len(self._app_ids) and all(
+            connection.client.is_connected() for connection in self._connections.values()
+        )
+
+    # ----------------------------------------------------------------------
+    def close(self) -> None:
+        """
+        Disconnects the Remote connections of every app, e.g. when the stub is
+        replaced, so their sockets and background threads do not linger.
+        """
+        for app_id, connection in self._connections.items():
+            disconnect = getattr(connection.client, "disconnect", None)
+            if disconnect is None:
+                continue
+            try:
+                disconnect()
+            except Exception as e:
+                logger.warning("[%s] Could not close the connection: %s", app_id, e)
+        self._connections.clear()
+
+    # ----------------------------------------------------------------------
+    def call(self, app_id: str, data: Any, uid: str = 'super-user', timeout: Optional[float] = None) -> dict:
+        """
+        Sends a request to the specified app via its Remote connection. Failed
+        attempts are retried with backoff until the deadline, through the app's
+        circuit breaker.
 
         Args:
             app_id (str): The application ID to route the request to.
             data (Any): The input data to send to the app.
             uid (str): The unique user/session identifier for tracking (default: 'super-user').
+            timeout (Optional[float]): Deadline in seconds for all attempts (default: REMOTE_CALL_TIMEOUT).
 
         Returns:
             dict: The output data returned by the app.
 
         Raises:
-            Exception: If no connection is found for the provided app ID, or execution fails.
+            StubCallError: If no connection is found for the provided app ID, the
+                circuit is open, or every attempt failed or timed out.
         """
         connection = self._connections.get(app_id)
         if not connection:
-            raise Exception(f"Connection not found for app ID: {app_id}")
+            raise StubCallError(app_id, "Connection not found")
 
-        try:
+        from openfabric_pysdk.helper import has_resource_fields, json_schema_to_marshmallow, resolve_resources
+
+        def attempt(remaining: float) -> dict:
             handler = connection.execute(data, uid)
-            result = connection.get_response(handler)
+            result = connection.get_response(handler, timeout=remaining)
+            if result is None:
+                raise RemoteExecutionError("The proxy app returned no result")
 
             schema = self.schema(app_id, 'output')
             marshmallow = json_schema_to_marshmallow(schema)
             handle_resources = has_resource_fields(marshmallow())
 
             if handle_resources:
-                result = resolve_resources("https://" + app_id + "/resource?reid={reid}", result, marshmallow())
+                result = resolve_resources(app_urls(app_id)[0] + "/resource?reid={reid}", result, marshmallow())
 
             return result
-        except Exception as e:
-            logging.error(f"[{app_id}] Execution failed: {e}")
+
+        with span("stub.call", app_id=app_id, uid=uid) as active:
+            try:
+                # A missing schema (ValueError) is a setup error that no retry fixes
+                return call_with_retries(app_id, attempt, timeout or REMOTE_CALL_TIMEOUT, breaker=get_breaker(app_id),
+                                         retryable=lambda error: not isinstance(error, ValueError))
+            except Exception as e:
+                active.set_error(e)
+                logger.error("[%s] Execution failed: %s", app_id, e)
+                raise StubCallError(app_id, str(e)) from e
 
     # ----------------------------------------------------------------------
     def manifest(self, app_id: str) -> dict:
@@ -139,3 +230,30 @@ class Stub:
             return _output
         else:
             raise ValueError("Type must be either 'input' or 'output'")
+
+
+def get_stub(app_ids: List[str]) -> Stub:
+    """
+    Returns a connected Stub for the given apps, shared by all requests. The
+    manifests, schemas and proxy connections are only fetched when no stub exists
+    yet for these apps or one of its connections is down; the replaced stub's
+    remaining connections are closed.
+
+    Args:
+        app_ids (List[str]): The application identifiers.
+
+    Returns:
+        Stub: The shared stub; apps that could not be initialized are missing from it.
+    """
+    key = tuple(app_ids)
+    stub = _stubs.get(key)
+    if stub is not None and stub.is_connected():
+        return stub
+    with _stubs_lock:
+        stub = _stubs.get(key)
+        if stub is None or not stub.is_connected():
+            replaced, stub = stub, Stub(list(app_ids))
+            _stubs[key] = stub
+            if replaced is not None:
+                replaced.close()
+    return stub
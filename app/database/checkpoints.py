@@ -0,0 +1,164 @@
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+from logger.logging import logger
+from database.memory_manager import get_db_connection
+from observability.tracing import span
+
+# Checkpoints older than this are removed by the maintenance job
+CHECKPOINT_TTL_SECONDS = int(os.getenv("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+
+# Columns that can be written with save_checkpoint
+CHECKPOINT_FIELDS = (
+    "session_id",
+    "prompt",
+    "stage",
+    "enhanced_prompt",
+    "image_ref",
+    "model_ref",
+    "model_status",
+    "persisted",
+    "outcome",
+    "message",
+)
+
+# Stages in workflow order; a checkpoint records the last completed one
+STAGE_ENHANCEMENT = "enhancement"
+STAGE_TEXT_TO_IMAGE = "text_to_image"
+STAGE_IMAGE_TO_3D = "image_to_3d"
+STAGE_COMPLETED = "completed"
+
+_checkpoints_lock = threading.Lock()
+_checkpoints_ready = False
+
+
+def init_checkpoints() -> None:
+    """Creates the "workflow_checkpoints" table in memory.db if it doesn't exist."""
+    global _checkpoints_ready
+
+    with _checkpoints_lock:
+        if _checkpoints_ready:
+            return
+
+        conn = get_db_connection()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS workflow_checkpoints (
+                    idempotency_key TEXT PRIMARY KEY,
+                    session_id TEXT NOT NULL,
+                    prompt TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    enhanced_prompt TEXT,
+                    image_ref TEXT,
+                    model_ref TEXT,
+                    model_status TEXT,
+                    persisted INTEGER NOT NULL DEFAULT 0,
+                    outcome TEXT,
+                    message TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.commit()
+            _checkpoints_ready = True
+        finally:
+            conn.close()
+
+
+def load_checkpoint(idempotency_key: str) -> Optional[Dict[str, Any]]:
+    """
+    Loads the checkpoint of a workflow run.
+
+    Args:
+        idempotency_key: The key the client sent with the request.
+
+    Returns:
+        The checkpoint columns as a dictionary, or None if there is no checkpoint.
+    """
+    init_checkpoints()
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row
+    try:
+        with span("sqlite.select_checkpoint"):
+            row = conn.execute(
+                "SELECT * FROM workflow_checkpoints WHERE idempotency_key = ?", (idempotency_key,)
+            ).fetchone()
+        return dict(row) if row else None
+    except sqlite3.Error as e:
+        logger.error("Failed to load checkpoint '%s': %s", idempotency_key, e, exc_info=True)
+        return None
+    finally:
+        conn.close()
+
+
+def save_checkpoint(idempotency_key: str, **fields: Any) -> None:
+    """
+    Creates or updates the checkpoint of a workflow run. Only the given columns are
+    overwritten, so each stage records just its own result.
+
+    Args:
+        idempotency_key: The key the client sent with the request.
+        **fields: Checkpoint columns, see CHECKPOINT_FIELDS. A new checkpoint needs
+            at least session_id, prompt and stage.
+
+    Raises:
+        ValueError: If an unknown column is given.
+    """
+    unknown = set(fields) - set(CHECKPOINT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown checkpoint fields: {sorted(unknown)}")
+
+    init_checkpoints()
+    columns = list(fields)
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns)
+    conn = get_db_connection()
+    try:
+        with span("sqlite.upsert_checkpoint"):
+            # SQLite checks NOT NULL before the upsert, so a stage that only writes its
+            # own columns has to update the existing row instead of inserting
+            cursor = conn.execute(
+                f"UPDATE workflow_checkpoints SET {', '.join(f'{column} = ?' for column in columns)}, "
+                f"updated_at = CURRENT_TIMESTAMP WHERE idempotency_key = ?",
+                (*fields.values(), idempotency_key)
+            )
+            if cursor.rowcount == 0:
+                conn.execute(
+                    f"INSERT INTO workflow_checkpoints (idempotency_key, {', '.join(columns)}) "
+                    f"VALUES (?, {', '.join('?' for _ in columns)}) "
+                    f"ON CONFLICT(idempotency_key) DO UPDATE SET {updates}, updated_at = CURRENT_TIMESTAMP",
+                    (idempotency_key, *fields.values())
+                )
+            conn.commit()
+        logger.info("Checkpoint '%s' saved at stage %s.", idempotency_key, fields.get("stage", "(unchanged)"))
+    except sqlite3.Error as e:
+        # A lost checkpoint only costs the resume, never the request itself
+        logger.error("Failed to save checkpoint '%s': %s", idempotency_key, e, exc_info=True)
+    finally:
+        conn.close()
+
+
+def purge_checkpoints(max_age_seconds: int = CHECKPOINT_TTL_SECONDS) -> int:
+    """
+    Deletes checkpoints that were not updated within the given age.
+
+    Args:
+        max_age_seconds: The maximum age of a kept checkpoint.
+
+    Returns:
+        The number of deleted checkpoints.
+    """
+    init_checkpoints()
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(
+            "DELETE FROM workflow_checkpoints WHERE updated_at < datetime('now', ?)",
+            (f"-{int(max_age_seconds)} seconds",)
+        )
+        conn.commit()
+        if cursor.rowcount:
+            logger.info("[Maintenance] Purged %s expired workflow checkpoints.", cursor.rowcount)
+        return cursor.rowcount
+    finally:
+        conn.close()
@@ -0,0 +1,86 @@
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+from logger.logging import logger
+from database.memory_manager import get_db_connection
+from observability.tracing import span
+
+_config_lock = threading.Lock()
+_config_ready = False
+
+
+def init_config_store() -> None:
+    """Creates the "app_configs" table in memory.db if it doesn't exist."""
+    global _config_ready
+
+    with _config_lock:
+        if _config_ready:
+            return
+
+        conn = get_db_connection()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS app_configs (
+                    uid TEXT PRIMARY KEY,
+                    config TEXT NOT NULL,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.commit()
+            _config_ready = True
+        finally:
+            conn.close()
+
+
+def save_config(uid: str, config: Dict[str, Any]) -> bool:
+    """
+    Stores the configuration of a user so that every worker process sees it.
+
+    Args:
+        uid: The user ID.
+        config: The JSON-serializable configuration, e.g. {"app_ids": [...]}.
+
+    Returns:
+        True if the configuration was stored, False on a database error.
+    """
+    init_config_store()
+    conn = get_db_connection()
+    try:
+        with span("sqlite.upsert_config"):
+            conn.execute(
+                "INSERT INTO app_configs (uid, config) VALUES (?, ?) "
+                "ON CONFLICT(uid) DO UPDATE SET config = excluded.config, updated_at = CURRENT_TIMESTAMP",
+                (uid, json.dumps(config))
+            )
+            conn.commit()
+        return True
+    except sqlite3.Error as e:
+        logger.error("Failed to store config for user '%s': %s", uid, e, exc_info=True)
+        return False
+    finally:
+        conn.close()
+
+
+def load_config(uid: str) -> Optional[Dict[str, Any]]:
+    """
+    Loads the stored configuration of a user.
+
+    Args:
+        uid: The user ID.
+
+    Returns:
+        The configuration, or None if there is none or it cannot be read.
+    """
+    init_config_store()
+    conn = get_db_connection()
+    try:
+        with span("sqlite.select_config"):
+            row = conn.execute("SELECT config FROM app_configs WHERE uid = ?", (uid,)).fetchone()
+        return json.loads(row[0]) if row else None
+    except (sqlite3.Error, ValueError) as e:
+        logger.error("Failed to load config for user '%s': %s", uid, e, exc_info=True)
+        return None
+    finally:
+        conn.close()
@@ -0,0 +1,420 @@
+import argparse
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from logger.logging import logger
+from database.checkpoints import purge_checkpoints
+from database.retention import apply_retention
+from database.memory_manager import (
+    COLLECTION_METADATA,
+    COLLECTION_NAME,
+    chroma_write_lock,
+    get_db_connection,
+    get_embedding_function,
+    init_chromadb,
+    reset_chromadb,
+    set_active_collection_name,
+    vector_metadata,
+)
+
+# Maintenance defaults
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_VACUUM_PAGES = 256
+DEFAULT_DUTY_CYCLE = 0.2
+
+
+class Throttle:
+    """
+    Keeps a maintenance job below a target share of wall-clock time so that
+    foreground queries against the same stores are not starved.
+
+    Attributes:
+        duty_cycle (float): Fraction of wall time the job may spend working (0 < duty_cycle <= 1).
+        min_pause (float): Minimum pause in seconds between two batches.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, duty_cycle: float = DEFAULT_DUTY_CYCLE, min_pause: float = 0.0):
+        """
+        Initializes the throttle.
+
+        Args:
+            duty_cycle (float): Fraction of wall time the job may spend working.
+            min_pause (float): Minimum pause in seconds between two batches.
+        """
+        if not 0 < duty_cycle <= 1:
+            raise ValueError("duty_cycle must be in the range (0, 1]")
+        self.duty_cycle = duty_cycle
+        self.min_pause = min_pause
+        self._started: Optional[float] = None
+
+    # ----------------------------------------------------------------------
+    def __enter__(self) -> 'Throttle':
+        self._started = time.monotonic()
+        return self
+
+    # ----------------------------------------------------------------------
+    def __exit__(self, *exc) -> None:
+        worked = time.monotonic() - self._started
+        pause = max(self.min_pause, worked * (1.0 / self.duty_cycle - 1.0))
+        if pause > 0:
+            time.sleep(pause)
+
+
+def vacuum_sqlite(pages_per_step: int = DEFAULT_VACUUM_PAGES, throttle: Optional[Throttle] = None) -> int:
+    """
+    Reclaims free pages in memory.db using incremental vacuum.
+
+    The first run on a database that was created without incremental auto-vacuum
+    switches the mode and performs a single full VACUUM; later runs only release
+    free pages in small steps so writers are never blocked for long.
+
+    Args:
+        pages_per_step: Number of free pages released per step.
+        throttle: Optional throttle applied between steps.
+
+    Returns:
+        The number of pages released.
+    """
+    throttle = throttle or Throttle()
+    released = 0
+    conn = get_db_connection()
+    try:
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        if auto_vacuum != 2:
+            logger.info("Switching memory.db to incremental auto-vacuum (one-time full VACUUM)...")
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            logger.info("memory.db full VACUUM completed.")
+            return released
+
+        while True:
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if free_pages == 0:
+                break
+
+            step = min(free_pages, pages_per_step)
+            with throttle:
+                conn.execute(f"PRAGMA incremental_vacuum({step})").fetchall()
+            released += step
+
+        logger.info("Incremental vacuum released %s pages from memory.db.", released)
+        return released
+
+    except sqlite3.Error as e:
+        logger.error("Error vacuuming SQLite DB: %s", e, exc_info=True)
+        return released
+    finally:
+        conn.close()
+
+
+def _chroma_ids(collection, batch_size: int, throttle: Throttle) -> Set[str]:
+    """
+    Pages through a collection and returns every stored id.
+
+    Args:
+        collection: The ChromaDB collection to scan.
+        batch_size: Number of ids fetched per page.
+        throttle: Throttle applied between pages.
+
+    Returns:
+        A set with all ids in the collection.
+    """
+    ids: Set[str] = set()
+    offset = 0
+    while True:
+        with throttle:
+            page = collection.get(include=[], limit=batch_size, offset=offset)
+        page_ids = page.get("ids") or []
+        ids.update(page_ids)
+        if len(page_ids) < batch_size:
+            return ids
+        offset += batch_size
+
+
+def verify_consistency(
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    repair: bool = True,
+    throttle: Optional[Throttle] = None
+) -> Dict[str, List[str]]:
+    """
+    Cross-checks ids between the "prompts" table and the vector collection.
+
+    Vectors without a SQLite row are deleted, and SQLite rows with an enhanced
+    prompt but no vector are re-embedded and added back to the collection.
+
+    Args:
+        batch_size: Number of records handled per batch.
+        repair: If False, only report the orphans without changing anything.
+        throttle: Optional throttle applied between batches.
+
+    Returns:
+        A dictionary with the orphaned "vector_ids" and "row_ids".
+    """
+    throttle = throttle or Throttle()
+    report: Dict[str, List[str]] = {"vector_ids": [], "row_ids": []}
+
+    _, collection = init_chromadb()
+    if not collection:
+        return report
+
+    vector_ids = _chroma_ids(collection, batch_size, throttle)
+
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row
+    try:
+        row_ids: Set[str] = set()
+        missing_rows: List[sqlite3.Row] = []
+        last_id = 0
+        while True:
+            with throttle:
+                rows = conn.execute(
+                    "SELECT id, session_id, user_id, enhanced_prompt FROM prompts WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+
+            for row in rows:
+                row_ids.add(str(row["id"]))
+                if row["enhanced_prompt"] and str(row["id"]) not in vector_ids:
+                    missing_rows.append(row)
+    finally:
+        conn.close()
+
+    report["vector_ids"] = sorted(vector_ids - row_ids, key=int)
+    report["row_ids"] = [str(row["id"]) for row in missing_rows]
+    logger.info("Consistency check: %s orphaned vectors, %s rows without vectors.", len(report['vector_ids']), len(report['row_ids']))
+
+    if not repair:
+        return report
+
+    for i in range(0, len(report["vector_ids"]), batch_size):
+        with throttle:
+            collection.delete(ids=report["vector_ids"][i:i + batch_size])
+
+    for i in range(0, len(missing_rows), batch_size):
+        batch = missing_rows[i:i + batch_size]
+        with throttle:
+            collection.add(
+                ids=[str(row["id"]) for row in batch],
+                documents=[row["enhanced_prompt"] for row in batch],
+                metadatas=[vector_metadata(row["session_id"], row["user_id"]) for row in batch]
+            )
+
+    logger.info("Consistency repair completed.")
+    return report
+
+
+def _copy_records(source, target, ids: List[str], batch_size: int, throttle: Throttle) -> None:
+    """
+    Copies the given ids with their stored embeddings from one collection to another.
+
+    Args:
+        source: The collection to read from.
+        target: The collection to write to.
+        ids: The ids to copy.
+        batch_size: Number of records copied per batch.
+        throttle: Throttle applied between batches.
+    """
+    for i in range(0, len(ids), batch_size):
+        with throttle:
+            page: Dict[str, Any] = source.get(
+                ids=ids[i:i + batch_size],
+                include=["embeddings", "documents", "metadatas"]
+            )
+            if page["ids"]:
+                target.upsert(
+                    ids=page["ids"],
+                    embeddings=page["embeddings"],
+                    documents=page["documents"],
+                    metadatas=page["metadatas"]
+                )
+
+
+def _discard_leftovers(client, collection):
+    """
+    Deletes the collections left behind by earlier rebuilds. If the active
+    collection is empty while a leftover still holds vectors, e.g. after a swap was
+    interrupted, the fullest leftover becomes the active collection instead of
+    being discarded.
+
+    Args:
+        client: The ChromaDB client.
+        collection: The active collection.
+
+    Returns:
+        The active collection, which may be an adopted leftover.
+    """
+    names = [c if isinstance(c, str) else c.name for c in client.list_collections()]
+    leftovers = [name for name in names
+                 if name != collection.name and (name == COLLECTION_NAME or name.startswith(f"{COLLECTION_NAME}_"))]
+    if not leftovers:
+        return collection
+
+    if collection.count() == 0:
+        counts = {name: client.get_collection(name, embedding_function=get_embedding_function()).count()
+                  for name in leftovers}
+        fullest = max(counts, key=counts.get)
+        if counts[fullest] > 0:
+            logger.warning("Collection '%s' is empty, adopting '%s' with %s records.",
+                           collection.name, fullest, counts[fullest])
+            with chroma_write_lock:
+                set_active_collection_name(fullest)
+                reset_chromadb()
+            previous = collection.name
+            _, collection = init_chromadb()
+            leftovers = [name for name in leftovers if name != collection.name] + [previous]
+
+    for name in leftovers:
+        logger.info("Deleting the leftover collection '%s'.", name)
+        client.delete_collection(name)
+    return collection
+
+
+def rebuild_vector_index(batch_size: int = DEFAULT_BATCH_SIZE, throttle: Optional[Throttle] = None) -> int:
+    """
+    Rebuilds the HNSW index of the active collection without re-embedding.
+
+    Stored embeddings are copied into a fresh, versioned collection in throttled
+    batches. A final catch-up pass then runs with the writers of this process
+    blocked, copying the records added and dropping the ones deleted meanwhile,
+    and the active collection name in SQLite is switched to the fresh collection.
+    Readers of every process reopen it after their handle to the old collection
+    fails or expires, so a reopen never creates an empty collection.
+
+    Args:
+        batch_size: Number of records copied per batch.
+        throttle: Optional throttle applied between batches.
+
+    Returns:
+        The number of records in the rebuilt collection, or -1 on failure.
+    """
+    throttle = throttle or Throttle()
+
+    try:
+        client, collection = init_chromadb()
+        if not collection:
+            return -1
+        collection = _discard_leftovers(client, collection)
+
+        rebuilt = client.create_collection(
+            name=f"{COLLECTION_NAME}_v{int(time.time() * 1000)}",
+            embedding_function=get_embedding_function(),
+            metadata=COLLECTION_METADATA
+        )
+
+        # Catch-up passes until few records are left for the pass that blocks writers
+        copied: Set[str] = set()
+        while True:
+            pending = sorted(_chroma_ids(collection, batch_size, throttle) - copied)
+            if not pending:
+                break
+            logger.info("Rebuilding vector index: copying %s records...", len(pending))
+            _copy_records(collection, rebuilt, pending, batch_size, throttle)
+            copied.update(pending)
+            if len(pending) <= batch_size:
+                break
+
+        # Writers wait for the last pass, which runs without pauses
+        unthrottled = Throttle(1.0)
+        with chroma_write_lock:
+            current = _chroma_ids(collection, batch_size, unthrottled)
+            _copy_records(collection, rebuilt, sorted(current - copied), batch_size, unthrottled)
+            deleted = sorted(copied - current)
+            for i in range(0, len(deleted), batch_size):
+                rebuilt.delete(ids=deleted[i:i + batch_size])
+            set_active_collection_name(rebuilt.name)
+            reset_chromadb()
+
+        client.delete_collection(collection.name)
+
+        count = rebuilt.count()
+        logger.info("Vector index rebuilt with %s records into '%s'.", count, rebuilt.name)
+        return count
+
+    except Exception as e:
+        logger.error("Error rebuilding the vector index: %s", e, exc_info=True)
+        return -1
+
+
+def run_maintenance(
+    vacuum: bool = True,
+    verify: bool = True,
+    reindex: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    duty_cycle: float = DEFAULT_DUTY_CYCLE,
+    retention: bool = True
+) -> None:
+    """
+    Runs the selected maintenance tasks with a shared throttle. Expired workflow
+    checkpoints are always purged.
+
+    Args:
+        vacuum: Reclaim free pages in memory.db.
+        verify: Check and repair id consistency between SQLite and ChromaDB.
+        reindex: Rebuild the vector index of the "creations" collection.
+        batch_size: Number of records handled per batch.
+        duty_cycle: Fraction of wall time the job may spend working.
+        retention: Archive the generations beyond the TTL or the per-user cap.
+    """
+    throttle = Throttle(duty_cycle)
+
+    purge_checkpoints()
+    # Archived generations need no consistency check or index space
+    if retention:
+        apply_retention(batch_size=batch_size, throttle=throttle)
+    if verify:
+        verify_consistency(batch_size=batch_size, throttle=throttle)
+    if reindex:
+        rebuild_vector_index(batch_size=batch_size, throttle=throttle)
+    if vacuum:
+        vacuum_sqlite(throttle=throttle)
+
+
+def start_background_maintenance(interval_seconds: float, reindex: bool = False) -> threading.Thread:
+    """
+    Runs the maintenance tasks periodically on a daemon thread.
+
+    Args:
+        interval_seconds: Pause between two maintenance runs.
+        reindex: Also rebuild the vector index on every run.
+
+    Returns:
+        The started thread.
+    """
+    def loop():
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                run_maintenance(reindex=reindex)
+            except Exception as e:
+                logger.error("Background maintenance run failed: %s", e, exc_info=True)
+
+    thread = threading.Thread(target=loop, name="memory-maintenance", daemon=True)
+    thread.start()
+    logger.info("Background memory maintenance scheduled every %s seconds.", interval_seconds)
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compacts and repairs the long-term memory stores.")
+    parser.add_argument("--no-vacuum", action="store_true", help="Skip the SQLite vacuum.")
+    parser.add_argument("--no-verify", action="store_true", help="Skip the SQLite/ChromaDB consistency check.")
+    parser.add_argument("--no-retention", action="store_true", help="Skip archiving by MEMORY_TTL_DAYS and MEMORY_MAX_PER_USER.")
+    parser.add_argument("--reindex", action="store_true", help="Rebuild the HNSW vector index.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Records handled per batch.")
+    parser.add_argument("--duty-cycle", type=float, default=DEFAULT_DUTY_CYCLE, help="Share of wall time spent working (0-1].")
+    args = parser.parse_args()
+
+    run_maintenance(
+        vacuum=not args.no_vacuum,
+        verify=not args.no_verify,
+        reindex=args.reindex,
+        batch_size=args.batch_size,
+        duty_cycle=args.duty_cycle,
+        retention=not args.no_retention
+    )
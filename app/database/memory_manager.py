@@ -1,110 +1,397 @@
 import os
+import re
 import uuid
+import hashlib
 import sqlite3
-from typing import List, Tuple, Dict, Any
-import chromadb
-from chromadb.utils import embedding_functions
+import threading
+import time
+from typing import List, Tuple, Dict, Any, Optional
 
 from logger.logging import logger
+from observability.metrics import MEMORY_DEDUPLICATED
+from observability.tracing import span, traced
 
 # Sqlite Datbase and ChromaDB Configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "memory.db")
-CHROMA_DIR = os.path.join(BASE_DIR, "chroma_data")
+DB_PATH = os.getenv("MEMORY_DB_PATH", os.path.join(BASE_DIR, "memory.db"))
+CHROMA_DIR = os.getenv("MEMORY_CHROMA_DIR", os.path.join(BASE_DIR, "chroma_data"))
+COLLECTION_NAME = "creations"  # initial name; rebuilds switch to versioned names (see memory_settings)
+COLLECTION_METADATA = {"hnsw:space": "cosine"} # Using cosine similarity
+
+# Worker processes reopen their read handles this often to see the writes of the
+# memory writer process (0 keeps them open for the life of the process)
+MEMORY_REFRESH_SECONDS = float(os.getenv("MEMORY_REFRESH_SECONDS", "0"))
+
+# A new generation whose enhanced prompt is within this cosine distance of one of
+# the same user's stored prompts updates that record instead (0 disables the check)
+MEMORY_DEDUP_DISTANCE = float(os.getenv("MEMORY_DEDUP_DISTANCE", "0.02"))
+
+# Whitespace runs collapsed before hashing an enhanced prompt
+WHITESPACE_PATTERN = re.compile(r"\s+")
 
 os.makedirs(CHROMA_DIR, exist_ok=True)
 
+# Both stores are opened lazily on first use and shared afterwards
+_init_lock = threading.Lock()
+_sqlite_ready = False
+_chroma_client = None
+_chroma_collection = None
+_chroma_opened_at = 0.0
+_retired_chroma_system = None  # System of the replaced client, stopped on the next refresh
+_embedding_function = None
+
+# Held while adding or deleting vectors; the index rebuild holds it while it switches
+# the readers over to the rebuilt collection, so no write lands in the old one
+chroma_write_lock = threading.RLock()
+
 def get_db_connection():
     """
-    Establishes and returns a connection to the SQLite database.
+    Establishes and returns a connection to the SQLite database, creating the
+    schema on first use.
     
     Returns:
         A sqlite3.Connection object connected to memory.db.
     """
+    if not _sqlite_ready:
+        init_sqlite()
     return sqlite3.connect(DB_PATH)
 
 def init_sqlite():
     """Initializes the SQLite database and creates the "prompts" table if it doesn't exist."""
+    global _sqlite_ready
+
+    conn = None
     try:
-        conn = get_db_connection()
+        conn = sqlite3.connect(DB_PATH)
         conn.row_factory = sqlite3.Row  # Allows accessing columns by name
         c = conn.cursor()
+        # WAL lets the readers of other worker processes run alongside the writer
+        c.execute("PRAGMA journal_mode=WAL")
         c.execute("""
             CREATE TABLE IF NOT EXISTS prompts (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 session_id TEXT NOT NULL,
                 user_prompt TEXT NOT NULL,
                 enhanced_prompt TEXT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                image_ref TEXT,
+                model_ref TEXT,
+                user_id TEXT,
+                prompt_hash TEXT,
+                use_count INTEGER NOT NULL DEFAULT 1,
+                last_used_at DATETIME
             )
         """)
 
+        # These columns were added later; older databases get them here
+        columns = {row['name'] for row in c.execute("PRAGMA table_info(prompts)")}
+        added_columns = {
+            "image_ref": "TEXT",
+            "model_ref": "TEXT",
+            "user_id": "TEXT",
+            "prompt_hash": "TEXT",
+            "use_count": "INTEGER NOT NULL DEFAULT 1",
+            "last_used_at": "DATETIME",
+        }
+        for column, definition in added_columns.items():
+            if column not in columns:
+                c.execute(f"ALTER TABLE prompts ADD COLUMN {column} {definition}")
+
+        # Key-value settings of the memory stores, e.g. the active ChromaDB collection
+        c.execute("CREATE TABLE IF NOT EXISTS memory_settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+        # Write-time deduplication looks up the exact prompt of a user first
+        c.execute("CREATE INDEX IF NOT EXISTS idx_prompts_hash ON prompts(prompt_hash)")
+
+        # The retention job selects by age and by the newest generations per user
+        c.execute("CREATE INDEX IF NOT EXISTS idx_prompts_timestamp ON prompts(timestamp)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_prompts_user ON prompts(user_id, id)")
+
         conn.commit()
+        _sqlite_ready = True
         logger.info("SQLite database initialized successfully.")
 
     except sqlite3.Error as e:
-        logger.error(f"Error initializing SQLite DB: {e}", exc_info=True)
+        logger.error("Error initializing SQLite DB: %s", e, exc_info=True)
     finally:
         if conn:
             conn.close()
 
+def get_active_collection_name() -> str:
+    """
+    Returns the name of the ChromaDB collection that readers and writers use. It is
+    stored in SQLite so that a rebuilt collection is switched to atomically, in all
+    processes.
+
+    Returns:
+        The active collection name, COLLECTION_NAME before the first rebuild.
+    """
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT value FROM memory_settings WHERE key = 'collection'").fetchone()
+        return row[0] if row else COLLECTION_NAME
+    finally:
+        conn.close()
+
+def set_active_collection_name(name: str) -> None:
+    """
+    Switches readers and writers to another ChromaDB collection. Handles that are
+    already open keep using the previous collection until they are reopened.
+
+    Args:
+        name: The collection name.
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute("INSERT OR REPLACE INTO memory_settings (key, value) VALUES ('collection', ?)", (name,))
+        conn.commit()
+    finally:
+        conn.close()
+
+def get_embedding_function():
+    """
+    Returns the embedding function used by the "creations" collection. The model is
+    loaded once per process, or once before forking the workers (see
+    preload_embedding_model) so that they share its memory pages.
+
+    Returns:
+        A SentenceTransformerEmbeddingFunction for the all-mpnet-base-v2 model.
+    """
+    global _embedding_function
+
+    if _embedding_function is None:
+        from chromadb.utils import embedding_functions
+
+        _embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
+            model_name="all-mpnet-base-v2"
+        )
+    return _embedding_function
+
+def preload_embedding_model():
+    """
+    Loads the embedding model and runs one embedding so that all lazily created
+    weights exist. Called in the parent process before the workers are forked.
+
+    Returns:
+        True if the model was loaded, False if it is not available.
+    """
+    try:
+        get_embedding_function()(["warm-up"])
+        return True
+    except Exception as e:
+        logger.warning("Could not preload the embedding model: %s", e)
+        return False
+
 def init_chromadb():
     """
-    Initializes and returns a persistent ChromaDB client.
+    Initializes and returns a persistent ChromaDB client. The client, collection and
+    embedding model are loaded on the first call and reused afterwards.
     
     Returns:
         A tuple of (client, collection) or (None, None) on failure.
     """
+    global _chroma_client, _chroma_collection, _chroma_opened_at
+
+    if _chroma_collection is not None and not _chroma_expired():
+        return _chroma_client, _chroma_collection
+
+    with _init_lock:
+        if _chroma_collection is not None:
+            if not _chroma_expired():
+                return _chroma_client, _chroma_collection
+            _close_chromadb()
+
+        try:
+            import chromadb
+
+            client = chromadb.PersistentClient(path=CHROMA_DIR)
+            # Use a sentence transformer model for creating embeddings
+            embedding_func = get_embedding_function()
+
+            # Get or create the active collection
+            collection_name = get_active_collection_name()
+            collection = client.get_or_create_collection(
+                name=collection_name,
+                embedding_function=embedding_func,
+                metadata=COLLECTION_METADATA
+            )
+            logger.info("ChromaDB client initialized. Collection '%s' is ready.", collection_name)
+            _chroma_client, _chroma_collection = client, collection
+            _chroma_opened_at = time.monotonic()
+            return client, collection
+
+        except Exception as e:
+            logger.error("Error initializing ChromaDB: %s", e, exc_info=True)
+            return None, None
+
+def reset_chromadb():
+    """
+    Drops the cached ChromaDB handles so the next call to init_chromadb reopens them,
+    e.g. after the collection was rebuilt by the maintenance job.
+    """
+    global _chroma_client, _chroma_collection
+
+    with _init_lock:
+        _chroma_client, _chroma_collection = None, None
+
+def _chroma_expired():
+    """Whether the read handles are older than MEMORY_REFRESH_SECONDS."""
+    return MEMORY_REFRESH_SECONDS > 0 and time.monotonic() - _chroma_opened_at > MEMORY_REFRESH_SECONDS
+
+def _close_chromadb():
+    """
+    Drops this module's client so that reopening loads the collection from disk
+    including the writes of other processes. Only its own System is taken out of
+    Chroma's per-path cache; it is stopped on the next refresh, once the queries
+    still running on the old handles are done, instead of being orphaned.
+    """
+    global _chroma_client, _chroma_collection, _retired_chroma_system
+
     try:
-        client = chromadb.PersistentClient(path=CHROMA_DIR)
-        # Use a sentence transformer model for creating embeddings
-        embedding_func = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-mpnet-base-v2"  
-        )
+        from chromadb.api.client import SharedSystemClient
 
-        # Get or create the collection
-        collection = client.get_or_create_collection(
-            name="creations",
-            embedding_function=embedding_func,
-            metadata={"hnsw:space": "cosine"} # Using cosine similarity
-        )
-        logger.info(f"ChromaDB client initialized. Collection 'creations' is ready.")
-        return client, collection
-    
+        if _retired_chroma_system is not None:
+            _retired_chroma_system.stop()
+            _retired_chroma_system = None
+        identifier = _chroma_client._identifier
+        _retired_chroma_system = SharedSystemClient._identifier_to_system.pop(identifier, None)
+        getattr(SharedSystemClient, "_identifier_to_refcount", {}).pop(identifier, None)
+    except Exception as e:
+        logger.warning("Could not release the previous ChromaDB client: %s", e)
+    _chroma_client, _chroma_collection = None, None
+
+
+def hash_prompt(enhanced_prompt: str) -> str:
+    """
+    Hashes an enhanced prompt for exact duplicate detection. Case and runs of
+    whitespace are ignored.
+
+    Args:
+        enhanced_prompt: The enhanced prompt.
+
+    Returns:
+        The hex SHA-256 of the normalized prompt.
+    """
+    normalized = WHITESPACE_PATTERN.sub(" ", enhanced_prompt).strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def _find_duplicate(conn: sqlite3.Connection, prompt_hash: str, enhanced_prompt: str,
+                    user_id: Optional[str]) -> Tuple[Optional[int], Optional[str], Optional[Any]]:
+    """
+    Looks for a stored generation of the same user with the same enhanced prompt:
+    by hash first, then by vector distance.
+
+    Returns:
+        A tuple of (duplicate ID, "exact" or "near", embedding). The embedding of
+        the new prompt is returned when it was computed for the near-duplicate
+        check, so that it is not computed again for the insert.
+    """
+    with span("sqlite.select"):
+        row = conn.execute(
+            "SELECT id FROM prompts WHERE prompt_hash = ? AND user_id IS ? ORDER BY id DESC LIMIT 1",
+            (prompt_hash, user_id)
+        ).fetchone()
+    if row:
+        return row[0], "exact", None
+
+    if MEMORY_DEDUP_DISTANCE <= 0:
+        return None, None, None
+
+    try:
+        _, collection = init_chromadb()
+        if not collection or collection.count() == 0:
+            return None, None, None
+        embedding = get_embedding_function()([enhanced_prompt])[0]
+        with span("chroma.query", k=1):
+            results = collection.query(query_embeddings=[embedding], n_results=1,
+                                       where={"user_id": user_id} if user_id else None)
     except Exception as e:
-        logger.error(f"Error initializing ChromaDB: {e}", exc_info=True)
-        return None, None
+        logger.warning("Near-duplicate check failed, saving as a new record: %s", e)
+        reset_chromadb()
+        return None, None, None
+
+    ids, distances = results["ids"][0], results["distances"][0]
+    if ids and distances[0] <= MEMORY_DEDUP_DISTANCE:
+        row = conn.execute("SELECT id FROM prompts WHERE id = ? AND user_id IS ?", (int(ids[0]), user_id)).fetchone()
+        if row:
+            return row[0], "near", embedding
+    return None, None, embedding
+
+def vector_metadata(session_id: str, user_id: Optional[str] = None) -> Dict[str, str]:
+    """
+    Builds the ChromaDB metadata of a generation. Every writer of vectors uses it,
+    so the per-user near-duplicate lookup finds repaired and imported ones too.
+
+    Args:
+        session_id: The session the generation belongs to.
+        user_id: The user the generation belongs to, if any.
 
+    Returns:
+        The metadata dict.
+    """
+    metadata = {"session_id": session_id}
+    if user_id:
+        metadata["user_id"] = user_id
+    return metadata
 
-def save_generation(session_id: str, user_prompt: str, enhanced_prompt: str) -> int:
+@traced("memory.save_generation")
+def save_generation(session_id: str, user_prompt: str, enhanced_prompt: str,
+                    image_ref: Optional[str] = None, model_ref: Optional[str] = None,
+                    user_id: Optional[str] = None, count_use: bool = True) -> int:
     """
-    Saves a generation record to both SQLite and ChromaDB.
+    Saves a generation record to both SQLite and ChromaDB. If the same user already
+    has a record with the same or a nearly identical enhanced prompt (within
+    MEMORY_DEDUP_DISTANCE), that record's use count, last-used time and artifact
+    references are updated instead of inserting a new row and vector.
 
     Args:
         session_id: The ID of the current user session.
         user_prompt: The original prompt from the user.
         enhanced_prompt: The final enhanced prompt used for generation.
+        image_ref: The artifact reference of the generated image, if any.
+        model_ref: The artifact reference of the generated 3D model, if any.
+        user_id: The user the generation belongs to, for the per-user retention cap.
+        count_use: False when a retry of the same request saves again, e.g. to add the
+            3D model to a generation saved without it; the use count then stays.
 
     Returns:
-        The integer ID of the newly created prompt record, or -1 on failure.
+        The integer ID of the newly created or the updated prompt record, or -1 on failure.
     """
     prompt_id = -1
+    prompt_hash = hash_prompt(enhanced_prompt) if enhanced_prompt else None
+    embedding = None
 
     # 1. Persist in SQLite
     try:
         conn = get_db_connection()
         c = conn.cursor()
-        c.execute(
-            "INSERT INTO prompts (session_id, user_prompt, enhanced_prompt) VALUES (?, ?, ?)",
-            (session_id, user_prompt, enhanced_prompt)
-        )
 
-        prompt_id = c.lastrowid
-        conn.commit()
-        logger.info(f"Saved prompt ID {prompt_id} to SQLite.")
+        if enhanced_prompt:
+            duplicate_id, kind, embedding = _find_duplicate(conn, prompt_hash, enhanced_prompt, user_id)
+            if duplicate_id is not None:
+                with span("sqlite.update"):
+                    c.execute(
+                        "UPDATE prompts SET use_count = use_count + ?, last_used_at = CURRENT_TIMESTAMP, "
+                        "image_ref = COALESCE(?, image_ref), model_ref = COALESCE(?, model_ref) WHERE id = ?",
+                        (1 if count_use else 0, image_ref, model_ref, duplicate_id)
+                    )
+                    conn.commit()
+                MEMORY_DEDUPLICATED.inc(kind=kind)
+                logger.info("Prompt is a %s duplicate of prompt ID %s, updated its usage.", kind, duplicate_id)
+                return duplicate_id
+
+        with span("sqlite.insert"):
+            c.execute(
+                "INSERT INTO prompts (session_id, user_prompt, enhanced_prompt, image_ref, model_ref, user_id, prompt_hash) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session_id, user_prompt, enhanced_prompt, image_ref, model_ref, user_id, prompt_hash)
+            )
+
+            prompt_id = c.lastrowid
+            conn.commit()
+        logger.info("Saved prompt ID %s to SQLite.", prompt_id)
 
     except sqlite3.Error as e:
-        logger.error(f"Failed to save prompt to SQLite: {e}", exc_info=True)
+        logger.error("Failed to save prompt to SQLite: %s", e, exc_info=True)
         return -1
     finally:
         if conn:
@@ -113,27 +400,34 @@ def save_generation(session_id: str, user_prompt: str, enhanced_prompt: str) ->
     # 2. Persist embedding in ChromaDB
     if prompt_id != -1 and enhanced_prompt:
         try:
-            _, collection = init_chromadb()
-            if collection:
-                collection.add(
-                    ids=[str(prompt_id)],
-                    documents=[enhanced_prompt],
-                    metadatas=[{"session_id": session_id}]
-                )
-                logger.info(f"Saved prompt ID {prompt_id} embedding to ChromaDB.")
+            with chroma_write_lock:
+                _, collection = init_chromadb()
+                if collection:
+                    with span("chroma.add"):
+                        collection.add(
+                            ids=[str(prompt_id)],
+                            documents=[enhanced_prompt],
+                            metadatas=[vector_metadata(session_id, user_id)],
+                            embeddings=[embedding] if embedding is not None else None
+                        )
+                    logger.info("Saved prompt ID %s embedding to ChromaDB.", prompt_id)
 
         except Exception as e:
-            logger.error(f"Failed to save embedding to ChromaDB: {e}", exc_info=True)
+            logger.error("Failed to save embedding to ChromaDB: %s", e, exc_info=True)
+            reset_chromadb()
 
     return prompt_id
 
-def find_similar_prompts(query_text: str, k: int = 3) -> List[Dict[str, Any]]:
+@traced("memory.find_similar_prompts")
+def find_similar_prompts(query_text: str, k: int = 3, include_archive: bool = False) -> List[Dict[str, Any]]:
     """
     Finds prompts in ChromaDB that are semantically similar to the query text.
 
     Args:
         query_text: The text to search for.
         k: The number of similar results to return.
+        include_archive: Also scan the generations moved to the archive by the
+            retention policy, which are not searched by default.
 
     Returns:
         A list of dictionaries containing id, user_prompt, enhanced_prompt, timestamp, and similarity distance for each result.
@@ -143,10 +437,11 @@ def find_similar_prompts(query_text: str, k: int = 3) -> List[Dict[str, Any]]:
         if not collection:
             return []
 
-        results = collection.query(
-            query_texts=[query_text],
-            n_results=k
-        )
+        with span("chroma.query", k=k):
+            results = collection.query(
+                query_texts=[query_text],
+                n_results=k
+            )
 
         if not results or not results.get("ids"):
             logger.info("No similar prompts found in ChromaDB")
@@ -154,7 +449,7 @@ def find_similar_prompts(query_text: str, k: int = 3) -> List[Dict[str, Any]]:
 
         retrieved_ids = results["ids"][0]
         distances = results["distances"][0]
-        logger.info(f"ChromaDB returned {len(retrieved_ids)} similar prompts with IDs: {retrieved_ids}")
+        logger.info("ChromaDB returned %s similar prompts with IDs: %s", len(retrieved_ids), retrieved_ids)
 
         # Fetch full data from SQLite using the retrieved IDs
         conn = get_db_connection()
@@ -163,11 +458,12 @@ def find_similar_prompts(query_text: str, k: int = 3) -> List[Dict[str, Any]]:
         
         # Create a placeholder string for the IN clause
         placeholders = ','.join('?' for _ in retrieved_ids)
-        query = f"SELECT id, user_prompt, enhanced_prompt, timestamp FROM prompts WHERE id IN ({placeholders})"
+        query = f"SELECT id, session_id, user_prompt, enhanced_prompt, timestamp, last_used_at FROM prompts WHERE id IN ({placeholders})"
         
-        c.execute(query, retrieved_ids)
-        rows = c.fetchall()
-        logger.info(f"SQLite returned {len(rows)} matching records")
+        with span("sqlite.select"):
+            c.execute(query, retrieved_ids)
+            rows = c.fetchall()
+        logger.info("SQLite returned %s matching records", len(rows))
         
         # Mapping rows to a dictionary for easy lookup
         rows_by_id = {str(row['id']): dict(row) for row in rows}
@@ -179,18 +475,23 @@ def find_similar_prompts(query_text: str, k: int = 3) -> List[Dict[str, Any]]:
                 record = rows_by_id[doc_id]
                 record['distance'] = distances[i]
                 final_results.append(record)
-                logger.info(f"Memory record {doc_id}: id={record.get('id')}, user_prompt='{record.get('user_prompt', '')[:50]}...', enhanced_prompt='{record.get('enhanced_prompt', '')[:50]}...', timestamp={record.get('timestamp')}, distance={record.get('distance')}")
+                logger.info("Memory record %s: id=%s, user_prompt='%s...', enhanced_prompt='%s...', timestamp=%s, distance=%s", doc_id, record.get('id'), record.get('user_prompt', '')[:50], record.get('enhanced_prompt', '')[:50], record.get('timestamp'), record.get('distance'))
 
-        logger.info(f"Returning {len(final_results)} similar prompts with fields: id, user_prompt, enhanced_prompt, timestamp, distance")
+        if include_archive:
+            from database.retention import search_archive
+
+            with span("archive.search", k=k):
+                final_results = sorted(final_results + search_archive(query_text, k),
+                                       key=lambda record: record['distance'])[:k]
+
+        logger.info("Returning %s similar prompts with fields: id, user_prompt, enhanced_prompt, timestamp, distance", len(final_results))
         
         return final_results
     except Exception as e:
-        logger.error(f"Error finding similar prompts: {e}", exc_info=True)
+        logger.error("Error finding similar prompts: %s", e, exc_info=True)
+        reset_chromadb()
         return []
     finally:
         if 'conn' in locals() and conn:
             conn.close()
 
-
-# Initialize on import
-init_sqlite()
\ No newline at end of file
@@ -0,0 +1,280 @@
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+from logger.logging import logger
+from database.memory_manager import (
+    BASE_DIR,
+    chroma_write_lock,
+    get_db_connection,
+    get_embedding_function,
+    init_chromadb,
+    reset_chromadb,
+)
+from observability.metrics import MEMORY_ARCHIVED, MEMORY_HOT_RECORDS
+from observability.tracing import span
+
+# Generations older than this many days are archived (0 disables the TTL)
+MEMORY_TTL_DAYS = float(os.getenv("MEMORY_TTL_DAYS", "0"))
+
+# Most recently used generations kept searchable per user; older ones are archived (0 disables the cap).
+# Generations without a user_id are not capped
+MEMORY_MAX_PER_USER = int(os.getenv("MEMORY_MAX_PER_USER", "0"))
+
+# Separate file for the archived generations and their embeddings
+ARCHIVE_DB_PATH = os.getenv("MEMORY_ARCHIVE_DB_PATH", os.path.join(BASE_DIR, "memory_archive.db"))
+
+# Archived rows scanned per step of an archive search
+ARCHIVE_SCAN_BATCH = 2000
+
+_archive_lock = threading.Lock()
+_archive_ready = False
+
+
+def get_archive_connection() -> sqlite3.Connection:
+    """
+    Returns a connection to the archive database, creating the "prompts_archive"
+    table on first use.
+
+    Returns:
+        A sqlite3.Connection object connected to memory_archive.db.
+    """
+    global _archive_ready
+
+    if not _archive_ready:
+        with _archive_lock:
+            if not _archive_ready:
+                conn = sqlite3.connect(ARCHIVE_DB_PATH)
+                try:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS prompts_archive (
+                            id INTEGER PRIMARY KEY,
+                            session_id TEXT NOT NULL,
+                            user_id TEXT,
+                            user_prompt TEXT NOT NULL,
+                            enhanced_prompt TEXT,
+                            timestamp DATETIME,
+                            image_ref TEXT,
+                            model_ref TEXT,
+                            use_count INTEGER NOT NULL DEFAULT 1,
+                            last_used_at DATETIME,
+                            embedding BLOB,
+                            reason TEXT NOT NULL,
+                            archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                        )
+                    """)
+                    # Usage columns were added later; older archives get them here
+                    columns = {row[1] for row in conn.execute("PRAGMA table_info(prompts_archive)")}
+                    if "use_count" not in columns:
+                        conn.execute("ALTER TABLE prompts_archive ADD COLUMN use_count INTEGER NOT NULL DEFAULT 1")
+                    if "last_used_at" not in columns:
+                        conn.execute("ALTER TABLE prompts_archive ADD COLUMN last_used_at DATETIME")
+                    conn.commit()
+                    _archive_ready = True
+                finally:
+                    conn.close()
+    return sqlite3.connect(ARCHIVE_DB_PATH)
+
+
+def _cold_ids(conn: sqlite3.Connection, ttl_days: float, max_per_user: int, limit: int) -> Dict[int, str]:
+    """
+    Selects up to limit generations that fall out of the retention policy.
+    The cap keeps each user's most recently used generations, so a prompt that
+    keeps being reused is not archived for being old. Anonymous generations (no
+    user_id) are only subject to the TTL: they do not belong to one user, so
+    capping them as a group would archive everyone's.
+
+    Returns:
+        The reason ("ttl" or "cap") by prompt id.
+    """
+    cold: Dict[int, str] = {}
+    if ttl_days > 0:
+        rows = conn.execute(
+            "SELECT id FROM prompts WHERE COALESCE(last_used_at, timestamp) < datetime('now', ?) ORDER BY id LIMIT ?",
+            (f"-{ttl_days} days", limit)
+        ).fetchall()
+        cold.update((row[0], "ttl") for row in rows)
+
+    if max_per_user > 0 and len(cold) < limit:
+        rows = conn.execute("""
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY user_id ORDER BY COALESCE(last_used_at, timestamp) DESC, id DESC
+                ) AS newer
+                FROM prompts WHERE user_id IS NOT NULL
+            ) WHERE newer > ? ORDER BY id LIMIT ?
+        """, (max_per_user, limit)).fetchall()
+        for row in rows:
+            if len(cold) >= limit:
+                break
+            cold.setdefault(row[0], "cap")
+    return cold
+
+
+def _archive_batch(conn: sqlite3.Connection, collection, cold: Dict[int, str]) -> None:
+    """
+    Moves one batch of generations to the archive. The rows and their embeddings
+    are written to the archive first, then the vectors and the rows are removed,
+    so an interrupted batch is archived again on the next run.
+    """
+    import numpy as np
+
+    ids = list(cold)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(
+        f"SELECT id, session_id, user_id, user_prompt, enhanced_prompt, timestamp, image_ref, model_ref, "
+        f"use_count, last_used_at FROM prompts WHERE id IN ({','.join('?' for _ in ids)})", ids
+    ).fetchall()
+    conn.row_factory = None
+
+    embeddings: Dict[str, bytes] = {}
+    if collection is not None:
+        with span("chroma.get", records=len(ids)):
+            page = collection.get(ids=[str(i) for i in ids], include=["embeddings"])
+        if page.get("embeddings") is not None:
+            for doc_id, embedding in zip(page["ids"], page["embeddings"]):
+                embeddings[doc_id] = np.asarray(embedding, dtype=np.float32).tobytes()
+
+    archive = get_archive_connection()
+    try:
+        with span("sqlite.archive", records=len(rows)):
+            archive.executemany(
+                "INSERT OR REPLACE INTO prompts_archive (id, session_id, user_id, user_prompt, enhanced_prompt, "
+                "timestamp, image_ref, model_ref, use_count, last_used_at, embedding, reason) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(row['id'], row['session_id'], row['user_id'], row['user_prompt'], row['enhanced_prompt'],
+                  row['timestamp'], row['image_ref'], row['model_ref'], row['use_count'], row['last_used_at'],
+                  embeddings.get(str(row['id'])), cold[row['id']]) for row in rows]
+            )
+            archive.commit()
+    finally:
+        archive.close()
+
+    if collection is not None:
+        with chroma_write_lock, span("chroma.delete", records=len(ids)):
+            collection.delete(ids=[str(i) for i in ids])
+    with span("sqlite.delete", records=len(ids)):
+        conn.execute(f"DELETE FROM prompts WHERE id IN ({','.join('?' for _ in ids)})", ids)
+        conn.commit()
+
+    for reason in ("ttl", "cap"):
+        archived = sum(1 for row in rows if cold[row['id']] == reason)
+        if archived:
+            MEMORY_ARCHIVED.inc(archived, reason=reason)
+
+
+def apply_retention(
+    batch_size: int = 500,
+    throttle: Optional[Any] = None,
+    ttl_days: float = MEMORY_TTL_DAYS,
+    max_per_user: int = MEMORY_MAX_PER_USER
+) -> int:
+    """
+    Moves the generations that were last used before the TTL or are beyond the
+    per-user cap out of the searchable stores into the archive, in throttled batches.
+
+    Args:
+        batch_size: Number of generations moved per batch.
+        throttle: Optional maintenance Throttle applied between batches.
+        ttl_days: Maximum age in days, 0 to disable.
+        max_per_user: Generations kept per user, 0 to disable.
+
+    Returns:
+        The number of archived generations.
+    """
+    if ttl_days <= 0 and max_per_user <= 0:
+        return 0
+
+    _, collection = init_chromadb()
+    if collection is None:
+        # Deleting rows whose vectors cannot be removed would leave orphans behind
+        logger.warning("[Retention] ChromaDB is unavailable, skipping the retention run.")
+        return 0
+
+    archived = 0
+    conn = get_db_connection()
+    try:
+        while True:
+            cold = _cold_ids(conn, ttl_days, max_per_user, batch_size)
+            if not cold:
+                break
+            if throttle is not None:
+                with throttle:
+                    _archive_batch(conn, collection, cold)
+            else:
+                _archive_batch(conn, collection, cold)
+            archived += len(cold)
+
+        MEMORY_HOT_RECORDS.set(conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0])
+    except Exception as e:
+        logger.error("[Retention] Archiving failed after %s generations: %s", archived, e, exc_info=True)
+        reset_chromadb()
+    finally:
+        conn.close()
+
+    if archived:
+        logger.info("[Retention] Archived %s generations to %s.", archived, ARCHIVE_DB_PATH)
+    return archived
+
+
+def search_archive(query_text: str, k: int = 3) -> List[Dict[str, Any]]:
+    """
+    Finds archived generations similar to the query text by scanning the stored
+    embeddings. The archive is not indexed, so this is only used on request.
+
+    Args:
+        query_text: The text to search for.
+        k: The number of results to return.
+
+    Returns:
+        Up to k records with id, user_prompt, enhanced_prompt, timestamp, distance
+        and archived=True, nearest first.
+    """
+    import numpy as np
+
+    if not os.path.exists(ARCHIVE_DB_PATH):
+        return []
+
+    query = np.asarray(get_embedding_function()([query_text])[0], dtype=np.float32)
+    query /= np.linalg.norm(query) or 1.0
+
+    best: List[tuple] = []
+    conn = get_archive_connection()
+    try:
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, embedding FROM prompts_archive WHERE id > ? AND embedding IS NOT NULL ORDER BY id LIMIT ?",
+                (last_id, ARCHIVE_SCAN_BATCH)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            matrix = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+            norms = np.linalg.norm(matrix, axis=1)
+            distances = 1.0 - matrix @ query / np.where(norms == 0, 1.0, norms)
+            best.extend((max(0.0, float(distance)), row[0]) for distance, row in zip(distances, rows))
+            best = sorted(best)[:k]
+
+        if not best:
+            return []
+        conn.row_factory = sqlite3.Row
+        ids = [doc_id for _, doc_id in best]
+        rows_by_id = {row['id']: dict(row) for row in conn.execute(
+            f"SELECT id, user_prompt, enhanced_prompt, timestamp FROM prompts_archive "
+            f"WHERE id IN ({','.join('?' for _ in ids)})", ids
+        )}
+    finally:
+        conn.close()
+
+    results = []
+    for distance, doc_id in best:
+        if doc_id in rows_by_id:
+            record = rows_by_id[doc_id]
+            record['distance'] = distance
+            record['archived'] = True
+            results.append(record)
+    return results
@@ -0,0 +1,212 @@
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from logger.logging import logger
+from database.memory_manager import find_similar_prompts
+from observability.metrics import MEMORY_RERANKS, MEMORY_RETRIEVALS
+from observability.tracing import span, traced
+
+# Nearest memories fetched as candidates for re-ranking
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "5"))
+
+# Candidates farther than this cosine distance are never injected into the enhancement
+RETRIEVAL_MAX_DISTANCE = float(os.getenv("RETRIEVAL_MAX_DISTANCE", "0.5"))
+
+# Re-ranking weights: the recency bonus halves every RETRIEVAL_RECENCY_HALF_LIFE_DAYS,
+# the session bonus applies to memories of the requesting session
+RETRIEVAL_RECENCY_WEIGHT = float(os.getenv("RETRIEVAL_RECENCY_WEIGHT", "0.1"))
+RETRIEVAL_RECENCY_HALF_LIFE_DAYS = float(os.getenv("RETRIEVAL_RECENCY_HALF_LIFE_DAYS", "14"))
+RETRIEVAL_SESSION_WEIGHT = float(os.getenv("RETRIEVAL_SESSION_WEIGHT", "0.05"))
+
+# Optional sentence-transformers cross-encoder that re-scores the candidates against
+# the prompt, e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2" (empty disables it)
+RETRIEVAL_CROSS_ENCODER = os.getenv("RETRIEVAL_CROSS_ENCODER", "")
+RETRIEVAL_CROSS_ENCODER_WEIGHT = float(os.getenv("RETRIEVAL_CROSS_ENCODER_WEIGHT", "0.5"))
+
+# Time the whole retrieval may take; the cross-encoder is skipped when its expected
+# duration would not fit into what is left after the vector search
+RETRIEVAL_BUDGET_MS = float(os.getenv("RETRIEVAL_BUDGET_MS", "250"))
+
+# While the cross-encoder is skipped as over budget, one request this often scores
+# with it anyway to measure it again, e.g. after a slow outlier (0 never re-probes)
+RETRIEVAL_CROSS_ENCODER_REPROBE_SECONDS = float(os.getenv("RETRIEVAL_CROSS_ENCODER_REPROBE_SECONDS", "60"))
+
+_cross_encoder = None
+_cross_encoder_failed = False
+_cross_encoder_lock = threading.Lock()
+_cross_encoder_seconds: Optional[float] = None  # moving average of the scoring time
+_cross_encoder_measured_at = 0.0  # monotonic time of the last measurement or re-probe
+
+
+def get_cross_encoder():
+    """
+    Returns the configured cross-encoder, loaded once per process.
+
+    Returns:
+        The CrossEncoder, or None if none is configured or it cannot be loaded.
+    """
+    global _cross_encoder, _cross_encoder_failed
+
+    if not RETRIEVAL_CROSS_ENCODER or _cross_encoder_failed:
+        return None
+    if _cross_encoder is None:
+        with _cross_encoder_lock:
+            if _cross_encoder is None:
+                try:
+                    from sentence_transformers import CrossEncoder
+
+                    _cross_encoder = CrossEncoder(RETRIEVAL_CROSS_ENCODER)
+                    logger.info("[Retrieval] Loaded cross-encoder %s.", RETRIEVAL_CROSS_ENCODER)
+                except Exception as e:
+                    logger.warning("[Retrieval] Could not load cross-encoder %s, re-ranking without it: %s",
+                                   RETRIEVAL_CROSS_ENCODER, e)
+                    _cross_encoder_failed = True
+                    return None
+    return _cross_encoder
+
+
+def prime_cross_encoder() -> bool:
+    """
+    Scores a warm-up pair twice: the first call pays the one-off setup of the
+    model, the second seeds the scoring time estimate, so the first request is not
+    judged by a cold call.
+
+    Returns:
+        True if the cross-encoder is loaded and primed, False if none is available.
+    """
+    global _cross_encoder_seconds, _cross_encoder_measured_at
+
+    encoder = get_cross_encoder()
+    if encoder is None:
+        return False
+    pairs = [("warm-up", "warm-up")] * max(1, RETRIEVAL_CANDIDATES)
+    encoder.predict(pairs[:1])
+    started = time.perf_counter()
+    encoder.predict(pairs)
+    _cross_encoder_seconds = time.perf_counter() - started
+    _cross_encoder_measured_at = time.monotonic()
+    logger.info("[Retrieval] Cross-encoder scores %s candidates in %.1f ms.", len(pairs), _cross_encoder_seconds * 1000)
+    return True
+
+
+def _claim_reprobe() -> bool:
+    """Lets one over-budget request re-measure the cross-encoder per re-probe interval."""
+    global _cross_encoder_measured_at
+
+    if RETRIEVAL_CROSS_ENCODER_REPROBE_SECONDS <= 0:
+        return False
+    with _cross_encoder_lock:
+        now = time.monotonic()
+        if now - _cross_encoder_measured_at < RETRIEVAL_CROSS_ENCODER_REPROBE_SECONDS:
+            return False
+        _cross_encoder_measured_at = now
+        return True
+
+
+def _age_days(record: Dict[str, Any]) -> Optional[float]:
+    """Days since the memory was created or last reused."""
+    value = record.get('last_used_at') or record.get('timestamp')
+    try:
+        stored = datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return None
+    # SQLite's CURRENT_TIMESTAMP is UTC without an offset
+    if stored.tzinfo is None:
+        stored = stored.replace(tzinfo=timezone.utc)
+    return max(0.0, (datetime.now(timezone.utc) - stored).total_seconds() / 86400)
+
+
+def _heuristic_score(record: Dict[str, Any], session_id: Optional[str]) -> float:
+    """Similarity plus the recency and session affinity bonuses."""
+    score = 1.0 - record['distance']
+    age = _age_days(record)
+    if age is not None and RETRIEVAL_RECENCY_HALF_LIFE_DAYS > 0:
+        score += RETRIEVAL_RECENCY_WEIGHT * math.pow(0.5, age / RETRIEVAL_RECENCY_HALF_LIFE_DAYS)
+    if session_id and record.get('session_id') == session_id:
+        score += RETRIEVAL_SESSION_WEIGHT
+    return score
+
+
+def _cross_encoder_scores(query_text: str, candidates: List[Dict[str, Any]],
+                          remaining: float) -> Tuple[Optional[List[float]], str]:
+    """
+    Scores the candidates with the cross-encoder if it is expected to finish in
+    the remaining budget. While it is not, a request every
+    RETRIEVAL_CROSS_ENCODER_REPROBE_SECONDS scores anyway and its time replaces
+    the estimate, so one slow call does not disable the cross-encoder for good.
+
+    Returns:
+        A tuple of (relevance in [0, 1] per candidate or None if it was skipped,
+        the re-ranking mode: "cross_encoder", "heuristic" or "over_budget").
+    """
+    global _cross_encoder_seconds, _cross_encoder_measured_at
+
+    encoder = get_cross_encoder()
+    if encoder is None:
+        return None, "heuristic"
+    reprobe = False
+    if _cross_encoder_seconds is not None and _cross_encoder_seconds > remaining:
+        if not _claim_reprobe():
+            return None, "over_budget"
+        reprobe = True
+
+    started = time.perf_counter()
+    with span("retrieval.cross_encoder", candidates=len(candidates), reprobe=reprobe):
+        logits = encoder.predict([(query_text, record['enhanced_prompt'] or "") for record in candidates])
+    elapsed = time.perf_counter() - started
+    if _cross_encoder_seconds is None or reprobe:
+        _cross_encoder_seconds = elapsed
+    else:
+        _cross_encoder_seconds = 0.8 * _cross_encoder_seconds + 0.2 * elapsed
+    _cross_encoder_measured_at = time.monotonic()
+    return [1.0 / (1.0 + math.exp(-float(logit))) for logit in logits], "cross_encoder"
+
+
+@traced("memory.retrieve_memory")
+def retrieve_memory(query_text: str, session_id: Optional[str] = None,
+                    max_distance: float = RETRIEVAL_MAX_DISTANCE) -> Optional[Dict[str, Any]]:
+    """
+    Picks the long-term memory to base the enhancement on. A few nearest memories
+    are fetched, the ones farther than max_distance are dropped and the rest are
+    re-ranked by similarity, recency and session affinity, and by the cross-encoder
+    when one is configured and fits into RETRIEVAL_BUDGET_MS.
+
+    Args:
+        query_text: The user's prompt.
+        session_id: The requesting session, whose memories get a bonus.
+        max_distance: The largest cosine distance a memory may have.
+
+    Returns:
+        The best memory record with its distance and score, or None if no memory
+        is close enough.
+    """
+    started = time.perf_counter()
+    candidates = find_similar_prompts(query_text, k=RETRIEVAL_CANDIDATES)
+    close = [record for record in candidates if record['distance'] <= max_distance]
+    if not close:
+        MEMORY_RETRIEVALS.inc(result="filtered" if candidates else "empty")
+        if candidates:
+            logger.info("[Retrieval] Nearest memory at distance %.3f is above %.3f, none used.",
+                        min(record['distance'] for record in candidates), max_distance)
+        return None
+
+    for record in close:
+        record['score'] = _heuristic_score(record, session_id)
+
+    if len(close) > 1:
+        remaining = RETRIEVAL_BUDGET_MS / 1000 - (time.perf_counter() - started)
+        relevance, mode = _cross_encoder_scores(query_text, close, remaining)
+        MEMORY_RERANKS.inc(mode=mode)
+        if relevance is not None:
+            for record, value in zip(close, relevance):
+                record['score'] = (1 - RETRIEVAL_CROSS_ENCODER_WEIGHT) * record['score'] + RETRIEVAL_CROSS_ENCODER_WEIGHT * value
+
+    best = max(close, key=lambda record: record['score'])
+    MEMORY_RETRIEVALS.inc(result="hit")
+    logger.info("[Retrieval] Using memory ID %s (distance %.3f, score %.3f) out of %s candidates in %.1f ms.",
+                best.get('id'), best['distance'], best['score'], len(close), (time.perf_counter() - started) * 1000)
+    return best
@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from logger.logging import logger
+from core.artifacts import artifact_path
+from database.memory_manager import get_db_connection, init_chromadb, reset_chromadb
+from observability.metrics import SEMANTIC_CACHE_FALSE_HITS, SEMANTIC_CACHE_LOOKUPS
+from observability.tracing import span
+
+# Cosine distance under which an earlier generation is reused (0 disables the cache)
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.05"))
+
+# Nearest neighbours checked for one with stored artifacts
+SEMANTIC_CACHE_CANDIDATES = int(os.getenv("SEMANTIC_CACHE_CANDIDATES", "3"))
+
+# A request repeated with use_cache=false within this many seconds of a hit counts as a false hit
+SEMANTIC_CACHE_FEEDBACK_SECONDS = float(os.getenv("SEMANTIC_CACHE_FEEDBACK_SECONDS", "600"))
+MAX_TRACKED_HITS = 1000
+
+# Recent hits by user prompt, to recognize the user rejecting a cached result
+_recent_hits: "OrderedDict[str, float]" = OrderedDict()
+_recent_hits_lock = threading.Lock()
+
+
+def _artifact_exists(reference: Optional[str]) -> bool:
+    try:
+        return bool(reference) and os.path.exists(artifact_path(reference))
+    except ValueError:
+        return False
+
+
+def lookup_generation(user_prompt: str, enhanced_prompt: str,
+                      threshold: float = SEMANTIC_CACHE_THRESHOLD) -> Optional[Dict[str, Any]]:
+    """
+    Finds an earlier generation whose enhanced prompt is nearly identical and whose
+    image and 3D model are still stored.
+
+    Args:
+        user_prompt: The user's prompt, remembered on a hit for the false-hit metric.
+        enhanced_prompt: The enhanced prompt about to be generated.
+        threshold: The largest cosine distance that counts as a hit.
+
+    Returns:
+        The prompts row with its distance, or None on a miss.
+    """
+    if threshold <= 0:
+        return None
+
+    try:
+        _, collection = init_chromadb()
+        if not collection:
+            return None
+
+        with span("chroma.query", k=SEMANTIC_CACHE_CANDIDATES):
+            results = collection.query(query_texts=[enhanced_prompt], n_results=SEMANTIC_CACHE_CANDIDATES)
+        ids, distances = results["ids"][0], results["distances"][0]
+        close = {doc_id: distance for doc_id, distance in zip(ids, distances) if distance <= threshold}
+        if not close:
+            SEMANTIC_CACHE_LOOKUPS.inc(result="miss")
+            return None
+
+        conn = get_db_connection()
+        conn.row_factory = sqlite3.Row
+        try:
+            with span("sqlite.select"):
+                rows = conn.execute(
+                    f"SELECT id, user_prompt, enhanced_prompt, image_ref, model_ref FROM prompts "
+                    f"WHERE id IN ({','.join('?' for _ in close)}) AND image_ref IS NOT NULL AND model_ref IS NOT NULL",
+                    list(close)
+                ).fetchall()
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.error("[Semantic Cache] Lookup failed: %s", e, exc_info=True)
+        reset_chromadb()
+        return None
+
+    candidates = sorted((close[str(row['id'])], dict(row)) for row in rows)
+    for distance, record in candidates:
+        if _artifact_exists(record['image_ref']) and _artifact_exists(record['model_ref']):
+            record['distance'] = distance
+            SEMANTIC_CACHE_LOOKUPS.inc(result="hit")
+            with _recent_hits_lock:
+                _recent_hits[user_prompt] = time.monotonic()
+                _recent_hits.move_to_end(user_prompt)
+                while len(_recent_hits) > MAX_TRACKED_HITS:
+                    _recent_hits.popitem(last=False)
+            logger.info("[Semantic Cache] Hit: prompt ID %s at distance %.4f.", record['id'], distance)
+            return record
+
+    # Close enough, but the artifacts are gone or were never stored
+    SEMANTIC_CACHE_LOOKUPS.inc(result="stale" if candidates else "miss")
+    return None
+
+
+def record_cache_opt_out(user_prompt: str) -> None:
+    """
+    Notes a request that opted out of the cache. If the same prompt was just served
+    from the cache, the user rejected that result and it is counted as a false hit.
+
+    Args:
+        user_prompt: The user's prompt.
+    """
+    with _recent_hits_lock:
+        hit_at = _recent_hits.pop(user_prompt, None)
+    if hit_at is not None and time.monotonic() - hit_at <= SEMANTIC_CACHE_FEEDBACK_SECONDS:
+        SEMANTIC_CACHE_FALSE_HITS.inc()
+        logger.info("[Semantic Cache] Cached result for '%s' was rejected.", user_prompt)
@@ -0,0 +1,374 @@
+"""
+Bulk export and import of the long-term memory store.
+
+The "prompts" rows are streamed together with their stored embeddings into an
+Arrow IPC stream file of compressed record batches, so records move between
+nodes without copying memory.db and chroma_data by hand and without
+re-embedding them on import. pyarrow is only needed for these commands.
+
+Usage (from the ``app`` directory):
+    python -m database.transfer export memory.arrow [--batch-size 5000]
+    python -m database.transfer import memory.arrow [--keep-ids]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from logger.logging import logger
+from database.memory_manager import get_db_connection, init_chromadb, reset_chromadb, vector_metadata
+from database.retention import ARCHIVE_DB_PATH, get_archive_connection
+
+# Rows per record batch in the file, and per vector fetch or add
+DEFAULT_BATCH_SIZE = 5000
+
+# Rows inserted per SQLite transaction on import
+DEFAULT_TRANSACTION_ROWS = 20000
+
+# Record batch compression: "zstd", "lz4" or "none"
+DEFAULT_COMPRESSION = "zstd"
+
+# Extra columns next to the "prompts" columns
+EMBEDDING_COLUMN = "embedding"
+METADATA_COLUMN = "vector_metadata"
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError("Memory import/export needs pyarrow: poetry install --with transfer") from e
+    return pyarrow
+
+
+def _prompt_columns(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
+    """The (name, declared type) pairs of the "prompts" table."""
+    return [(row[1], (row[2] or "").upper()) for row in conn.execute("PRAGMA table_info(prompts)")]
+
+
+def _arrow_schema(pa, columns: List[Tuple[str, str]]):
+    fields = []
+    for name, declared in columns:
+        if "INT" in declared:
+            fields.append(pa.field(name, pa.int64()))
+        elif "REAL" in declared or "FLOA" in declared:
+            fields.append(pa.field(name, pa.float64()))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    fields.append(pa.field(EMBEDDING_COLUMN, pa.list_(pa.float32())))
+    fields.append(pa.field(METADATA_COLUMN, pa.string()))
+    return pa.schema(fields)
+
+
+def _embedding_array(pa, np, embeddings: List[Optional[Any]]):
+    """
+    Builds the embedding column from the stored vectors in one pass over numpy
+    buffers. Rows without a vector get an empty list.
+    """
+    lengths = np.array([0 if e is None else len(e) for e in embeddings], dtype=np.int32)
+    offsets = np.zeros(len(embeddings) + 1, dtype=np.int32)
+    np.cumsum(lengths, out=offsets[1:])
+    present = [np.asarray(e, dtype=np.float32) for e in embeddings if e is not None]
+    values = np.concatenate(present) if present else np.zeros(0, dtype=np.float32)
+    return pa.ListArray.from_arrays(pa.array(offsets), pa.array(values, type=pa.float32()))
+
+
+def _fetch_vectors(collection, ids: List[str]) -> Dict[str, Tuple[Any, Optional[Dict[str, Any]]]]:
+    """The stored embedding and metadata by id, for the ids that have a vector."""
+    if collection is None:
+        return {}
+    page = collection.get(ids=ids, include=["embeddings", "metadatas"])
+    embeddings = page.get("embeddings")
+    if embeddings is None:
+        return {}
+    metadatas = page.get("metadatas") or [None] * len(page["ids"])
+    return {doc_id: (embedding, metadata)
+            for doc_id, embedding, metadata in zip(page["ids"], embeddings, metadatas)}
+
+
+def export_memory(path: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                  compression: str = DEFAULT_COMPRESSION) -> int:
+    """
+    Streams every "prompts" row with its embedding into an Arrow IPC stream file.
+    Rows are read in id order, batch_size at a time, so memory use does not grow
+    with the size of the store.
+
+    Args:
+        path: The file to write.
+        batch_size: The number of rows per record batch.
+        compression: The record batch compression, "zstd", "lz4" or "none".
+
+    Returns:
+        The number of exported rows.
+    """
+    pa = _require_pyarrow()
+    import numpy as np
+
+    _, collection = init_chromadb()
+    if collection is None:
+        logger.warning("[Transfer] ChromaDB is unavailable, exporting the rows without embeddings.")
+
+    conn = get_db_connection()
+    exported = with_vectors = 0
+    started = time.monotonic()
+    try:
+        columns = _prompt_columns(conn)
+        names = [name for name, _ in columns]
+        schema = _arrow_schema(pa, columns)
+        options = pa.ipc.IpcWriteOptions(compression=None if compression == "none" else compression)
+
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_stream(sink, schema, options=options) as writer:
+            last_id = 0
+            while True:
+                rows = conn.execute(
+                    f"SELECT {', '.join(names)} FROM prompts WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+                id_index = names.index("id")
+                last_id = rows[-1][id_index]
+
+                vectors = _fetch_vectors(collection, [str(row[id_index]) for row in rows])
+                embeddings, metadatas = [], []
+                for row in rows:
+                    embedding, metadata = vectors.get(str(row[id_index]), (None, None))
+                    embeddings.append(embedding)
+                    metadatas.append(json.dumps(metadata) if metadata else None)
+
+                arrays = [pa.array([row[i] for row in rows], type=schema.field(i).type) for i in range(len(names))]
+                arrays.append(_embedding_array(pa, np, embeddings))
+                arrays.append(pa.array(metadatas, type=pa.string()))
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+
+                exported += len(rows)
+                with_vectors += len(vectors)
+                logger.info("[Transfer] Exported %s rows...", exported)
+    finally:
+        conn.close()
+
+    logger.info("[Transfer] Exported %s rows (%s with embeddings) to %s in %.1fs.",
+                exported, with_vectors, path, time.monotonic() - started)
+    return exported
+
+
+def _read_batches(path: str) -> Iterator[Any]:
+    pa = _require_pyarrow()
+    with pa.memory_map(path, "r") as source:
+        reader = pa.ipc.open_stream(source)
+        for batch in reader:
+            yield batch
+
+
+def _add_vectors(collection, ids: List[str], embeddings: List[Any], documents: List[str],
+                 metadatas: List[Dict[str, Any]], batch_size: int) -> None:
+    """Adds vectors in chunks that fit the collection's maximum batch size."""
+    try:
+        batch_size = min(batch_size, collection._client.get_max_batch_size())
+    except Exception:
+        pass
+    for i in range(0, len(ids), batch_size):
+        chunk = slice(i, i + batch_size)
+        collection.upsert(ids=ids[chunk], embeddings=embeddings[chunk],
+                          documents=documents[chunk], metadatas=metadatas[chunk])
+
+
+def _next_free_id(conn: sqlite3.Connection) -> int:
+    """
+    Returns the id after the largest one ever assigned. Archived rows are gone from
+    "prompts" but keep their ids in the archive, so MAX(id) alone would hand them
+    out again; the AUTOINCREMENT sequence and the archive are taken into account.
+    """
+    largest = conn.execute("SELECT COALESCE(MAX(id), 0) FROM prompts").fetchone()[0]
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'prompts'").fetchone()
+    if sequence is not None:
+        largest = max(largest, sequence[0] or 0)
+    if os.path.exists(ARCHIVE_DB_PATH):
+        archive = get_archive_connection()
+        try:
+            largest = max(largest, archive.execute("SELECT COALESCE(MAX(id), 0) FROM prompts_archive").fetchone()[0])
+        finally:
+            archive.close()
+    return largest + 1
+
+
+def _archived_ids(ids: List[Any]) -> set:
+    """Returns the ids among the given ones that belong to archived rows."""
+    archived = set()
+    if not os.path.exists(ARCHIVE_DB_PATH):
+        return archived
+    archive = get_archive_connection()
+    try:
+        for i in range(0, len(ids), 900):
+            chunk = [row_id for row_id in ids[i:i + 900] if row_id is not None]
+            if chunk:
+                archived.update(row[0] for row in archive.execute(
+                    f"SELECT id FROM prompts_archive WHERE id IN ({','.join('?' for _ in chunk)})", chunk))
+    finally:
+        archive.close()
+    return archived
+
+
+def import_memory(path: str, keep_ids: bool = False, batch_size: int = DEFAULT_BATCH_SIZE,
+                  transaction_rows: int = DEFAULT_TRANSACTION_ROWS) -> Dict[str, int]:
+    """
+    Bulk-loads an export file. Rows are inserted with executemany in transactions
+    of transaction_rows rows, and their stored embeddings are added to ChromaDB
+    in batches without re-embedding. Rows exported without a vector are embedded
+    from their enhanced prompt.
+
+    Without keep_ids the rows get new ids after the largest one ever used, archived
+    rows included, so an export can be merged into a populated store. With
+    keep_ids the exported ids are kept and rows whose id already exists, in the
+    store or in the archive, are skipped.
+
+    Args:
+        path: The export file.
+        keep_ids: Keep the exported ids instead of appending.
+        batch_size: The number of vectors per ChromaDB add.
+        transaction_rows: The number of rows per SQLite transaction.
+
+    Returns:
+        The counts of "imported", "skipped", "embedded" (stored vectors reused)
+        and "reembedded" rows.
+
+    Raises:
+        ValueError: If keep_ids is set and the file has rows without an id.
+    """
+    import numpy as np
+
+    counts = {"imported": 0, "skipped": 0, "embedded": 0, "reembedded": 0}
+    _, collection = init_chromadb()
+    if collection is None:
+        logger.warning("[Transfer] ChromaDB is unavailable, importing the rows without embeddings.")
+
+    conn = get_db_connection()
+    conn.isolation_level = None
+    conn.execute("PRAGMA synchronous=NORMAL")
+    started = time.monotonic()
+    in_transaction = 0
+    pending: List[Tuple[str, Any, str, Dict[str, Any]]] = []
+
+    def flush_vectors():
+        if collection is None or not pending:
+            pending.clear()
+            return
+        stored = [item for item in pending if item[1] is not None]
+        missing = [item for item in pending if item[1] is None]
+        try:
+            if stored:
+                _add_vectors(collection, [i[0] for i in stored], np.stack([i[1] for i in stored]),
+                             [i[2] for i in stored], [i[3] for i in stored], batch_size)
+            if missing:
+                collection.upsert(ids=[i[0] for i in missing], documents=[i[2] for i in missing],
+                                  metadatas=[i[3] for i in missing])
+            counts["embedded"] += len(stored)
+            counts["reembedded"] += len(missing)
+        except Exception as e:
+            # The rows are committed; the maintenance consistency check embeds them later
+            logger.error("[Transfer] Failed to add %s vectors, run database.maintenance to repair: %s",
+                         len(pending), e, exc_info=True)
+            reset_chromadb()
+        pending.clear()
+
+    try:
+        table_columns = {name for name, _ in _prompt_columns(conn)}
+        next_id = None
+        for batch in _read_batches(path):
+            names = [name for name in batch.schema.names if name in table_columns]
+            data = {name: batch.column(name).to_pylist() for name in names}
+            embeddings = batch.column(EMBEDDING_COLUMN).to_numpy(zero_copy_only=False) \
+                if EMBEDDING_COLUMN in batch.schema.names else [None] * batch.num_rows
+            metadatas = batch.column(METADATA_COLUMN).to_pylist() \
+                if METADATA_COLUMN in batch.schema.names else [None] * batch.num_rows
+
+            if not conn.in_transaction:
+                # A write lock for the whole transaction keeps the assigned ids free
+                conn.execute("BEGIN IMMEDIATE")
+                next_id = _next_free_id(conn)
+
+            ids = data.get("id") or [None] * batch.num_rows
+            keep = list(range(batch.num_rows))
+            if keep_ids:
+                if None in ids:
+                    raise ValueError(f"{path} has rows without an id, import it without --keep-ids")
+                existing = set()
+                for i in range(0, len(ids), 900):
+                    chunk = ids[i:i + 900]
+                    existing.update(row[0] for row in conn.execute(
+                        f"SELECT id FROM prompts WHERE id IN ({','.join('?' for _ in chunk)})", chunk))
+                existing.update(_archived_ids(ids))
+                keep = [i for i in keep if ids[i] not in existing]
+                counts["skipped"] += batch.num_rows - len(keep)
+                new_ids = [ids[i] for i in keep]
+            else:
+                new_ids = list(range(next_id, next_id + len(keep)))
+                next_id += len(keep)
+
+            columns = ["id"] + [name for name in names if name != "id"]
+            rows = [[new_id] + [data[name][i] for name in columns[1:]] for new_id, i in zip(new_ids, keep)]
+            conn.executemany(
+                f"INSERT INTO prompts ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})", rows)
+            in_transaction += len(rows)
+            counts["imported"] += len(rows)
+
+            enhanced = data.get("enhanced_prompt") or [None] * batch.num_rows
+            sessions = data.get("session_id") or [None] * batch.num_rows
+            user_ids = data.get("user_id") or [None] * batch.num_rows
+            for new_id, i in zip(new_ids, keep):
+                if not enhanced[i]:
+                    continue
+                metadata = json.loads(metadatas[i]) if metadatas[i] else vector_metadata(sessions[i], user_ids[i])
+                embedding = embeddings[i] if embeddings[i] is not None and len(embeddings[i]) else None
+                pending.append((str(new_id), embedding, enhanced[i], metadata))
+
+            if in_transaction >= transaction_rows:
+                conn.execute("COMMIT")
+                in_transaction = 0
+                flush_vectors()
+                logger.info("[Transfer] Imported %s rows...", counts["imported"])
+
+        if conn.in_transaction:
+            conn.execute("COMMIT")
+        flush_vectors()
+
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    logger.info("[Transfer] Imported %s rows from %s in %.1fs: %s skipped, %s stored embeddings reused, %s re-embedded.",
+                counts["imported"], path, time.monotonic() - started,
+                counts["skipped"], counts["embedded"], counts["reembedded"])
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Write the memory store to an Arrow IPC file.")
+    export_parser.add_argument("path", help="The file to write.")
+    export_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per record batch.")
+    export_parser.add_argument("--compression", choices=("zstd", "lz4", "none"), default=DEFAULT_COMPRESSION,
+                               help="Record batch compression.")
+
+    import_parser = commands.add_parser("import", help="Load an export file into the memory store.")
+    import_parser.add_argument("path", help="The export file.")
+    import_parser.add_argument("--keep-ids", action="store_true",
+                               help="Keep the exported ids and skip existing ones instead of appending.")
+    import_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Vectors per ChromaDB add.")
+    import_parser.add_argument("--transaction-rows", type=int, default=DEFAULT_TRANSACTION_ROWS,
+                               help="Rows per SQLite transaction.")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_memory(args.path, batch_size=args.batch_size, compression=args.compression)
+    else:
+        import_memory(args.path, keep_ids=args.keep_ids, batch_size=args.batch_size,
+                      transaction_rows=args.transaction_rows)
@@ -0,0 +1,75 @@
+import multiprocessing
+from typing import Any, Optional
+
+from logger.logging import logger
+from database.memory_manager import save_generation
+
+# Seconds the writer gets to drain its queue on shutdown
+WRITER_SHUTDOWN_TIMEOUT = 30.0
+
+# Queue of the memory writer process, set in worker processes only
+_writer_queue: Optional[multiprocessing.Queue] = None
+
+
+def run_writer(generations: multiprocessing.Queue) -> None:
+    """
+    Body of the memory writer process: persists queued generations one at a time
+    until it receives None, so SQLite and ChromaDB only ever have a single writer.
+
+    Args:
+        generations: The queue the worker processes submit generations to.
+    """
+    logger.info("[Writer] Memory writer started.")
+    while True:
+        item = generations.get()
+        if item is None:
+            break
+        try:
+            save_generation(**item)
+        except Exception as e:
+            logger.error("[Writer] Failed to persist generation of session %s: %s",
+                         item.get("session_id"), e, exc_info=True)
+    logger.info("[Writer] Memory writer stopped.")
+
+
+def stop_writer(process: multiprocessing.Process, generations: multiprocessing.Queue) -> None:
+    """
+    Lets the writer persist what is queued and stops it.
+
+    Args:
+        process: The writer process.
+        generations: Its queue.
+    """
+    generations.put(None)
+    process.join(WRITER_SHUTDOWN_TIMEOUT)
+    if process.is_alive():
+        logger.warning("[Writer] Did not drain its queue in time, terminating.")
+        process.terminate()
+
+
+def use_writer(generations: Optional[multiprocessing.Queue]) -> None:
+    """
+    Routes submit_generation of this process to the writer process.
+
+    Args:
+        generations: The writer queue, or None to persist in-process again.
+    """
+    global _writer_queue
+    _writer_queue = generations
+
+
+def submit_generation(**generation: Any) -> Optional[int]:
+    """
+    Persists a generation, through the writer process when this is a worker.
+
+    Args:
+        **generation: The keyword arguments of save_generation.
+
+    Returns:
+        The prompt ID when saved in-process, None when queued for the writer.
+    """
+    if _writer_queue is None:
+        return save_generation(**generation)
+    _writer_queue.put(generation)
+    logger.info("Queued generation of session %s for the memory writer.", generation.get("session_id"))
+    return None
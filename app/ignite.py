@@ -1,5 +1,30 @@
+import os
+
 from openfabric_pysdk.starter import Starter
 
+from database.maintenance import start_background_maintenance
+from server.sidecar import start_sidecar
+from warmup import start_background_warmup
+from workers import WORKERS, run_workers
+
 if __name__ == '__main__':
     PORT = 8888
+
+    # Periodic compaction of the memory stores, disabled unless an interval is set
+    maintenance_interval = float(os.getenv("MEMORY_MAINTENANCE_INTERVAL", "0"))
+
+    # Several worker processes with a shared config store and a single memory writer
+    if WORKERS > 1:
+        run_workers(maintenance_interval=maintenance_interval)
+        raise SystemExit(0)
+
+    if maintenance_interval > 0:
+        start_background_maintenance(maintenance_interval)
+
+    # Artifact server for generated images and 3D models
+    start_sidecar()
+
+    # Load the heavy dependencies once the server is accepting connections
+    start_background_warmup("127.0.0.1", PORT)
+
     Starter.ignite(debug=False, host="0.0.0.0", port=PORT),
@@ -1,22 +1,175 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import queue
+import time
+import uuid
+from datetime import date, datetime
 
 # Ensure the log directory exists
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_DIR = os.path.join(BASE_DIR, '..', 'log')
 os.makedirs(LOG_DIR, exist_ok=True)
 
+# Logging configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # json | text
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "10"))
+LOG_ROTATE_SECONDS = int(os.getenv("LOG_ROTATE_SECONDS", str(24 * 60 * 60)))
+LOG_MAX_ARG_LENGTH = int(os.getenv("LOG_MAX_ARG_LENGTH", "2000"))
+LOG_MAX_MESSAGE_LENGTH = int(os.getenv("LOG_MAX_MESSAGE_LENGTH", "8000"))
+
+# Argument types that cannot change after the logging call, so rendering them can wait
+IMMUTABLE_ARG_TYPES = (str, bytes, int, float, complex, bool, type(None), date, uuid.UUID)
+
 # Generate a log file name with current timestamp
 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 log_file = os.path.join(LOG_DIR, f"{timestamp}.log")
 
+
+def truncate(text: str, limit: int) -> str:
+    """
+    Shortens a string to a maximum length, noting how much was cut.
+
+    Args:
+        text: The string to shorten.
+        limit: The maximum number of characters to keep.
+
+    Returns:
+        The original string if it is short enough, the truncated string otherwise.
+    """
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [truncated {len(text) - limit} chars]"
+
+
+class TruncatingFormatterMixin:
+    """Renders the message with every large argument and the message itself truncated."""
+
+    # ----------------------------------------------------------------------
+    def render_message(self, record: logging.LogRecord) -> str:
+        args = record.args
+        if isinstance(args, tuple):
+            args = tuple(truncate(arg, LOG_MAX_ARG_LENGTH) if isinstance(arg, str) else arg for arg in args)
+        try:
+            message = str(record.msg) % args if args else str(record.msg)
+        except (TypeError, ValueError):
+            message = record.getMessage()
+        return truncate(message, LOG_MAX_MESSAGE_LENGTH)
+
+
+class TextFormatter(TruncatingFormatterMixin, logging.Formatter):
+    """The classic "time - name - level - message" line format."""
+
+    # ----------------------------------------------------------------------
+    def format(self, record: logging.LogRecord) -> str:
+        record.message = self.render_message(record)
+        record.asctime = self.formatTime(record, self.datefmt)
+        line = self.formatMessage(record)
+        if record.exc_info:
+            line = f"{line}\n{self.formatException(record.exc_info)}"
+        return line
+
+
+class JsonFormatter(TruncatingFormatterMixin, logging.Formatter):
+    """One JSON object per line, for structured log shipping."""
+
+    # ----------------------------------------------------------------------
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": self.render_message(record),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotates the log file when it exceeds a size or when an interval has elapsed."""
+
+    # ----------------------------------------------------------------------
+    def __init__(self, filename: str, max_bytes: int, backup_count: int, interval: int):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.interval = interval
+        self.rollover_at = time.time() + interval
+
+    # ----------------------------------------------------------------------
+    def shouldRollover(self, record: logging.LogRecord) -> int:
+        if self.interval > 0 and time.time() >= self.rollover_at:
+            return 1
+        return super().shouldRollover(record)
+
+    # ----------------------------------------------------------------------
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+
+class DeferredQueueHandler(TruncatingFormatterMixin, logging.handlers.QueueHandler):
+    """
+    Enqueues records without formatting them, so that %-style arguments of the usual
+    immutable types are only rendered (and truncated) by the listener thread, never
+    on the request thread. Records with other arguments, e.g. dicts or lists that
+    the caller may still change, are rendered before they are queued.
+    """
+
+    # ----------------------------------------------------------------------
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, IMMUTABLE_ARG_TYPES) for arg in args)):
+            record.msg = self.render_message(record)
+            record.args = None
+        return record
+
+
 # Configure the application-wide logger
 logger = logging.getLogger('app_logger')
-logger.setLevel(logging.INFO)
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
 
-file_handler = logging.FileHandler(log_file)
-file_handler.setLevel(logging.INFO)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+file_handler = SizeAndTimeRotatingFileHandler(log_file, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_ROTATE_SECONDS)
+file_handler.setLevel(LOG_LEVEL)
+if LOG_FORMAT == "text":
+    formatter = TextFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+else:
+    formatter = JsonFormatter()
 file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
\ No newline at end of file
+
+# The request thread only puts records on the queue; a listener thread writes them
+log_queue: queue.SimpleQueue = queue.SimpleQueue()
+logger.addHandler(DeferredQueueHandler(log_queue))
+listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+listener.start()
+
+
+def flush_logs() -> None:
+    """Stops the listener after it has written every queued record. Safe to call twice."""
+    if listener._thread is not None:
+        listener.stop()
+
+
+def _restart_after_fork() -> None:
+    """
+    Gives a forked worker process its own log file, since size-based rotation is
+    not safe across processes, and its own listener thread, which fork does not copy.
+    """
+    if file_handler.stream is not None:
+        file_handler.stream.close()
+        file_handler.stream = None
+    file_handler.baseFilename = os.path.abspath(os.path.join(LOG_DIR, f"{timestamp}_{os.getpid()}.log"))
+    listener._thread = None
+    listener.start()
+
+
+atexit.register(flush_logs)
+os.register_at_fork(after_in_child=_restart_after_fork)
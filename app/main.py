@@ -1,23 +1,50 @@
+import os
 import uuid
 import base64
-import json
 import re
-from typing import Dict
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import copy_context
+from typing import Any, Dict, List, Optional
 
 from ontology_dc8f06af066e4a7880a5938933236037.config import ConfigClass
-from ontology_dc8f06af066e4a7880a5938933236037.input import InputClass
+from ontology_dc8f06af066e4a7880a5938933236037.input import InputClass, InputClassSchema
 from ontology_dc8f06af066e4a7880a5938933236037.output import OutputClass
+from marshmallow import ValidationError
 from openfabric_pysdk.context import AppModel, State
-from core.stub import Stub
+from core.artifacts import load_artifact, save_artifact
+from core.jobs import Job, create_job
+from core.resilience import STAGE_TIMEOUTS
+from core.stub import Stub, StubCallError, get_stub
 
 from logger.logging import logger
-from src.llm import enhance_prompt
+from observability.metrics import CHECKPOINT_RESUMES, IN_FLIGHT, REQUESTS
+from observability.profiling import profile_request
+from observability.tracing import span
+from server.artifacts import artifact_url
+from server.jobs import job_url, register_job_starter
+from src.llm import enhance_prompt, enhance_prompt_variants
+from src.response_parser import extract_enhanced_prompt
 from src.user_intent_llm import check_for_memory_intent
-from database.memory_manager import find_similar_prompts, save_generation
+from database.config_store import load_config, save_config
+from database.retrieval import retrieve_memory
+from database.semantic_cache import lookup_generation, record_cache_opt_out
+from database.writer import submit_generation
+from database.checkpoints import (
+    STAGE_COMPLETED,
+    STAGE_ENHANCEMENT,
+    STAGE_IMAGE_TO_3D,
+    STAGE_TEXT_TO_IMAGE,
+    load_checkpoint,
+    save_checkpoint,
+)
 
-# Configurations for the app
+# Configurations for the app, also kept in memory.db for the other worker processes
 configurations: Dict[str, ConfigClass] = dict()
 
+# Upper bound for the num_variants input
+MAX_VARIANTS = int(os.getenv("MAX_VARIANTS", "4"))
+
 ############################################################
 # Config callback function
 ############################################################
@@ -30,8 +57,30 @@ def config(configuration: Dict[str, ConfigClass], state: State) -> None:
         state (State): The current state of the application (not used in this implementation).
     """
     for uid, conf in configuration.items():
-        logger.info(f"Saving new config for user with id:'{uid}'")
+        logger.info("Saving new config for user with id:'%s'", uid)
         configurations[uid] = conf
+        save_config(uid, {"app_ids": conf.app_ids})
+
+        # Connect to the apps ahead of the first execution
+        if conf.app_ids:
+            threading.Thread(target=get_stub, args=(list(conf.app_ids),), name="stub-connect", daemon=True).start()
+
+
+def get_config(uid: str) -> Optional[ConfigClass]:
+    """
+    Returns the configuration of a user. The shared store wins over the local copy,
+    because the config may have been updated through another worker process.
+
+    Args:
+        uid (str): The user ID.
+
+    Returns:
+        Optional[ConfigClass]: The configuration, or None if the user has none.
+    """
+    stored = load_config(uid)
+    if stored is not None:
+        return ConfigClass(app_ids=stored.get("app_ids"))
+    return configurations.get(uid)
 
 
 ############################################################
@@ -47,120 +96,483 @@ def execute(model: AppModel) -> None:
 
     logger.info("Starting execution workflow...")
     response: OutputClass = model.response
-    
+
+    # A session ID is generated for each execution to track the process.
+    session_id = str(uuid.uuid4())
+
+    # In progressive mode the call returns a job at once and the workflow runs in
+    # the background, publishing every stage result as soon as it is available.
+    if model.request.progressive:
+        job = start_job(model.request, session_id)
+        response.job_id = job.job_id
+        response.status = job.status
+        response.message = f"Generation started. Poll {job_url(job.job_id)} for results as they become available."
+        return
+
+    _run_tracked(model.request, response, session_id)
+
+
+def start_job(request: InputClass, session_id: str,
+              history: Optional[List[Dict[str, str]]] = None) -> Job:
+    """
+    Runs the workflow on a background thread and returns its job at once.
+
+    Args:
+        request (InputClass): The incoming request.
+        session_id (str): The ID used to track this execution.
+        history (Optional[List[Dict[str, str]]]): Earlier messages of the client's session.
+
+    Returns:
+        Job: The job that receives every stage result.
+    """
+    job = create_job(session_id)
+    logger.info("Started job %s for session %s.", job.job_id, session_id)
+    threading.Thread(target=_run_tracked, args=(request, OutputClass(), session_id, job, history),
+                     name=f"job-{job.job_id[:8]}", daemon=True).start()
+    return job
+
+
+def _start_submitted_job(fields: Dict[str, Any], session_id: Optional[str],
+                         history: List[Dict[str, str]]) -> Job:
+    """
+    Starts a job submitted to the sidecar with POST /jobs, e.g. by the Streamlit frontend.
+    The fields are loaded through the input schema, so they have the types execute
+    gets from the Openfabric server.
+
+    Args:
+        fields (Dict[str, Any]): The request fields of the submitted body.
+        session_id (Optional[str]): The client's session ID, a new one if None.
+        history (List[Dict[str, str]]): Earlier messages of the client's session.
+
+    Returns:
+        Job: The started job.
+
+    Raises:
+        ValueError: If a field does not match the schema.
+    """
+    try:
+        request = InputClassSchema().load(fields)
+    except ValidationError as e:
+        raise ValueError(f"Invalid request fields: {e.messages}") from e
+    return start_job(request, session_id or str(uuid.uuid4()), history)
+
+
+# Clients submit jobs to the workflow of this process through the sidecar
+register_job_starter(_start_submitted_job)
+
+
+def _run_tracked(request: InputClass, response: OutputClass, session_id: str, job: Optional[Job] = None,
+                 history: Optional[List[Dict[str, str]]] = None) -> None:
+    """
+    Runs the workflow inside the execute span, profiled when requested, armed or
+    sampled, and records its outcome.
+
+    Args:
+        request (InputClass): The incoming request.
+        response (OutputClass): The response to fill in.
+        session_id (str): The ID used to track this execution.
+        job (Optional[Job]): The job to finish in progressive mode.
+        history (Optional[List[Dict[str, str]]]): Earlier messages of the client's session.
+    """
+    IN_FLIGHT.inc()
+    outcome = "error"
+    try:
+        with span("execute", session_id=session_id) as active:
+            with profile_request(session_id, requested=bool(request.profile)):
+                outcome = _run_workflow(request, response, session_id, job, history)
+            active.set_attribute("outcome", outcome)
+        REQUESTS.inc(outcome=outcome)
+    finally:
+        IN_FLIGHT.dec()
+        if job is not None:
+            job.finish(outcome, response.message)
+
+
+def _run_workflow(request: InputClass, response: OutputClass, session_id: str, job: Optional[Job] = None,
+                  history: Optional[List[Dict[str, str]]] = None) -> str:
+    """
+    Runs the generation workflow stage by stage, each stage in its own span.
+
+    Args:
+        request (InputClass): The incoming request.
+        response (OutputClass): The response to fill in.
+        session_id (str): The ID used to track this execution.
+        job (Optional[Job]): The job that receives every stage result as soon as it is available.
+        history (Optional[List[Dict[str, str]]]): Earlier messages of the client's session.
+
+    Returns:
+        The outcome of the execution: "success", "partial", "invalid" or "error".
+    """
     try:
         # Retrieve input
-        request: InputClass = model.request
         prompt: str = request.prompt
         if not prompt:
             response.message = "Error: Input prompt cannot be empty."
             logger.error(response.message)
-            return
+            return "invalid"
 
-        logger.info(f"Received prompt: {prompt}")
+        logger.info("Received prompt: %s", prompt)
 
         # Retrieve user config
-        user_config: ConfigClass = configurations.get('super-user', None)
+        user_config: Optional[ConfigClass] = get_config('super-user')
         if not user_config or not user_config.app_ids or len(user_config.app_ids) < 2:
             response.message = "Error: Configuration is missing or incomplete. Two app_ids are required."
             logger.error(response.message)
-            return
+            return "invalid"
             
-        logger.info(f"Loaded user config with {len(user_config.app_ids)} app_ids.")
+        logger.info("Loaded user config with %s app_ids.", len(user_config.app_ids))
+
+        # Resume from the checkpoint of an earlier attempt with the same idempotency key
+        idempotency_key = request.idempotency_key
+        checkpoint = load_checkpoint(idempotency_key) if idempotency_key else None
 
-        # Initialize the Stub with app IDs
+        if checkpoint and checkpoint['prompt'] != prompt:
+            response.message = "Error: The idempotency key was already used for a different prompt."
+            logger.error(response.message)
+            return "invalid"
+
+        if checkpoint:
+            CHECKPOINT_RESUMES.inc(stage=checkpoint['stage'])
+            if checkpoint['stage'] == STAGE_COMPLETED:
+                logger.info("Request '%s' already completed, returning the stored result.", idempotency_key)
+                return _replay_completed(response, checkpoint, job)
+            logger.info("Resuming request '%s' (session %s) after stage %s.",
+                        idempotency_key, checkpoint['session_id'], checkpoint['stage'])
+        checkpoint = checkpoint or {}
+
+        # Reuse the Stub connected to these app IDs, connecting on first use
         app_ids = user_config.app_ids
-        stub = Stub(app_ids)
+        with span("stub_init"):
+            stub = get_stub(app_ids)
 
         # ------------------------------
         # AI Generation Workflow
         # ------------------------------
         
-        # A session ID is generated for each execution to track the process.
-        session_id = str(uuid.uuid4())
-        logger.info(f"Generated session ID: {session_id}")
-
-        # Since each execution is stateless, we start with an empty history.
-        text_history = [{'role': 'user', 'content': prompt}]
+        logger.info("Generated session ID: %s", session_id)
 
-        # 1. Analyze user's intent to check if long-term memory is needed
-        logger.info("Analyzing user intent for memory retrieval...")
-        requires_memory = check_for_memory_intent(prompt, text_history)
-        
-        retrieved_memory = None
+        # Executions are stateless; only clients with a session (e.g. Streamlit) send its history
+        text_history = list(history or []) + [{'role': 'user', 'content': prompt}]
 
-        if requires_memory:
-            logger.info("Intent analysis suggests memory retrieval is required. Searching...")
-            similar = find_similar_prompts(prompt, k=1)
-            if similar:
-                retrieved_memory = similar[0]
-                logger.info(f"Found a related memory: {retrieved_memory['enhanced_prompt']}")
+        # Several variants are enhanced in one LLM call and rendered concurrently
+        num_variants = max(1, min(request.num_variants or 1, MAX_VARIANTS))
+        variants = []
+        variant_summary = ""
 
+        enhanced_prompt = checkpoint.get('enhanced_prompt')
+        if enhanced_prompt:
+            logger.info("Reusing the enhanced prompt from the checkpoint.")
         else:
-            logger.info("Intent analysis suggests no memory retrieval needed.")
+            # 1. Analyze user's intent to check if long-term memory is needed
+            logger.info("Analyzing user intent for memory retrieval...")
+            with span("intent_analysis"):
+                requires_memory = check_for_memory_intent(prompt, text_history)
+            
+            retrieved_memory = None
 
-        # 2. Enhance the user prompt
-        logger.info("Enhancing user prompt...")
-        enhanced_response = enhance_prompt(
-            user_prompt=prompt,
-            current_session_history=text_history,
-            retrieved_memory=retrieved_memory
-        )
+            if requires_memory:
+                logger.info("Intent analysis suggests memory retrieval is required. Searching...")
+                with span("retrieval"):
+                    retrieved_memory = retrieve_memory(prompt, session_id=session_id)
+                if retrieved_memory:
+                    logger.info("Found a related memory: %s", retrieved_memory['enhanced_prompt'])
+                    if job:
+                        job.publish("retrieval", retrieved_memory={
+                            key: retrieved_memory.get(key) for key in ("user_prompt", "enhanced_prompt", "timestamp")
+                        })
 
-        # Extract the enhanced prompt from JSON if it's in JSON format
-        try:
-            # Try to parse as JSON first
-            enhanced_json = json.loads(enhanced_response)
-            if isinstance(enhanced_json, dict) and "newEnhancedPrompt" in enhanced_json:
-                enhanced_prompt = enhanced_json["newEnhancedPrompt"]
+            else:
+                logger.info("Intent analysis suggests no memory retrieval needed.")
 
+            # 2. Enhance the user prompt
+            if num_variants > 1:
+                logger.info("Enhancing user prompt into %s variants...", num_variants)
+                with span("enhancement", variants=num_variants):
+                    variants = enhance_prompt_variants(
+                        user_prompt=prompt,
+                        num_variants=num_variants,
+                        current_session_history=text_history,
+                        retrieved_memory=retrieved_memory
+                    )
+                enhanced_prompt = variants[0]
             else:
-                # If JSON doesn't have expected key, use the whole cleaned response
-                enhanced_prompt = enhanced_response
-        except json.JSONDecodeError:
-            # If it's not JSON, use the cleaned response as it is
-            enhanced_prompt = enhanced_response
+                logger.info("Enhancing user prompt...")
+                with span("enhancement"):
+                    enhanced_response = enhance_prompt(
+                        user_prompt=prompt,
+                        current_session_history=text_history,
+                        retrieved_memory=retrieved_memory
+                    )
+
+                # Unwrap the enhanced prompt if it is still in JSON format
+                enhanced_prompt = extract_enhanced_prompt(enhanced_response)
 
-        logger.info(f"Enhanced prompt: {enhanced_prompt}")
+            # With variants the checkpoint is written once the image for 3D is chosen
+            if idempotency_key and len(variants) <= 1:
+                save_checkpoint(idempotency_key, session_id=session_id, prompt=prompt,
+                                stage=STAGE_ENHANCEMENT, enhanced_prompt=enhanced_prompt)
+
+        logger.info("Enhanced prompt: %s", enhanced_prompt)
+        response.enhanced_prompt = enhanced_prompt
+        if job:
+            job.publish(STAGE_ENHANCEMENT, enhanced_prompt=enhanced_prompt, variants=variants)
         text_history.append({'role': 'assistant', 'content': f"**Enhanced Prompt:** {enhanced_prompt}"})
 
-        # 3. Call Text-to-Image App
-        logger.info(f"Calling Text-to-Image app (ID: {app_ids[0]})...")
-        resp_img = stub.call(app_ids[0], {"prompt": enhanced_prompt}, uid="super-user")
-        img_bytes = resp_img.get("result")
+        # Reuse the assets of a nearly identical earlier generation instead of calling both apps
+        if request.use_cache is False:
+            record_cache_opt_out(prompt)
+        elif len(variants) <= 1 and not checkpoint.get('image_ref'):
+            with span("semantic_cache"):
+                cached = lookup_generation(prompt, enhanced_prompt)
+            if cached:
+                return _serve_cached(response, cached, enhanced_prompt, idempotency_key, job)
 
-        if not img_bytes:
-            response.message = "Error: Failed to generate image. The response was empty."
-            logger.error(response.message)
-            return
-        
-        logger.info("Image generation successful.")
+        # 3. Call Text-to-Image App, unless an earlier attempt already stored the image
+        image_ref = checkpoint.get('image_ref')
+        img_bytes = _load_checkpoint_artifact(image_ref)
+        if img_bytes:
+            logger.info("Reusing the image from the checkpoint.")
+        elif len(variants) > 1:
+            logger.info("Calling Text-to-Image app (ID: %s) for %s variants...", app_ids[0], len(variants))
+            images = _generate_variant_images(stub, app_ids[0], variants)
+            if not images:
+                response.message = "Error: Failed to generate an image for any of the variants."
+                logger.error(response.message)
+                return "error"
+
+            # Only one image goes on to the costly 3D stage
+            chosen = _choose_variant(images, request.model_variant)
+            enhanced_prompt, img_bytes = variants[chosen], images[chosen]
+            image_refs = {index: save_artifact(data) for index, data in images.items()}
+            image_ref = image_refs[chosen]
+            variant_summary = "\nVariants:\n" + "\n".join(
+                f"{index + 1}. {variants[index]} -> {artifact_url(ref)}" + (" [3D]" if index == chosen else "")
+                for index, ref in sorted(image_refs.items())
+            )
+            logger.info("Generated %s of %s variant images, variant %s goes to 3D.", len(images), len(variants), chosen + 1)
+            if idempotency_key:
+                save_checkpoint(idempotency_key, session_id=session_id, prompt=prompt, stage=STAGE_TEXT_TO_IMAGE,
+                                enhanced_prompt=enhanced_prompt, image_ref=image_ref)
+        else:
+            logger.info("Calling Text-to-Image app (ID: %s)...", app_ids[0])
+            try:
+                with span("text_to_image", app_id=app_ids[0]):
+                    resp_img = stub.call(app_ids[0], {"prompt": enhanced_prompt}, uid="super-user",
+                                         timeout=STAGE_TIMEOUTS["text_to_image"])
+            except StubCallError as e:
+                response.message = f"Error: Image generation failed: {e}"
+                logger.error(response.message)
+                return "error"
+            img_bytes = resp_img.get("result")
+
+            if not img_bytes:
+                response.message = "Error: Failed to generate image. The response was empty."
+                logger.error(response.message)
+                return "error"
+
+            logger.info("Image generation successful.")
+            image_ref = save_artifact(img_bytes)
+            if idempotency_key:
+                save_checkpoint(idempotency_key, stage=STAGE_TEXT_TO_IMAGE, image_ref=image_ref)
+
+        # The image is usable long before the 3D model is ready
+        response.enhanced_prompt = enhanced_prompt
+        response.image_url = artifact_url(image_ref)
+        if job:
+            job.publish(STAGE_TEXT_TO_IMAGE, enhanced_prompt=enhanced_prompt, image_ref=image_ref)
 
         # 4. Call Image-to-3D App
-        logger.info(f"Calling Image-to-3D app (ID: {app_ids[1]})...")
-        img_b64 = base64.b64encode(img_bytes).decode('utf-8')
-        resp_3d = stub.call(app_ids[1], {"input_image": img_b64}, 'super-user')
-        model_bytes = resp_3d.get('generated_object')
+        model_ref = None
+        logger.info("Calling Image-to-3D app (ID: %s)...", app_ids[1])
+        try:
+            with span("image_to_3d", app_id=app_ids[1]):
+                img_b64 = base64.b64encode(img_bytes).decode('utf-8')
+                resp_3d = stub.call(app_ids[1], {"input_image": img_b64}, 'super-user',
+                                    timeout=STAGE_TIMEOUTS["image_to_3d"])
+            model_bytes = resp_3d.get('generated_object')
+        except StubCallError as e:
+            # The checkpoint keeps the image, so a retry only repeats this stage
+            logger.error("Image-to-3D failed: %s", e)
+            model_bytes = None
 
         if not model_bytes:
             # This is treated as a warning as the image was still generated.
             logger.warning("3D model generation finished, but no model data was returned.")
             response.message = f"Workflow partially completed. Image generated, but 3D model failed. Enhanced Prompt was: {enhanced_prompt}"
+            outcome = "partial"
+            if idempotency_key:
+                save_checkpoint(idempotency_key, model_status="failed")
         else:
             logger.info("3D model generation successful.")
             response.message = f"Workflow completed successfully! Your enhanced prompt was: {enhanced_prompt}"
+            outcome = "success"
+            model_ref = save_artifact(model_bytes)
+            response.model_url = artifact_url(model_ref)
+            if job:
+                job.publish(STAGE_IMAGE_TO_3D, model_ref=model_ref)
+            if idempotency_key:
+                save_checkpoint(idempotency_key, stage=STAGE_IMAGE_TO_3D, model_ref=model_ref,
+                                model_status="completed")
+        response.message += variant_summary
 
-        # 5. Save the generation to long-term memory
-        logger.info("Saving generation to long-term memory...")
-        save_generation(
-            session_id=session_id,
-            user_prompt=prompt,
-            enhanced_prompt=enhanced_prompt
-        )
-        
-        logger.info("Successfully saved to long-term memory.")
+        # 5. Save the generation to long-term memory, once per idempotency key. A retry
+        # that produced the 3D model after a partial run saves again, which adds the
+        # model to the stored row through the exact-duplicate update
+        adds_model = bool(model_ref) and checkpoint.get('model_status') == "failed"
+        if checkpoint.get('persisted') and not adds_model:
+            logger.info("Generation was already saved to long-term memory.")
+        else:
+            logger.info("Saving generation to long-term memory...")
+            with span("persistence"):
+                submit_generation(
+                    session_id=session_id,
+                    user_prompt=prompt,
+                    enhanced_prompt=enhanced_prompt,
+                    image_ref=image_ref,
+                    model_ref=model_ref,
+                    user_id=request.user_id,
+                    count_use=not checkpoint.get('persisted')
+                )
+            
+            logger.info("Successfully saved to long-term memory.")
+            if idempotency_key:
+                save_checkpoint(idempotency_key, persisted=1)
+
+        if idempotency_key and outcome == "success":
+            save_checkpoint(idempotency_key, stage=STAGE_COMPLETED, outcome=outcome, message=response.message)
+        return outcome
 
     except Exception as e:
-        logger.error(f"An unexpected error occurred in the execution workflow: {e}", exc_info=True)
+        logger.error("An unexpected error occurred in the execution workflow: %s", e, exc_info=True)
         response.message = f"An unexpected error occurred: {e}"
+        return "error"
+
+
+def _replay_completed(response: OutputClass, checkpoint: Dict[str, Any], job: Optional[Job]) -> str:
+    """
+    Answers a retry of a completed request with the stored result, so a client
+    whose response got lost still receives the enhanced prompt and the artifacts.
+
+    Args:
+        response (OutputClass): The response to fill in.
+        checkpoint (Dict[str, Any]): The completed checkpoint.
+        job (Optional[Job]): The job to publish the results to in progressive mode.
 
+    Returns:
+        str: The stored outcome.
+    """
+    enhanced_prompt, image_ref, model_ref = checkpoint['enhanced_prompt'], checkpoint['image_ref'], checkpoint['model_ref']
+    response.message = checkpoint['message']
+    response.enhanced_prompt = enhanced_prompt
+    if image_ref:
+        response.image_url = artifact_url(image_ref)
+    if model_ref:
+        response.model_url = artifact_url(model_ref)
+    if job:
+        job.publish(STAGE_TEXT_TO_IMAGE, enhanced_prompt=enhanced_prompt, image_ref=image_ref)
+        if model_ref:
+            job.publish(STAGE_IMAGE_TO_3D, model_ref=model_ref)
+    return checkpoint['outcome']
+
+
+def _serve_cached(response: OutputClass, cached: Dict[str, Any], enhanced_prompt: str,
+                  idempotency_key: Optional[str], job: Optional[Job]) -> str:
+    """
+    Completes a request with the image and 3D model of an earlier generation.
+
+    Args:
+        response (OutputClass): The response to fill in.
+        cached (Dict[str, Any]): The prompts row returned by the semantic cache.
+        enhanced_prompt (str): The enhanced prompt of this request.
+        idempotency_key (Optional[str]): The idempotency key of the request, if any.
+        job (Optional[Job]): The job to publish the results to in progressive mode.
+
+    Returns:
+        str: The outcome "success".
+    """
+    image_ref, model_ref = cached['image_ref'], cached['model_ref']
+    response.enhanced_prompt = enhanced_prompt
+    response.image_url = artifact_url(image_ref)
+    response.model_url = artifact_url(model_ref)
+    response.message = (f"Workflow completed from cache! Your enhanced prompt was: {enhanced_prompt}. "
+                        f"It matched an earlier creation (\"{cached['enhanced_prompt']}\"); "
+                        f"send use_cache=false to generate new assets.")
+    if job:
+        job.publish(STAGE_TEXT_TO_IMAGE, enhanced_prompt=enhanced_prompt, image_ref=image_ref)
+        job.publish(STAGE_IMAGE_TO_3D, model_ref=model_ref)
+    if idempotency_key:
+        save_checkpoint(idempotency_key, stage=STAGE_COMPLETED, image_ref=image_ref, model_ref=model_ref,
+                        model_status="completed", outcome="success", message=response.message)
+    return "success"
+
+
+def _load_checkpoint_artifact(reference: Optional[str]) -> Optional[bytes]:
+    """
+    Loads an intermediate result stored by an earlier attempt.
+
+    Args:
+        reference (Optional[str]): The artifact reference from the checkpoint.
+
+    Returns:
+        The artifact bytes, or None if there is no reference or the file is gone.
+    """
+    if not reference:
+        return None
+    try:
+        return load_artifact(reference)
+    except (OSError, ValueError) as e:
+        logger.warning("Checkpoint artifact %s is not available, regenerating: %s", reference, e)
+        return None
+
+
+def _generate_variant_images(stub: Stub, app_id: str, variants: List[str]) -> Dict[int, bytes]:
+    """
+    Renders all prompt variants concurrently with the Text-to-Image app.
+
+    Args:
+        stub (Stub): The connected stub.
+        app_id (str): The Text-to-Image app ID.
+        variants (List[str]): The enhanced prompt variants, best first.
+
+    Returns:
+        Dict[int, bytes]: The image of every variant that succeeded, by variant index.
+    """
+    def render(index: int, variant_prompt: str) -> Optional[bytes]:
+        with span("text_to_image", app_id=app_id, variant=index + 1):
+            result = stub.call(app_id, {"prompt": variant_prompt}, uid="super-user",
+                               timeout=STAGE_TIMEOUTS["text_to_image"])
+        return result.get("result")
+
+    images: Dict[int, bytes] = {}
+    with ThreadPoolExecutor(max_workers=len(variants), thread_name_prefix="variant") as executor:
+        # Each task runs in a copy of the current context so its span joins this trace
+        futures = {executor.submit(copy_context().run, render, index, variant): index
+                   for index, variant in enumerate(variants)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                data = future.result()
+            except StubCallError as e:
+                logger.error("Variant %s failed: %s", index + 1, e)
+                continue
+            if data:
+                images[index] = data
+    return images
+
+
+def _choose_variant(images: Dict[int, bytes], model_variant: Optional[int]) -> int:
+    """
+    Picks the variant whose image is sent to the Image-to-3D app.
+
+    Args:
+        images (Dict[int, bytes]): The generated images by variant index.
+        model_variant (Optional[int]): The 1-based variant the user asked for, if any.
+
+    Returns:
+        int: The user's choice if its image exists, otherwise the best-ranked variant with an image.
+    """
+    if model_variant and model_variant - 1 in images:
+        return model_variant - 1
+    if model_variant:
+        logger.warning("Variant %s has no image, using the best-ranked variant instead.", model_variant)
+    return min(images)
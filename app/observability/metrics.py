@@ -0,0 +1,360 @@
+import os
+import resource
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Default latency buckets in seconds, sized for LLM and Openfabric calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    """Renders a Prometheus label set, e.g. {stage="enhancement"}."""
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    """Escapes a label value (backslash, double quote and newline)."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    """Renders a sample value the way the Prometheus text format expects."""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """
+    Base class of the metric types. A metric has a fixed set of label names and one
+    child value per combination of label values.
+
+    Attributes:
+        name (str): The metric name.
+        documentation (str): The HELP text.
+        label_names (Tuple[str, ...]): The label names.
+    """
+
+    type_name = "untyped"
+
+    # ----------------------------------------------------------------------
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        """
+        Initializes the metric.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The HELP text.
+            label_names (Sequence[str]): The label names.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    # ----------------------------------------------------------------------
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    # ----------------------------------------------------------------------
+    def samples(self) -> Iterable[str]:
+        """Yields the exposition lines of all children."""
+        raise NotImplementedError
+
+    # ----------------------------------------------------------------------
+    def expose(self) -> str:
+        """
+        Renders the metric in the Prometheus text exposition format.
+
+        Returns:
+            The HELP, TYPE and sample lines.
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """A monotonically increasing value, e.g. the number of requests."""
+
+    type_name = "counter"
+
+    # ----------------------------------------------------------------------
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    # ----------------------------------------------------------------------
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """
+        Increments the counter.
+
+        Args:
+            amount (float): The non-negative increment.
+            **labels (str): The label values.
+        """
+        if amount < 0:
+            raise ValueError("Counters can only be incremented")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    # ----------------------------------------------------------------------
+    def set_total(self, value: float, **labels: str) -> None:
+        """
+        Mirrors a cumulative value kept elsewhere, e.g. the CPU time reported by the
+        kernel. A lower value than the current one is ignored.
+
+        Args:
+            value (float): The cumulative value.
+            **labels (str): The label values.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = max(self._values.get(key, 0), value)
+
+    # ----------------------------------------------------------------------
+    def value(self, **labels: str) -> float:
+        """Returns the current value for the given labels."""
+        return self._values.get(self._key(labels), 0)
+
+    # ----------------------------------------------------------------------
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """A value that can go up and down, e.g. the queue depth or a connection status."""
+
+    type_name = "gauge"
+
+    # ----------------------------------------------------------------------
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    # ----------------------------------------------------------------------
+    def set(self, value: float, **labels: str) -> None:
+        """Sets the gauge to a value."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    # ----------------------------------------------------------------------
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Adds to the gauge."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    # ----------------------------------------------------------------------
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        """Subtracts from the gauge."""
+        self.inc(-amount, **labels)
+
+    # ----------------------------------------------------------------------
+    def value(self, **labels: str) -> float:
+        """Returns the current value for the given labels."""
+        return self._values.get(self._key(labels), 0)
+
+    # ----------------------------------------------------------------------
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    """Counts observations into cumulative buckets, e.g. request latencies."""
+
+    type_name = "histogram"
+
+    # ----------------------------------------------------------------------
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    # ----------------------------------------------------------------------
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Records an observation.
+
+        Args:
+            value (float): The observed value.
+            **labels (str): The label values.
+        """
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            total[0] += value
+
+    # ----------------------------------------------------------------------
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = ("le", _format_value(bound))
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}"
+
+
+class Registry:
+    """Holds the metrics of the process and renders them for the /metrics endpoint."""
+
+    # ----------------------------------------------------------------------
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    # ----------------------------------------------------------------------
+    def register(self, metric: Metric) -> Metric:
+        """
+        Adds a metric to the registry. Registering the same name twice returns the
+        metric registered first.
+
+        Args:
+            metric (Metric): The metric to register.
+
+        Returns:
+            Metric: The registered metric.
+        """
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    # ----------------------------------------------------------------------
+    def expose(self) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Returns:
+            The exposition text.
+        """
+        update_process_metrics()
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.expose() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+    """Creates and registers a Counter."""
+    return REGISTRY.register(Counter(name, documentation, label_names))
+
+
+def gauge(name: str, documentation: str, label_names: Sequence[str] = ()) -> Gauge:
+    """Creates and registers a Gauge."""
+    return REGISTRY.register(Gauge(name, documentation, label_names))
+
+
+def histogram(name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Creates and registers a Histogram."""
+    return REGISTRY.register(Histogram(name, documentation, label_names, buckets))
+
+
+# ----------------------------------------------------------------------
+# Application metrics
+# ----------------------------------------------------------------------
+REQUESTS = counter("app_requests_total", "Executions by outcome.", ["outcome"])
+IN_FLIGHT = gauge("app_requests_in_flight", "Executions currently running.")
+STAGE_LATENCY = histogram("app_stage_duration_seconds", "Duration of each traced stage.", ["stage"])
+CHECKPOINT_RESUMES = counter("app_checkpoint_resumes_total", "Executions resumed from a checkpoint, by the last completed stage.", ["stage"])
+STUB_CONNECTED = gauge("app_stub_connection_up", "1 if the Remote connection to an Openfabric app is established.", ["app_id"])
+RETRIES = counter("app_retries_total", "Retried attempts of external calls.", ["operation"])
+DEADLINES_EXCEEDED = counter("app_deadline_exceeded_total", "External calls that ran into their deadline.", ["operation"])
+CIRCUIT_TRIPS = counter("app_circuit_breaker_trips_total", "Times a circuit breaker opened.", ["name"])
+CIRCUIT_STATE = gauge("app_circuit_breaker_state", "Circuit breaker state: 0 closed, 1 half-open, 2 open.", ["name"])
+OLLAMA_TOKENS = counter("app_ollama_tokens_total", "Tokens processed by Ollama.", ["model", "kind"])
+OLLAMA_TOKENS_PER_SECOND = gauge("app_ollama_eval_tokens_per_second", "Generation throughput of the last Ollama call.", ["model"])
+OLLAMA_PROMPT_TOKENS_PER_SECOND = gauge("app_ollama_prompt_eval_tokens_per_second", "Prompt evaluation throughput of the last Ollama call.", ["model"])
+LLM_PARSE_RESULTS = counter("app_llm_parse_total", "Parsed LLM answers by layer and parse path: json, stripped, search or failed.", ["layer", "path"])
+HISTORY_TOKENS_SAVED = counter("app_history_prompt_tokens_saved_total", "Estimated prompt tokens saved by the bounded session history.", ["stage"])
+SEMANTIC_CACHE_LOOKUPS = counter("app_semantic_cache_lookups_total", "Semantic cache lookups by result: hit, miss or stale.", ["result"])
+SEMANTIC_CACHE_FALSE_HITS = counter("app_semantic_cache_false_hits_total", "Cache hits the user rejected by repeating the request with use_cache=false.")
+MEMORY_ARCHIVED = counter("app_memory_archived_total", "Generations moved to the archive by the retention policy, by reason: ttl or cap.", ["reason"])
+MEMORY_DEDUPLICATED = counter("app_memory_deduplicated_total", "Generations saved as a usage update of an existing record, by match: exact or near.", ["kind"])
+MEMORY_RETRIEVALS = counter("app_memory_retrievals_total", "Memory retrievals by result: hit, filtered (all candidates too far) or empty.", ["result"])
+MEMORY_RERANKS = counter("app_memory_reranks_total", "Re-ranked memory retrievals by mode: cross_encoder, heuristic or over_budget.", ["mode"])
+PROFILES_CAPTURED = counter("app_profiles_captured_total", "Profiled execute calls by mode and reason: requested, triggered or sampled.", ["mode", "reason"])
+MEMORY_HOT_RECORDS = gauge("app_memory_hot_records", "Searchable generations left after the last retention run.")
+STORE_QUERY_LATENCY = histogram(
+    "app_store_query_duration_seconds", "Duration of SQLite and ChromaDB operations.", ["store", "operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+PROCESS_RSS = gauge("process_resident_memory_bytes", "Resident memory size in bytes.")
+PROCESS_MAX_RSS = gauge("process_max_resident_memory_bytes", "Peak resident memory size in bytes.")
+PROCESS_CPU = counter("process_cpu_seconds_total", "User and system CPU time spent in seconds.")
+
+
+def update_process_metrics() -> None:
+    """Refreshes the process resource metrics."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    PROCESS_CPU.set_total(usage.ru_utime + usage.ru_stime)
+    # ru_maxrss is reported in kilobytes on Linux
+    PROCESS_MAX_RSS.set(usage.ru_maxrss * 1024)
+
+    try:
+        with open("/proc/self/statm") as f:
+            PROCESS_RSS.set(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE"))
+    except (OSError, ValueError):
+        PROCESS_RSS.set(usage.ru_maxrss * 1024)
+
+
+def observe_span(name: str, duration: float) -> None:
+    """
+    Feeds a finished span into the stage and store latency histograms.
+
+    Args:
+        name: The span name; "sqlite.*" and "chroma.*" spans are store operations.
+        duration: The span duration in seconds.
+    """
+    STAGE_LATENCY.observe(duration, stage=name)
+
+    store, _, operation = name.partition('.')
+    if store in ("sqlite", "chroma") and operation:
+        STORE_QUERY_LATENCY.observe(duration, store=store, operation=operation)
+
+
+def record_ollama_response(model: str, response) -> None:
+    """
+    Records token counts and throughput from the stats of an Ollama chat response.
+
+    Args:
+        model: The model that produced the response.
+        response: The Ollama chat response.
+    """
+    prompt_tokens = response.get("prompt_eval_count") or 0
+    eval_tokens = response.get("eval_count") or 0
+    OLLAMA_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    OLLAMA_TOKENS.inc(eval_tokens, model=model, kind="eval")
+
+    # Durations are reported in nanoseconds
+    eval_duration = response.get("eval_duration") or 0
+    if eval_duration:
+        OLLAMA_TOKENS_PER_SECOND.set(eval_tokens / (eval_duration / 1e9), model=model)
+    prompt_duration = response.get("prompt_eval_duration") or 0
+    if prompt_duration:
+        OLLAMA_PROMPT_TOKENS_PER_SECOND.set(prompt_tokens / (prompt_duration / 1e9), model=model)
@@ -0,0 +1,246 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from logger.logging import LOG_DIR, logger
+from observability.metrics import PROFILES_CAPTURED
+
+# Profiler used unless the trigger names one: cprofile, pyinstrument or tracemalloc
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile").lower()
+
+# Fraction of execute calls profiled without being asked to (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+
+# Directory the profiles are written to
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(LOG_DIR, "profiles"))
+
+# Functions or allocation sites listed in the text summary of a profile
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "40"))
+
+# Upper bound for the number of requests armed at once
+PROFILE_MAX_ARMED_REQUESTS = int(os.getenv("PROFILE_MAX_ARMED_REQUESTS", "100"))
+
+# Frames kept per allocation traceback in tracemalloc mode
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "10"))
+
+PROFILE_MODES = ("cprofile", "pyinstrument", "tracemalloc")
+
+_lock = threading.Lock()
+_armed = 0
+_armed_mode: Optional[str] = None
+
+# Only one request is profiled at a time: the profilers and tracemalloc are
+# process-wide, so overlapping captures would mix the requests up
+_capturing = threading.Lock()
+_pyinstrument_missing = False
+
+
+def arm(count: int, mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Profiles the next execute calls, without a restart.
+
+    Args:
+        count: Number of upcoming calls to profile, 0 to disarm, at most
+            PROFILE_MAX_ARMED_REQUESTS.
+        mode: The profiler to use for them, PROFILE_MODE by default.
+
+    Returns:
+        The profiling status after arming.
+
+    Raises:
+        ValueError: If the count is out of range or the mode is unknown.
+    """
+    global _armed, _armed_mode
+
+    if not 0 <= count <= PROFILE_MAX_ARMED_REQUESTS:
+        raise ValueError(f"The number of requests must be between 0 and {PROFILE_MAX_ARMED_REQUESTS}")
+    if mode is not None and mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profiling mode {mode!r}, expected one of {', '.join(PROFILE_MODES)}")
+    with _lock:
+        _armed = count
+        _armed_mode = mode
+    logger.info("[Profiling] Armed for the next %s requests (%s).", count, mode or PROFILE_MODE)
+    return status()
+
+
+def status() -> Dict[str, Any]:
+    """
+    Returns the profiling configuration and the most recent profiles.
+
+    Returns:
+        A dict with the armed request count and mode, the sample rate and the file
+        names of the last profiles written.
+    """
+    with _lock:
+        armed, mode = _armed, _armed_mode or PROFILE_MODE
+    try:
+        recent = sorted(os.listdir(PROFILE_DIR), reverse=True)[:10]
+    except OSError:
+        recent = []
+    return {
+        "armed_requests": armed,
+        "mode": mode,
+        "sample_rate": PROFILE_SAMPLE_RATE,
+        "recent": recent,
+    }
+
+
+def _claim(requested: bool) -> Optional[Tuple[str, str]]:
+    """Decides whether the current call is profiled, consuming an armed slot if so."""
+    global _armed
+
+    with _lock:
+        if requested:
+            return PROFILE_MODE, "requested"
+        if _armed > 0:
+            _armed -= 1
+            return _armed_mode or PROFILE_MODE, "triggered"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return PROFILE_MODE, "sampled"
+    return None
+
+
+def _profile_path(label: str, extension: str) -> str:
+    safe_label = re.sub(r"[^A-Za-z0-9_.-]", "_", label)[:64]
+    return os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}_{safe_label}.{extension}")
+
+
+def _write_text(path: str, header: str, body: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(header)
+        f.write(body)
+
+
+def _start_cprofile(label: str, header: str) -> Callable[[], List[str]]:
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    def finish() -> List[str]:
+        profiler.disable()
+        prof_path, text_path = _profile_path(label, "prof"), _profile_path(label, "txt")
+        profiler.dump_stats(prof_path)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+        _write_text(text_path, header, summary.getvalue())
+        return [prof_path, text_path]
+    return finish
+
+
+def _start_pyinstrument(label: str, header: str) -> Callable[[], List[str]]:
+    from pyinstrument import Profiler
+
+    profiler = Profiler()
+    profiler.start()
+
+    def finish() -> List[str]:
+        profiler.stop()
+        html_path, text_path = _profile_path(label, "html"), _profile_path(label, "txt")
+        _write_text(html_path, "", profiler.output_html())
+        _write_text(text_path, header, profiler.output_text(unicode=True))
+        return [html_path, text_path]
+    return finish
+
+
+def _start_tracemalloc(label: str, header: str) -> Callable[[], List[str]]:
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+
+    def finish() -> List[str]:
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if started_here:
+            tracemalloc.stop()
+
+        lines = [f"Traced memory: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB\n",
+                 f"\nTop {PROFILE_TOP_N} allocation sites by growth:\n"]
+        lines.extend(f"{difference}\n" for difference in after.compare_to(before, "lineno")[:PROFILE_TOP_N])
+        lines.append("\nTracebacks of the 5 largest:\n")
+        for difference in after.compare_to(before, "traceback")[:5]:
+            lines.append(f"\n{difference.size_diff / 1024:.1f} KiB in {difference.count_diff} blocks\n")
+            lines.extend(f"    {line}\n" for line in difference.traceback.format())
+        text_path = _profile_path(label, "txt")
+        _write_text(text_path, header, "".join(lines))
+        return [text_path]
+    return finish
+
+
+# Starts a profiler and returns the function that stops it and writes the profile
+PROFILERS: Dict[str, Callable[[str, str], Callable[[], List[str]]]] = {
+    "cprofile": _start_cprofile,
+    "pyinstrument": _start_pyinstrument,
+    "tracemalloc": _start_tracemalloc,
+}
+
+
+@contextmanager
+def profile_request(label: str, requested: bool = False) -> Iterator[None]:
+    """
+    Profiles the enclosed block if the request asked for it, the profiler was armed
+    through arm() or the call is sampled by PROFILE_SAMPLE_RATE. The profile is
+    written to PROFILE_DIR: a .prof file (cProfile) or .html file (pyinstrument)
+    plus a text summary, or only the summary for tracemalloc. Calls that arrive
+    while another request is being profiled run unprofiled.
+
+    cProfile and pyinstrument follow the calling thread only; work handed to other
+    threads shows up as the time spent waiting for it.
+
+    Args:
+        label: Goes into the file names, e.g. the session ID.
+        requested: True if the request itself asked to be profiled.
+    """
+    global _pyinstrument_missing
+
+    if not _capturing.acquire(blocking=False):
+        if requested:
+            logger.info("[Profiling] Another request is being profiled, %s runs unprofiled.", label)
+        yield
+        return
+    claim = _claim(requested)
+    if claim is None:
+        _capturing.release()
+        yield
+        return
+
+    mode, reason = claim
+    if mode == "pyinstrument" and not _pyinstrument_missing:
+        try:
+            import pyinstrument  # noqa: F401
+        except ImportError:
+            logger.warning("[Profiling] pyinstrument is not installed, using cProfile instead.")
+            _pyinstrument_missing = True
+    if mode == "pyinstrument" and _pyinstrument_missing:
+        mode = "cprofile"
+
+    started = time.perf_counter()
+    finish = None
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        header = f"# {mode} profile of {label} ({reason}), started {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+        finish = PROFILERS[mode](label, header)
+    except Exception as e:
+        logger.warning("[Profiling] Could not start the %s profiler: %s", mode, e)
+
+    try:
+        yield
+    finally:
+        try:
+            if finish is not None:
+                paths = finish()
+                PROFILES_CAPTURED.inc(mode=mode, reason=reason)
+                logger.info("[Profiling] %s profile of %s (%s, %.2fs) written to %s",
+                            mode, label, reason, time.perf_counter() - started, ", ".join(paths))
+        except Exception as e:
+            logger.warning("[Profiling] Could not write the %s profile of %s: %s", mode, label, e)
+        finally:
+            _capturing.release()
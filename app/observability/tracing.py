@@ -0,0 +1,265 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import math
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+from logger.logging import LOG_DIR
+from observability.metrics import observe_span
+
+# Tracing configuration
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file").lower()  # file | stdout | none
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(LOG_DIR, "traces.jsonl"))
+STAGE_WINDOW = int(os.getenv("TRACE_STAGE_WINDOW", "1024"))
+
+# Attributes that child spans copy from their parent
+INHERITED_ATTRIBUTES = ("session_id", "app_id")
+
+
+class Span:
+    """
+    A timed unit of work. Spans are exported in the JSON layout of the OpenTelemetry
+    SDK console exporter, so the files can be loaded by OTLP-aware tooling.
+
+    Attributes:
+        name (str): The span name, also used as the stage name in the summary.
+        trace_id (str): 32 hex characters shared by all spans of one trace.
+        span_id (str): 16 hex characters identifying this span.
+        parent_id (Optional[str]): The span id of the parent span, if any.
+        attributes (Dict[str, Any]): Tags attached to the span.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, name: str, parent: Optional['Span'] = None, attributes: Optional[Dict[str, Any]] = None):
+        """
+        Starts a new span.
+
+        Args:
+            name (str): The span name.
+            parent (Optional[Span]): The enclosing span, if any.
+            attributes (Optional[Dict[str, Any]]): Initial attributes.
+        """
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes: Dict[str, Any] = {}
+        if parent:
+            self.attributes.update({k: v for k, v in parent.attributes.items() if k in INHERITED_ATTRIBUTES})
+        self.attributes.update(attributes or {})
+        self.status_code = "UNSET"
+        self.status_description: Optional[str] = None
+        self.start_time_ns = time.time_ns()
+        self._start_perf = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    # ----------------------------------------------------------------------
+    def set_attribute(self, key: str, value: Any) -> None:
+        """
+        Attaches an attribute to the span.
+
+        Args:
+            key (str): The attribute name.
+            value (Any): A JSON-serializable value.
+        """
+        self.attributes[key] = value
+
+    # ----------------------------------------------------------------------
+    def set_error(self, error: BaseException) -> None:
+        """
+        Marks the span as failed.
+
+        Args:
+            error (BaseException): The exception that ended the span.
+        """
+        self.status_code = "ERROR"
+        self.status_description = f"{type(error).__name__}: {error}"
+
+    # ----------------------------------------------------------------------
+    def end(self) -> None:
+        """Stops the span clock."""
+        self.duration = time.perf_counter() - self._start_perf
+        if self.status_code == "UNSET":
+            self.status_code = "OK"
+
+    # ----------------------------------------------------------------------
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serializes the span in the OpenTelemetry console exporter layout.
+
+        Returns:
+            A JSON-serializable dictionary.
+        """
+        end_time_ns = self.start_time_ns + int((self.duration or 0) * 1e9)
+        return {
+            "name": self.name,
+            "context": {"trace_id": f"0x{self.trace_id}", "span_id": f"0x{self.span_id}"},
+            "kind": "SpanKind.INTERNAL",
+            "parent_id": f"0x{self.parent_id}" if self.parent_id else None,
+            "start_time": _iso(self.start_time_ns),
+            "end_time": _iso(end_time_ns),
+            "status": {"status_code": self.status_code, "description": self.status_description},
+            "attributes": dict(self.attributes),
+            "resource": {"attributes": {"service.name": "ai-test"}},
+        }
+
+
+def _iso(ns: int) -> str:
+    """Formats a unix timestamp in nanoseconds as an ISO-8601 UTC string."""
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ns / 1e9)) + f".{ns % 1_000_000_000 // 1000:06d}Z"
+
+
+class SpanFormatter(logging.Formatter):
+    """Serializes the span dict a trace record carries as one JSON line."""
+
+    # ----------------------------------------------------------------------
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, default=str)
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_export_lock = threading.Lock()
+_stage_durations: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=STAGE_WINDOW))
+
+# Spans go through a queue like the application log: the request thread only puts
+# a record holding the span dict on it, a listener thread serializes and writes it
+trace_listener: Optional[logging.handlers.QueueListener] = None
+
+if TRACE_EXPORTER != "none":
+    if TRACE_EXPORTER == "stdout":
+        trace_handler: logging.Handler = logging.StreamHandler(sys.stdout)
+    else:
+        trace_handler = logging.FileHandler(TRACE_FILE, encoding="utf-8", delay=True)
+    trace_handler.setFormatter(SpanFormatter())
+    trace_queue: queue.SimpleQueue = queue.SimpleQueue()
+    trace_listener = logging.handlers.QueueListener(trace_queue, trace_handler)
+    trace_listener.start()
+
+
+def flush_traces() -> None:
+    """Stops the trace listener after it has written every queued span. Safe to call twice."""
+    if trace_listener is not None and trace_listener._thread is not None:
+        trace_listener.stop()
+
+
+def _restart_after_fork() -> None:
+    """Gives a forked worker process its own trace listener thread, which fork does not copy."""
+    if trace_listener is not None:
+        trace_listener._thread = None
+        trace_listener.start()
+
+
+atexit.register(flush_traces)
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def _export(finished: Span) -> None:
+    """
+    Records the span duration for the stage summary and queues it for the exporter.
+
+    Args:
+        finished: The ended span.
+    """
+    observe_span(finished.name, finished.duration)
+
+    with _export_lock:
+        _stage_durations[finished.name].append(finished.duration)
+
+    if trace_listener is not None:
+        trace_queue.put(logging.makeLogRecord({"msg": finished.to_dict()}))
+
+
+def current_span() -> Optional[Span]:
+    """
+    Returns the span active in the current context.
+
+    Returns:
+        The current span, or None outside of any span.
+    """
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Context manager that times a block as a child of the current span.
+
+    Args:
+        name: The span (stage) name.
+        **attributes: Attributes attached to the span, e.g. session_id or app_id.
+
+    Yields:
+        The active span.
+    """
+    active = Span(name, parent=_current_span.get(), attributes=attributes)
+    token = _current_span.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.set_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        active.end()
+        _export(active)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """
+    Decorator wrapping every call of a function in a span.
+
+    Args:
+        name: The span name, defaults to "<module>.<function>".
+
+    Returns:
+        The decorator.
+    """
+    def decorator(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__}.{func.__name__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _percentile(ordered: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def stage_summary() -> Dict[str, Dict[str, float]]:
+    """
+    Summarizes the recent durations of every span name.
+
+    Returns:
+        A mapping of stage name to count, mean, p50, p95, p99 and max in seconds,
+        computed over the last TRACE_STAGE_WINDOW spans of each stage.
+    """
+    with _export_lock:
+        snapshot = {name: sorted(values) for name, values in _stage_durations.items() if values}
+
+    return {
+        name: {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "p50": _percentile(values, 0.50),
+            "p95": _percentile(values, 0.95),
+            "p99": _percentile(values, 0.99),
+            "max": values[-1],
+        }
+        for name, values in snapshot.items()
+    }
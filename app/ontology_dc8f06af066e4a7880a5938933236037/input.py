@@ -14,6 +14,13 @@ from openfabric_pysdk.utility import SchemaUtil
 class InputClass:
     prompt: str = None
     attachments: List[str] = None
+    idempotency_key: str = None
+    num_variants: int = None
+    model_variant: int = None
+    progressive: bool = None
+    use_cache: bool = None
+    user_id: str = None
+    profile: bool = None
 
 
 ################################################################
@@ -22,6 +29,13 @@ class InputClass:
 class InputClassSchema(Schema):
     prompt = fields.String(allow_none=True)
     attachments = fields.List(fields.String(allow_none=True), allow_none=True)
+    idempotency_key = fields.String(allow_none=True)
+    num_variants = fields.Integer(allow_none=True)
+    model_variant = fields.Integer(allow_none=True)
+    progressive = fields.Boolean(allow_none=True)
+    use_cache = fields.Boolean(allow_none=True)
+    user_id = fields.String(allow_none=True)
+    profile = fields.Boolean(allow_none=True)
 
     @post_load
     def create(self, data, **kwargs):
@@ -11,6 +11,11 @@ from openfabric_pysdk.utility import SchemaUtil
 @dataclass
 class OutputClass:
     message: str = None
+    job_id: str = None
+    status: str = None
+    enhanced_prompt: str = None
+    image_url: str = None
+    model_url: str = None
 
 
 ################################################################
@@ -18,6 +23,11 @@ class OutputClass:
 ################################################################
 class OutputClassSchema(Schema):
     message = fields.Str(allow_none=True)
+    job_id = fields.Str(allow_none=True)
+    status = fields.Str(allow_none=True)
+    enhanced_prompt = fields.Str(allow_none=True)
+    image_url = fields.Str(allow_none=True)
+    model_url = fields.Str(allow_none=True)
 
     @post_load
     def create(self, data, **kwargs):
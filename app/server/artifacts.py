@@ -0,0 +1,138 @@
+import os
+import re
+from typing import Optional, Tuple
+
+from core.artifacts import artifact_path, is_reference, mime_type
+from server.sidecar import SidecarRequestHandler, public_url, route
+
+# Chunk size used when streaming artifacts to the client
+CHUNK_SIZE = 64 * 1024
+
+# Content-addressed artifacts never change, so they can be cached forever
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def artifact_url(reference: str) -> str:
+    """
+    Builds the browser-facing URL of a stored artifact.
+
+    Args:
+        reference: The artifact reference.
+
+    Returns:
+        The URL served by the sidecar.
+    """
+    return public_url(f"/artifacts/{reference}")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single-range "Range: bytes=..." header.
+
+    Args:
+        header: The Range header value, or None.
+        size: The size of the artifact in bytes.
+
+    Returns:
+        An inclusive (start, end) tuple, None if the whole file should be sent.
+
+    Raises:
+        ValueError: If the range cannot be satisfied.
+    """
+    if not header:
+        return None
+
+    match = RANGE_PATTERN.match(header.strip())
+    if not match:
+        # Multiple or malformed ranges: fall back to the full body
+        return None
+
+    start, end = match.groups()
+    if start == "" and end == "":
+        return None
+    if start == "":
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        if size == 0:
+            raise ValueError("Range not satisfiable")
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
+
+@route("GET", r"/artifacts/(?P<reference>[^/]+)")
+def serve_artifact(request: SidecarRequestHandler, match: re.Match) -> None:
+    """
+    Serves a stored artifact with ETag validation, long-lived caching and byte ranges.
+
+    Args:
+        request: The active request handler.
+        match: The match of the route pattern.
+    """
+    reference = match.group("reference")
+    if not is_reference(reference) or not os.path.exists(artifact_path(reference)):
+        request.send_json(404, {"error": "Artifact not found"})
+        return
+
+    path = artifact_path(reference)
+    size = os.path.getsize(path)
+    etag = f'"{reference.split(".", 1)[0]}"'
+
+    if request.headers.get("If-None-Match") in (etag, "*"):
+        request.send_response(304)
+        request.send_cors_headers()
+        request.send_header("ETag", etag)
+        request.send_header("Cache-Control", CACHE_CONTROL)
+        request.end_headers()
+        return
+
+    # A stale If-Range validator means the client must get the whole artifact
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range != etag:
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        request.send_response(416)
+        request.send_cors_headers()
+        request.send_header("Content-Range", f"bytes */{size}")
+        request.send_header("Content-Length", "0")
+        request.end_headers()
+        return
+
+    start, end = byte_range if byte_range else (0, size - 1)
+    length = end - start + 1 if size else 0
+
+    request.send_response(206 if byte_range else 200)
+    request.send_cors_headers()
+    request.send_header("Content-Type", mime_type(reference))
+    request.send_header("Content-Length", str(length))
+    request.send_header("Accept-Ranges", "bytes")
+    request.send_header("ETag", etag)
+    request.send_header("Cache-Control", CACHE_CONTROL)
+    if byte_range:
+        request.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+    request.end_headers()
+
+    if request.command == "HEAD":
+        return
+
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            request.wfile.write(chunk)
+            remaining -= len(chunk)
@@ -0,0 +1,37 @@
+import re
+import threading
+
+from server.sidecar import SidecarRequestHandler, route
+from warmup import readiness
+
+
+@route("GET", r"/healthz")
+def serve_liveness(request: SidecarRequestHandler, match: re.Match) -> None:
+    """
+    Liveness probe: answers 200 as long as the process serves requests, whether or
+    not it is warm yet.
+
+    Args:
+        request: The active request handler.
+        match: The match of the route pattern.
+    """
+    state = readiness()
+    request.send_json(200, {
+        "status": "alive",
+        "uptime_seconds": state["uptime_seconds"],
+        "threads": threading.active_count(),
+    })
+
+
+@route("GET", r"/readyz")
+def serve_readiness(request: SidecarRequestHandler, match: re.Match) -> None:
+    """
+    Readiness probe: answers 200 once the warm-up has passed and 503 before, with
+    the status of each warm-up check.
+
+    Args:
+        request: The active request handler.
+        match: The match of the route pattern.
+    """
+    state = readiness()
+    request.send_json(200 if state["ready"] else 503, state)
@@ -0,0 +1,123 @@
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from core.jobs import Job, get_job
+from server.artifacts import artifact_url
+from server.sidecar import SidecarRequestHandler, public_url, route
+
+# Upper bound for the long-poll wait of a single request
+MAX_WAIT_SECONDS = 60.0
+
+# Most recent session messages accepted with a submitted job
+MAX_HISTORY_MESSAGES = 20
+
+# Request fields a submitted job passes on to the workflow
+JOB_REQUEST_FIELDS = ("prompt", "idempotency_key", "num_variants", "model_variant", "use_cache", "user_id", "profile")
+
+# Starts the workflow for a submitted job, registered by the process that runs it
+JobStarter = Callable[[Dict[str, Any], Optional[str], List[Dict[str, str]]], Job]
+_job_starter: Optional[JobStarter] = None
+
+
+def register_job_starter(starter: JobStarter) -> None:
+    """
+    Enables POST /jobs in this process.
+
+    Args:
+        starter: Starts the workflow with the request fields, the session ID and
+            the session history, and returns its job. It raises ValueError for
+            invalid fields.
+    """
+    global _job_starter
+    _job_starter = starter
+
+
+def job_url(job_id: str) -> str:
+    """
+    Builds the URL under which clients poll a job.
+
+    Args:
+        job_id: The job ID.
+
+    Returns:
+        The public URL of the job.
+    """
+    return public_url(f"/jobs/{job_id}")
+
+
+@route("GET", r"/jobs/(?P<job_id>[0-9a-f]{32})")
+def serve_job(request: SidecarRequestHandler, match: re.Match) -> None:
+    """
+    Returns the progress and the results published so far by a job, with browser
+    URLs for the stored image and model. With ``?since=<version>&wait=<seconds>``
+    the request is held until the job changes (long polling).
+
+    Args:
+        request: The active request handler.
+        match: The match of the route pattern.
+    """
+    job = get_job(match.group("job_id"))
+    if job is None:
+        request.send_json(404, {"error": "Job not found"})
+        return
+
+    params = request.query_params()
+    try:
+        since = int(params.get("since", -1))
+        wait = min(float(params.get("wait", 0)), MAX_WAIT_SECONDS)
+    except ValueError:
+        request.send_json(400, {"error": "since and wait must be numbers"})
+        return
+    if wait > 0:
+        job.wait_for_update(since, wait)
+
+    payload = job.to_dict()
+    for key in ("image_ref", "model_ref"):
+        reference = payload["results"].get(key)
+        if reference:
+            payload["results"][key.replace("_ref", "_url")] = artifact_url(reference)
+    request.send_json(200, payload)
+
+
+@route("POST", r"/jobs", admin=True)
+def submit_job(request: SidecarRequestHandler, match: re.Match) -> None:
+    """
+    Starts a workflow run in this process and returns its job at once, so clients
+    like the Streamlit frontend can poll it instead of running the pipeline
+    themselves. The body holds the request fields (``prompt``, ``num_variants``,
+    ``use_cache``, ...), an optional ``session_id`` and an optional ``history``
+    of earlier ``{"role", "content"}`` messages of the session. Submitting is an
+    admin route: it needs SIDECAR_ADMIN_TOKEN, or a loopback client without one.
+
+    Args:
+        request: The active request handler.
+        match: The match of the route pattern.
+    """
+    if _job_starter is None:
+        request.send_json(503, {"error": "This process does not run the workflow"})
+        return
+
+    try:
+        body = request.read_json() or {}
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        request.send_json(400, {"error": "The body must be a JSON object"})
+        return
+    if not isinstance(body, dict) or not isinstance(body.get("prompt"), str) or not body["prompt"].strip():
+        request.send_json(400, {"error": "A non-empty prompt is required"})
+        return
+
+    history = body.get("history") or []
+    if not isinstance(history, list) or not all(
+            isinstance(message, dict) and isinstance(message.get("content"), str) for message in history):
+        request.send_json(400, {"error": "history must be a list of {role, content} messages"})
+        return
+
+    fields = {name: body[name] for name in JOB_REQUEST_FIELDS if body.get(name) is not None}
+    session_id = body.get("session_id") if isinstance(body.get("session_id"), str) else None
+    try:
+        job = _job_starter(fields, session_id, history[-MAX_HISTORY_MESSAGES:])
+    except ValueError as e:
+        request.send_json(400, {"error": str(e)})
+        return
+    request.send_json(202, {"job_id": job.job_id, "url": job_url(job.job_id), "status": job.status})
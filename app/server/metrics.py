@@ -0,0 +1,19 @@
+import re
+
+from observability.metrics import REGISTRY
+from server.sidecar import SidecarRequestHandler, route
+
+# Content type of the Prometheus text exposition format
+EXPOSITION_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@route("GET", r"/metrics")
+def serve_metrics(request: SidecarRequestHandler, match: re.Match) -> None:
+    """
+    Exposes the process metrics for Prometheus scraping.
+
+    Args:
+        request: The active request handler.
+        match: The match of the route pattern.
+    """
+    request.send_body(200, REGISTRY.expose().encode('utf-8'), EXPOSITION_CONTENT_TYPE)
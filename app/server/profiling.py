@@ -0,0 +1,45 @@
+import json
+import re
+
+from observability.profiling import arm, status
+from server.sidecar import SidecarRequestHandler, route
+
+
+@route("GET", r"/profiling", admin=True)
+def serve_profiling_status(request: SidecarRequestHandler, match: re.Match) -> None:
+    """
+    Returns the profiling status: the requests still armed, the mode, the sample
+    rate and the most recent profiles. Like arming, it is an admin route.
+
+    Args:
+        request: The active request handler.
+        match: The match of the route pattern.
+    """
+    request.send_json(200, status())
+
+
+@route("POST", r"/profiling", admin=True)
+def arm_profiling(request: SidecarRequestHandler, match: re.Match) -> None:
+    """
+    Profiles the next execute calls of this process. The body holds the number of
+    ``requests`` (0 disarms, at most PROFILE_MAX_ARMED_REQUESTS) and an optional
+    ``mode``: ``cprofile``, ``pyinstrument`` or ``tracemalloc``. It needs
+    SIDECAR_ADMIN_TOKEN, or a loopback client without one.
+
+    Args:
+        request: The active request handler.
+        match: The match of the route pattern.
+    """
+    try:
+        body = request.read_json() or {}
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        request.send_json(400, {"error": "The body must be a JSON object"})
+        return
+    if not isinstance(body, dict) or not isinstance(body.get("requests"), int) or isinstance(body["requests"], bool):
+        request.send_json(400, {"error": "requests must be an integer"})
+        return
+
+    try:
+        request.send_json(200, arm(body["requests"], body.get("mode")))
+    except ValueError as e:
+        request.send_json(400, {"error": str(e)})
@@ -0,0 +1,271 @@
+import hmac
+import ipaddress
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple
+from urllib.parse import parse_qs
+
+from logger.logging import logger
+
+# Sidecar HTTP server configuration
+SIDECAR_HOST = os.getenv("SIDECAR_HOST", "0.0.0.0")
+SIDECAR_PORT = int(os.getenv("SIDECAR_PORT", "8889"))
+SIDECAR_PUBLIC_URL = os.getenv("SIDECAR_PUBLIC_URL", f"http://localhost:{SIDECAR_PORT}").rstrip('/')
+
+# Token the admin routes (job submission, profiling) require in the X-Sidecar-Token
+# header. Without one they only answer clients on the loopback interface
+SIDECAR_ADMIN_TOKEN = os.getenv("SIDECAR_ADMIN_TOKEN", "")
+ADMIN_TOKEN_HEADER = "X-Sidecar-Token"
+
+# A route handler receives the request and the match of its path pattern
+RouteHandler = Callable[['SidecarRequestHandler', re.Match], None]
+
+_routes: List[Tuple[str, Pattern, RouteHandler, bool]] = []
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def route(method: str, pattern: str, admin: bool = False) -> Callable[[RouteHandler], RouteHandler]:
+    """
+    Decorator registering a handler for a method and a path regex.
+
+    Args:
+        method: The HTTP method, e.g. "GET".
+        pattern: A regular expression matched against the full request path (without query).
+        admin: True for routes that start work or change the process, which require
+            SIDECAR_ADMIN_TOKEN (or a loopback client without one), a JSON body for
+            POST and are not shared with other origins.
+
+    Returns:
+        The decorator.
+    """
+    def decorator(handler: RouteHandler) -> RouteHandler:
+        _routes.append((method.upper(), re.compile(f"^{pattern}$"), handler, admin))
+        return handler
+    return decorator
+
+
+def public_url(path: str) -> str:
+    """
+    Builds the URL under which a sidecar path is reachable from the browser.
+
+    Args:
+        path: The absolute path on the sidecar, e.g. "/artifacts/<ref>".
+
+    Returns:
+        The public URL.
+    """
+    return f"{SIDECAR_PUBLIC_URL}{path}"
+
+
+def set_public_url(url: str) -> None:
+    """
+    Overrides the browser-facing base URL, e.g. for a worker process whose sidecar
+    listens on its own port.
+
+    Args:
+        url: The base URL without a trailing slash.
+    """
+    global SIDECAR_PUBLIC_URL
+    SIDECAR_PUBLIC_URL = url.rstrip('/')
+
+
+class SidecarRequestHandler(BaseHTTPRequestHandler):
+    """
+    Dispatches requests to the registered routes. HEAD requests are served by the
+    GET handler; handlers check `self.command` to skip the body.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    # Cleared for admin routes, whose responses other origins may not read
+    cors_allowed = True
+
+    # ----------------------------------------------------------------------
+    def _dispatch(self, method: str) -> None:
+        path = self.path.split('?', 1)[0]
+        allowed = False
+        self.cors_allowed = True
+        for route_method, pattern, handler, admin in _routes:
+            match = pattern.match(path)
+            if not match:
+                continue
+            allowed = True
+            if route_method == method or (method == "HEAD" and route_method == "GET"):
+                if admin:
+                    self.cors_allowed = False
+                    if not self._admin_allowed(method):
+                        return
+                try:
+                    handler(self, match)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                except Exception as e:
+                    logger.error("[Sidecar] %s %s failed: %s", method, path, e, exc_info=True)
+                    self.send_json(500, {"error": "Internal server error"})
+                return
+
+        if allowed:
+            self.send_json(405, {"error": "Method not allowed"})
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_HEAD(self):
+        self._dispatch("HEAD")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_OPTIONS(self):
+        # Only the read-only routes are shared with other origins, so browsers refuse
+        # cross-origin JSON POSTs to the admin routes at the preflight
+        self.send_response(204)
+        self.send_cors_headers()
+        self.send_header("Access-Control-Allow-Methods", "GET, HEAD, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Range, If-None-Match")
+        self.send_header("Access-Control-Max-Age", "86400")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    # ----------------------------------------------------------------------
+    def _admin_allowed(self, method: str) -> bool:
+        """
+        Checks the admin token, or the loopback client when no token is configured,
+        and answers 401, 403 or 415 if the request may not reach an admin route.
+        A JSON body is required for POST so that browsers have to send a preflight
+        for it, which cross-origin pages do not pass.
+        """
+        if SIDECAR_ADMIN_TOKEN:
+            if not hmac.compare_digest(self.headers.get(ADMIN_TOKEN_HEADER, "").encode(),
+                                       SIDECAR_ADMIN_TOKEN.encode()):
+                self.send_json(401, {"error": f"A valid {ADMIN_TOKEN_HEADER} header is required"})
+                return False
+        elif not _is_loopback(self.client_address[0]):
+            self.send_json(403, {"error": "Set SIDECAR_ADMIN_TOKEN to use this route from another host"})
+            return False
+
+        content_type = self.headers.get("Content-Type", "").split(";", 1)[0].strip().lower()
+        if method == "POST" and content_type != "application/json":
+            self.send_json(415, {"error": "The body must be sent as application/json"})
+            return False
+        return True
+
+    # ----------------------------------------------------------------------
+    def send_cors_headers(self) -> None:
+        """Allows the Streamlit components iframe to fetch sidecar resources."""
+        if not self.cors_allowed:
+            return
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Expose-Headers", "Accept-Ranges, Content-Length, Content-Range, ETag")
+
+    # ----------------------------------------------------------------------
+    def send_body(self, status: int, body: bytes, content_type: str) -> None:
+        """
+        Sends a complete response with the given body.
+
+        Args:
+            status: The HTTP status code.
+            body: The response body.
+            content_type: The Content-Type header value.
+        """
+        self.send_response(status)
+        self.send_cors_headers()
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    # ----------------------------------------------------------------------
+    def send_json(self, status: int, payload: Any) -> None:
+        """
+        Sends a JSON response.
+
+        Args:
+            status: The HTTP status code.
+            payload: A JSON-serializable object.
+        """
+        self.send_body(status, json.dumps(payload).encode('utf-8'), "application/json")
+
+    # ----------------------------------------------------------------------
+    def query_params(self) -> Dict[str, str]:
+        """
+        Parses the query string of the request.
+
+        Returns:
+            The last value of every query parameter.
+        """
+        query = self.path.split('?', 1)[1] if '?' in self.path else ""
+        return {name: values[-1] for name, values in parse_qs(query).items()}
+
+    # ----------------------------------------------------------------------
+    def read_json(self) -> Any:
+        """
+        Reads and parses a JSON request body.
+
+        Returns:
+            The parsed body, or None if the body is empty.
+        """
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return None
+        return json.loads(self.rfile.read(length))
+
+    # ----------------------------------------------------------------------
+    def log_message(self, format, *args):
+        # Access logs are too noisy for the application log
+        pass
+
+
+def _is_loopback(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    mapped = getattr(ip, "ipv4_mapped", None)
+    return (mapped or ip).is_loopback
+
+
+def start_sidecar(host: str = SIDECAR_HOST, port: int = SIDECAR_PORT) -> Optional[ThreadingHTTPServer]:
+    """
+    Starts the sidecar HTTP server on a daemon thread. Calling it again returns the
+    running server. If the port is taken (e.g. by the sidecar of another local
+    process sharing the same stores) a warning is logged and None is returned.
+
+    Args:
+        host: The interface to bind.
+        port: The port to bind.
+
+    Returns:
+        The running server, or None if it could not be started.
+    """
+    global _server
+
+    # Registers the built-in routes
+    import server.artifacts  # noqa: F401
+    import server.health  # noqa: F401
+    import server.jobs  # noqa: F401
+    import server.metrics  # noqa: F401
+    import server.profiling  # noqa: F401
+    import server.stats  # noqa: F401
+
+    with _server_lock:
+        if _server is not None:
+            return _server
+
+        try:
+            _server = ThreadingHTTPServer((host, port), SidecarRequestHandler)
+        except OSError as e:
+            logger.warning("[Sidecar] Could not bind %s:%s: %s", host, port, e)
+            return None
+
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="sidecar", daemon=True).start()
+        logger.info("[Sidecar] Listening on %s:%s", host, port)
+        return _server
@@ -0,0 +1,16 @@
+import re
+
+from observability.tracing import stage_summary
+from server.sidecar import SidecarRequestHandler, route
+
+
+@route("GET", r"/stats/stages")
+def serve_stage_summary(request: SidecarRequestHandler, match: re.Match) -> None:
+    """
+    Returns the per-stage latency summary (count, mean, p50, p95, p99, max in seconds).
+
+    Args:
+        request: The active request handler.
+        match: The match of the route pattern.
+    """
+    request.send_json(200, stage_summary())
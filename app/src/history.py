@@ -0,0 +1,191 @@
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# Bounds of the session history sent to the LLMs
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "600"))
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "3"))
+HISTORY_SUMMARY_MAX_CHARS = int(os.getenv("HISTORY_SUMMARY_MAX_CHARS", "600"))
+
+# Characters json.dumps(indent=2) adds around each message in a history list, the
+# representation the enhancement stage used to send
+RAW_MESSAGE_OVERHEAD = 45
+
+# Characters of the "user: " / "assistant: " prefix and the newline of each message,
+# the representation the intent analysis used to send
+RAW_USER_LINE_OVERHEAD = 7
+RAW_ASSISTANT_LINE_OVERHEAD = 12
+
+# Prefix the UI and main.py put in front of enhanced prompts in the history
+ENHANCED_PREFIX = re.compile(r'^\*\*Enhanced Prompt:\*\*\s*')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of tokens of a text, at roughly four characters per token.
+
+    Args:
+        text: The text.
+
+    Returns:
+        The estimated token count.
+    """
+    return (len(text) + 3) // 4
+
+
+class SessionHistory:
+    """
+    Bounded history of a session. Only the last few turns are kept verbatim; older
+    turns are folded into a running summary of the user's requests as soon as they
+    drop out, so each new turn costs a constant amount of work. Older enhanced prompts
+    are dropped entirely, since every enhanced prompt supersedes the previous one.
+
+    Attributes:
+        max_turns (int): Turns kept verbatim.
+        token_budget (int): Upper bound for the estimated tokens of render().
+        summary_max_chars (int): Upper bound for the summary length.
+        turns (List[Tuple[str, Optional[str]]]): The recent (user request, enhanced prompt) pairs, oldest first.
+        summary (str): The folded requests of the older turns.
+        folded (int): The number of folded turns.
+        raw_tokens (int): Estimated tokens of all messages serialized as indented JSON,
+            the unbounded representation this history replaces in the enhancement.
+        raw_line_tokens (int): Estimated tokens of all messages as "role: content"
+            lines, the unbounded representation it replaces in the intent analysis.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, max_turns: int = HISTORY_MAX_TURNS, token_budget: int = HISTORY_TOKEN_BUDGET,
+                 summary_max_chars: int = HISTORY_SUMMARY_MAX_CHARS):
+        """
+        Initializes an empty history.
+
+        Args:
+            max_turns (int): Turns kept verbatim.
+            token_budget (int): Upper bound for the estimated tokens of render().
+            summary_max_chars (int): Upper bound for the summary length.
+        """
+        self.max_turns = max(1, max_turns)
+        self.token_budget = token_budget
+        self.summary_max_chars = summary_max_chars
+        self.turns: List[Tuple[str, Optional[str]]] = []
+        self.summary = ""
+        self.folded = 0
+        self.raw_tokens = 0
+        self.raw_line_tokens = 0
+
+    # ----------------------------------------------------------------------
+    @classmethod
+    def from_messages(cls, messages: List[Dict[str, Any]], **kwargs: Any) -> 'SessionHistory':
+        """
+        Builds a history from chat messages ({'role': ..., 'content': ...}); entries
+        without text content, like image or model references, are skipped.
+
+        Args:
+            messages (List[Dict[str, Any]]): The session messages, oldest first.
+            **kwargs: Bounds passed to the constructor.
+
+        Returns:
+            SessionHistory: The bounded history.
+        """
+        history = cls(**kwargs)
+        for message in messages:
+            content = message.get('content')
+            if message.get('type', 'text') != 'text' or not isinstance(content, str):
+                continue
+            if message.get('role') == 'user':
+                history.add_request(content)
+            else:
+                history.add_enhanced_prompt(content)
+        return history
+
+    # ----------------------------------------------------------------------
+    def add_request(self, prompt: str) -> None:
+        """
+        Starts a new turn with a user request.
+
+        Args:
+            prompt (str): The user's request.
+        """
+        self.raw_tokens += estimate_tokens(prompt) + RAW_MESSAGE_OVERHEAD // 4
+        self.raw_line_tokens += estimate_tokens(prompt) + RAW_USER_LINE_OVERHEAD // 4
+        self.turns.append((prompt.strip(), None))
+        while len(self.turns) > self.max_turns:
+            self._fold_oldest()
+
+    # ----------------------------------------------------------------------
+    def add_enhanced_prompt(self, enhanced_prompt: str) -> None:
+        """
+        Records the enhanced prompt of the current turn.
+
+        Args:
+            enhanced_prompt (str): The enhanced prompt, with or without the UI prefix.
+        """
+        self.raw_tokens += estimate_tokens(enhanced_prompt) + RAW_MESSAGE_OVERHEAD // 4
+        self.raw_line_tokens += estimate_tokens(enhanced_prompt) + RAW_ASSISTANT_LINE_OVERHEAD // 4
+        enhanced_prompt = ENHANCED_PREFIX.sub('', enhanced_prompt.strip())
+        if self.turns and self.turns[-1][1] is None:
+            self.turns[-1] = (self.turns[-1][0], enhanced_prompt)
+        else:
+            self.turns.append(("", enhanced_prompt))
+            while len(self.turns) > self.max_turns:
+                self._fold_oldest()
+
+    # ----------------------------------------------------------------------
+    def _fold_oldest(self) -> None:
+        """Moves the request of the oldest turn into the summary, keeping the summary bounded."""
+        request, _ = self.turns.pop(0)
+        self.folded += 1
+        if request:
+            self.summary = f"{self.summary}; {request}" if self.summary else request
+        if len(self.summary) > self.summary_max_chars:
+            # The latest requests matter most, so the start is cut
+            self.summary = "..." + self.summary[-(self.summary_max_chars - 3):]
+
+    # ----------------------------------------------------------------------
+    def render(self) -> str:
+        """
+        Serializes the history compactly, one line per entry. Turns are folded until
+        the estimated tokens fit the budget, keeping at least the last turn.
+
+        Returns:
+            str: The history text, empty if there is none.
+        """
+        while len(self.turns) > 1 and estimate_tokens(self._render()) > self.token_budget:
+            self._fold_oldest()
+        return self._render()
+
+    # ----------------------------------------------------------------------
+    def _render(self) -> str:
+        lines = []
+        if self.summary:
+            lines.append(f"earlier requests: {self.summary}")
+        for request, enhanced_prompt in self.turns:
+            if request:
+                lines.append(f"user: {request}")
+            if enhanced_prompt:
+                lines.append(f"enhanced: {enhanced_prompt}")
+        return "\n".join(lines)
+
+
+def compact_history(history: Union[SessionHistory, List[Dict[str, Any]], None],
+                    baseline: str = "json") -> Tuple[str, int]:
+    """
+    Renders a session history for a system prompt and computes the prompt tokens
+    saved compared with the unbounded representation the calling stage used before.
+
+    Args:
+        history: A SessionHistory or the session messages.
+        baseline: "json" for every message serialized as indented JSON (enhancement)
+            or "lines" for one "role: content" line per message (intent analysis).
+
+    Returns:
+        The rendered history (empty if there is none) and the estimated tokens saved.
+    """
+    if not history:
+        return "", 0
+    if not isinstance(history, SessionHistory):
+        history = SessionHistory.from_messages(history)
+
+    rendered = history.render()
+    raw_tokens = history.raw_line_tokens if baseline == "lines" else history.raw_tokens
+    return rendered, max(0, raw_tokens - estimate_tokens(rendered))
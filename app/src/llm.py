@@ -1,10 +1,16 @@
-import ollama
-import json
-import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from logger.logging import logger
+from core.resilience import STAGE_TIMEOUTS
+from observability.metrics import HISTORY_TOKENS_SAVED
+from src.history import SessionHistory, compact_history
+from src.ollama_client import chat
+from src.prompt_templates import NOT_PROVIDED, PromptTemplate
+from src.response_parser import message_content, parse_json_answer, strip_reasoning
 
-SYSTEM_PROMPT = """
+# Session history as chat messages or as an already bounded SessionHistory
+History = Union[List[Dict[str, str]], SessionHistory]
+
+SYSTEM_PROMPT = PromptTemplate("""
 You are an AI prompt enhancement expert specialized in creating detailed, vivid prompts for image generation. Your primary job is to transform user requests into rich, comprehensive prompts that produce stunning visual results.
 
 **Your Core Process:**
@@ -107,32 +113,61 @@ User asks: "a vintage car"
 
 Your response: {{"newEnhancedPrompt": "A beautifully restored 1960s vintage car parked on a cobblestone street, chrome bumpers gleaming, classic red paint with subtle reflections, warm afternoon sunlight, nostalgic atmosphere, detailed leather interior visible through windows, classic architectural background, film photography aesthetic, rich colors and textures"}}
 
-"""
+""")
 
 
-USER_PROMPT = """
+USER_PROMPT = PromptTemplate("""
 User's current request: {userPrompt}  
 NOTE: You need to carefully understand what the user wants and create a detailed visual prompt. If you have past context, you should modify the existing enhanced prompt by adding, removing, or changing elements to match the user's new request. If you have current session history, you should find the most recent enhanced prompt from the current conversation and modify it based on the user's request. If you don't have any context, you should enhance the user's simple request by adding natural environment, lighting, composition, and visual details that make sense for the scene.
-"""
-
-def enhance_prompt(
-    user_prompt: str,
-    current_session_history: Optional[List[Dict[str, str]]] = None,
+""")
+
+VARIANTS_PROMPT = PromptTemplate("""
+Instead of a single prompt, create {numVariants} distinct variants of the enhanced prompt. Each variant must satisfy the user's request but take a different creative direction (composition, lighting, style or mood). Rate how well each variant fits the request from 0 to 10 and list the best one first.
+
+This overrides the response format above. You must respond with ONLY a JSON object like this:
+{{"variants": [{{"prompt": "first detailed prompt", "score": 9}}, {{"prompt": "second detailed prompt", "score": 7}}]}}
+""")
+
+# The system prompt with the unused context sections bound ahead of time
+MEMORY_SYSTEM_PROMPT = SYSTEM_PROMPT.partial(currentSessionHistory=NOT_PROVIDED)
+SESSION_SYSTEM_PROMPT = SYSTEM_PROMPT.partial(pastContext=NOT_PROVIDED)
+SCRATCH_SYSTEM_PROMPT = SYSTEM_PROMPT.render(pastContext=NOT_PROVIDED, currentSessionHistory=NOT_PROVIDED)
+
+# Answer schemas for structured-output mode
+ENHANCED_PROMPT_SCHEMA = {
+    "type": "object",
+    "properties": {"newEnhancedPrompt": {"type": "string"}},
+    "required": ["newEnhancedPrompt"],
+}
+VARIANTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "variants": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"prompt": {"type": "string"}, "score": {"type": "number"}},
+                "required": ["prompt", "score"],
+            },
+        },
+    },
+    "required": ["variants"],
+}
+
+def build_system_prompt(
+    current_session_history: Optional[History] = None,
     retrieved_memory: Optional[Dict[str, Any]] = None
 ) -> str:
     """
-    Uses a local LLM to enhance a user's prompt, making it context-aware.
+    Fills the system prompt with the past context or the current session history.
 
     Args:
-        user_prompt: The latest prompt from the user.
-        history: The short-term conversation history from the current session.
+        current_session_history: The short-term conversation history from the current session.
         retrieved_memory: The most relevant long-term memory retrieved from the database.
 
     Returns:
-        A single, enhanced prompt string.
+        The formatted system prompt.
     """
-    current_session_history = current_session_history or []
-    
     # Handles past context from retrieved memory
     if retrieved_memory:
         past_user_prompt = retrieved_memory.get('user_prompt', 'Unknown')
@@ -146,69 +181,143 @@ def enhance_prompt(
         - Created on: {past_timestamp}
         """
         
-        logger.info(f"[LLM] Using past context from memory ID: {retrieved_memory.get('id', 'Unknown')}")
+        logger.info("[LLM] Using past context from memory ID: %s", retrieved_memory.get('id', 'Unknown'))
         
-        formatted_system_prompt = SYSTEM_PROMPT.format(pastContext=past_context, currentSessionHistory="Not provided")
+        return MEMORY_SYSTEM_PROMPT.render(pastContext=past_context)
+
+    # Handles current session history when no past context, bounded to the token budget
+    session_history_str, tokens_saved = compact_history(current_session_history)
+    if session_history_str:
+        HISTORY_TOKENS_SAVED.inc(tokens_saved, stage="enhancement")
+        logger.info("[LLM] Using current session history: %s chars, ~%s prompt tokens saved",
+                    len(session_history_str), tokens_saved)
         
+        return SESSION_SYSTEM_PROMPT.render(currentSessionHistory=session_history_str)
 
-    elif current_session_history:
-        # Handles current session history when no past context
-        session_history_str = json.dumps(current_session_history, indent=2)
-        
-        logger.info(f"[LLM] Using current session history: {len(current_session_history)} messages")
-        
-        formatted_system_prompt = SYSTEM_PROMPT.format(
-            pastContext="Not provided",
-            currentSessionHistory=session_history_str
-        )
-        
-    else:
-        formatted_system_prompt = SYSTEM_PROMPT.format(pastContext="Not provided", currentSessionHistory="Not provided")
-        logger.info("[LLM] No past context available, enhancing from scratch")
+    logger.info("[LLM] No past context available, enhancing from scratch")
+    return SCRATCH_SYSTEM_PROMPT
+
+def enhance_prompt(
+    user_prompt: str,
+    current_session_history: Optional[History] = None,
+    retrieved_memory: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Uses a local LLM to enhance a user's prompt, making it context-aware.
+
+    Args:
+        user_prompt: The latest prompt from the user.
+        history: The short-term conversation history from the current session.
+        retrieved_memory: The most relevant long-term memory retrieved from the database.
 
-    formatted_user_prompt = USER_PROMPT.format(userPrompt=user_prompt)
+    Returns:
+        A single, enhanced prompt string.
+    """
+    formatted_system_prompt = build_system_prompt(current_session_history, retrieved_memory)
+    formatted_user_prompt = USER_PROMPT.render(userPrompt=user_prompt)
 
     try:
-        response = ollama.chat(
-            model="deepseek-r1:14b",
+        response = chat(
             messages=[
                 {"role": "system", "content": formatted_system_prompt},
                 {"role": "user", "content": formatted_user_prompt}
             ],
-            options={"temperature": 0.7}
+            options={"temperature": 0.7},
+            timeout=STAGE_TIMEOUTS["enhancement"],
+            schema=ENHANCED_PROMPT_SCHEMA
         )
-        response_content = response['message']['content'].strip()
-
-        logger.info(f"[LLM] Raw response: '{response_content}'")
+        response_content = message_content(response)
 
-        # Remove <think> tags and any other reasoning wrapper tags
-        response_cleaned = re.sub(r'<think>.*?</think>', '', response_content, flags=re.DOTALL).strip()
-        
-        logger.info(f"[LLM] Cleaned response: '{response_cleaned}'")
+        logger.debug("[LLM] Raw response: '%s'", response_content)
 
         # Parse JSON response for enhanced prompt
-        try:
-            response_json = json.loads(response_cleaned)
+        response_json = parse_json_answer(response_content, "enhancement", "newEnhancedPrompt")
+        if response_json is not None:
             enhanced_prompt = response_json.get("newEnhancedPrompt", "")
-            
-        except json.JSONDecodeError as json_err:
-            logger.warning(f"[LLM] JSON parsing failed: {json_err}")
 
+        else:
             # Fallback parsing if JSON fails
+            response_cleaned = strip_reasoning(response_content)
             if response_cleaned.startswith('"') and response_cleaned.endswith('"'):
                 enhanced_prompt = response_cleaned.strip('"')
             else:
                 enhanced_prompt = response_cleaned
-            logger.warning(f"[LLM] Using fallback parsing: '{enhanced_prompt}'")
+            logger.warning("[LLM] Using fallback parsing: '%s'", enhanced_prompt)
         
         # If the response is empty or too short, use fallback
         if not enhanced_prompt or len(enhanced_prompt) < 10:
             enhanced_prompt = f"A photorealistic, cinematic image of: {user_prompt}"
-            logger.warning(f"[LLM] Empty or short response, using fallback: {enhanced_prompt}")
+            logger.warning("[LLM] Empty or short response, using fallback: %s", enhanced_prompt)
 
-        logger.info(f"[LLM] Generated Enhanced Prompt: {enhanced_prompt}")
+        logger.info("[LLM] Generated Enhanced Prompt: %s", enhanced_prompt)
         return enhanced_prompt
 
     except Exception as e:
-        logger.error(f"[LLM] Failed to enhance prompt: {e}", exc_info=True)
-        return f"A photorealistic, cinematic image of: {user_prompt}"
\ No newline at end of file
+        logger.error("[LLM] Failed to enhance prompt: %s", e, exc_info=True)
+        return f"A photorealistic, cinematic image of: {user_prompt}"
+
+def enhance_prompt_variants(
+    user_prompt: str,
+    num_variants: int,
+    current_session_history: Optional[History] = None,
+    retrieved_memory: Optional[Dict[str, Any]] = None
+) -> List[str]:
+    """
+    Uses a single LLM call to create several ranked variants of the enhanced prompt.
+
+    Args:
+        user_prompt: The latest prompt from the user.
+        num_variants: The number of variants to ask for.
+        current_session_history: The short-term conversation history from the current session.
+        retrieved_memory: The most relevant long-term memory retrieved from the database.
+
+    Returns:
+        Up to num_variants enhanced prompts, best first. At least one prompt is
+        always returned.
+    """
+    formatted_system_prompt = build_system_prompt(current_session_history, retrieved_memory)
+    formatted_user_prompt = USER_PROMPT.render(userPrompt=user_prompt) + VARIANTS_PROMPT.render(numVariants=num_variants)
+
+    try:
+        response = chat(
+            messages=[
+                {"role": "system", "content": formatted_system_prompt},
+                {"role": "user", "content": formatted_user_prompt}
+            ],
+            options={"temperature": 0.9},
+            timeout=STAGE_TIMEOUTS["enhancement"],
+            schema=VARIANTS_SCHEMA
+        )
+        response_content = message_content(response)
+
+        logger.debug("[LLM] Raw variants response: '%s'", response_content)
+
+        response_json = parse_json_answer(response_content, "variants", "variants", "newEnhancedPrompt")
+        if response_json is None:
+            logger.warning("[LLM] Variants JSON parsing failed, using the response as one prompt.")
+            response_json = {"variants": [strip_reasoning(response_content).strip('"')]}
+
+        if isinstance(response_json, dict) and "newEnhancedPrompt" in response_json:
+            # The model ignored the variants format and answered with a single prompt
+            response_json = {"variants": [response_json["newEnhancedPrompt"]]}
+
+        scored = []
+        for rank, variant in enumerate(response_json.get("variants", []) if isinstance(response_json, dict) else []):
+            if isinstance(variant, dict):
+                text, score = variant.get("prompt", ""), variant.get("score")
+            else:
+                text, score = variant, None
+            if isinstance(text, str) and len(text) >= 10:
+                # Unscored variants keep the order the model listed them in
+                scored.append((-float(score) if isinstance(score, (int, float)) else 0.0, rank, text))
+
+        variants = [text for _, _, text in sorted(scored)][:num_variants]
+        if not variants:
+            raise ValueError("The response contained no usable variants")
+
+        logger.info("[LLM] Generated %s enhanced prompt variants.", len(variants))
+        return variants
+
+    except Exception as e:
+        logger.error("[LLM] Failed to create prompt variants: %s", e, exc_info=True)
+        return [f"A photorealistic, cinematic image of: {user_prompt}"]
@@ -0,0 +1,113 @@
+import math
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from core.resilience import call_with_retries, get_breaker
+from observability.metrics import record_ollama_response
+from observability.tracing import span
+
+# Model used by both LLM layers
+DEFAULT_MODEL = "deepseek-r1:14b"
+
+# Deadline of a chat call whose caller does not set one, retries included
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "120"))
+
+# Constrain answers to the caller's JSON schema and turn reasoning off (needs Ollama 0.9+)
+OLLAMA_STRUCTURED_OUTPUT = os.getenv("OLLAMA_STRUCTURED_OUTPUT", "0").lower() in ("1", "true", "yes")
+
+# Timing and token fields reported by Ollama with every response
+RESPONSE_STATS = (
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+    "load_duration",
+    "total_duration",
+)
+
+
+_clients: Dict[float, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(timeout: float):
+    """
+    Returns a shared Ollama client whose HTTP requests time out after the given
+    number of seconds. The host is read from OLLAMA_HOST, as by ollama.chat.
+
+    Args:
+        timeout: The HTTP timeout in seconds.
+
+    Returns:
+        The ollama.Client for this timeout.
+    """
+    import ollama
+
+    with _clients_lock:
+        if timeout not in _clients:
+            _clients[timeout] = ollama.Client(timeout=timeout)
+        return _clients[timeout]
+
+
+def _is_transient(error: BaseException) -> bool:
+    """Whether a chat error may go away on retry: anything but a 4xx answer other than 429."""
+    status = getattr(error, "status_code", None)
+    return status is None or not 400 <= status < 500 or status == 429
+
+
+def chat(
+    messages: List[Dict[str, str]],
+    options: Optional[Dict[str, Any]] = None,
+    model: str = DEFAULT_MODEL,
+    timeout: Optional[float] = None,
+    schema: Optional[Dict[str, Any]] = None,
+    **kwargs: Any
+):
+    """
+    Sends a chat request to the local Ollama server inside an "ollama.chat" span.
+    Connection errors, timeouts, server errors and rate limiting are retried with
+    backoff until the deadline, through the "ollama" circuit breaker. Other
+    errors Ollama answers with, e.g. an unknown model, are raised at once.
+
+    Args:
+        messages: The chat messages to send.
+        options: Ollama model options, e.g. the temperature.
+        model: The model to use.
+        timeout: Deadline in seconds for all attempts (default: OLLAMA_TIMEOUT).
+        schema: JSON schema of the expected answer. With OLLAMA_STRUCTURED_OUTPUT it
+            is passed as the format for constrained decoding and thinking is disabled,
+            so the answer is plain JSON without a <think> block.
+        **kwargs: Further arguments passed to ollama.Client.chat.
+
+    Returns:
+        The Ollama chat response.
+
+    Raises:
+        CircuitOpenError: If the circuit breaker is open.
+        Exception: The error of the last attempt.
+    """
+    import httpx
+    import ollama
+
+    timeout = timeout or OLLAMA_TIMEOUT
+    structured = schema is not None and OLLAMA_STRUCTURED_OUTPUT
+    if structured:
+        kwargs.update(format=schema, think=False)
+
+    def attempt(remaining: float):
+        # Retries get a client for the time left, in whole seconds to bound the client cache
+        client = get_client(math.ceil(remaining))
+        return client.chat(model=model, messages=messages, options=options, **kwargs)
+
+    with span("ollama.chat", model=model, structured=structured) as active:
+        response = call_with_retries(
+            "ollama.chat", attempt, timeout, breaker=get_breaker("ollama"),
+            retry_on=(ConnectionError, httpx.TransportError, ollama.ResponseError), retryable=_is_transient
+        )
+        for field in RESPONSE_STATS:
+            value = response.get(field)
+            if value is not None:
+                active.set_attribute(f"ollama.{field}", value)
+        record_ollama_response(model, response)
+        return response
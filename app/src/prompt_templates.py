@@ -0,0 +1,104 @@
+from string import Formatter
+from typing import Any, List, Optional, Tuple
+
+# Placeholder value for context sections that are not used
+NOT_PROVIDED = "Not provided"
+
+
+class PromptTemplate:
+    """
+    A str.format-style prompt template parsed once into its static text segments
+    and placeholder names. Rendering only joins the segments with the values, and
+    partial() binds some placeholders ahead of time, so the static parts of the
+    multi-KB system prompts are never re-scanned per call.
+
+    Attributes:
+        fields (Tuple[str, ...]): The names of the unbound placeholders, in order.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, template: str):
+        """
+        Parses the template. Doubled braces are literal braces, as with str.format.
+
+        Args:
+            template (str): The template text.
+
+        Raises:
+            ValueError: If a placeholder uses a format spec, a conversion or indexing.
+        """
+        parts: List[Tuple[str, Optional[str]]] = []
+        literal = ""
+        for text, field, spec, conversion in Formatter().parse(template):
+            literal += text
+            if field is None:
+                continue
+            if spec or conversion or not field.isidentifier():
+                raise ValueError(f"Unsupported placeholder in prompt template: {field!r}")
+            parts.append((literal, field))
+            literal = ""
+        self._parts = parts
+        self._tail = literal
+        self.fields = tuple(field for _, field in parts)
+
+    # ----------------------------------------------------------------------
+    @classmethod
+    def _from_parts(cls, parts: List[Tuple[str, Optional[str]]], tail: str) -> 'PromptTemplate':
+        template = cls.__new__(cls)
+        template._parts = parts
+        template._tail = tail
+        template.fields = tuple(field for _, field in parts)
+        return template
+
+    # ----------------------------------------------------------------------
+    def render(self, **values: Any) -> str:
+        """
+        Fills every placeholder.
+
+        Args:
+            **values: A value for each name in fields.
+
+        Returns:
+            str: The rendered prompt.
+
+        Raises:
+            KeyError: If a placeholder has no value.
+        """
+        if not self._parts:
+            return self._tail
+        pieces = []
+        for literal, field in self._parts:
+            pieces.append(literal)
+            pieces.append(str(values[field]))
+        pieces.append(self._tail)
+        return "".join(pieces)
+
+    # ----------------------------------------------------------------------
+    def partial(self, **values: Any) -> 'PromptTemplate':
+        """
+        Binds some placeholders and merges their values into the static segments.
+
+        Args:
+            **values: Values for some of the placeholders.
+
+        Returns:
+            PromptTemplate: A template with the remaining placeholders.
+        """
+        parts: List[Tuple[str, Optional[str]]] = []
+        literal = ""
+        for text, field in self._parts:
+            literal += text
+            if field in values:
+                literal += str(values[field])
+            else:
+                parts.append((literal, field))
+                literal = ""
+        return self._from_parts(parts, literal + self._tail)
+
+    # ----------------------------------------------------------------------
+    def __str__(self) -> str:
+        """Returns the equivalent str.format template."""
+        def escape(text: str) -> str:
+            return text.replace("{", "{{").replace("}", "}}")
+        pieces = [escape(literal) + "{" + field + "}" for literal, field in self._parts]
+        return "".join(pieces) + escape(self._tail)
@@ -0,0 +1,113 @@
+import json
+import re
+from typing import Any, Dict, Optional, Tuple
+
+from logger.logging import logger
+from observability.metrics import LLM_PARSE_RESULTS
+
+# Reasoning block deepseek-r1 emits before its answer in free-form mode
+THINK_PATTERN = re.compile(r'<think>.*?</think>', re.DOTALL)
+
+# Innermost JSON object, for answers with text around the JSON
+JSON_OBJECT_PATTERN = re.compile(r'\{[^{}]*\}')
+
+
+def message_content(response: Any) -> str:
+    """
+    Extracts the assistant message of an Ollama chat response.
+
+    Args:
+        response: The Ollama chat response.
+
+    Returns:
+        The stripped message content.
+    """
+    return response['message']['content'].strip()
+
+
+def strip_reasoning(content: str) -> str:
+    """
+    Removes <think> blocks from a model answer.
+
+    Args:
+        content: The raw answer.
+
+    Returns:
+        The answer without reasoning.
+    """
+    if '<think>' not in content:
+        return content.strip()
+    return THINK_PATTERN.sub('', content).strip()
+
+
+def _has_key(parsed: Any, keys: Tuple[str, ...]) -> bool:
+    return isinstance(parsed, dict) and any(key in parsed for key in keys)
+
+
+def parse_json_answer(content: str, layer: str, *keys: str) -> Optional[Dict[str, Any]]:
+    """
+    Parses the JSON object of a model answer. Structured-output answers are plain
+    JSON and take the first path; free-form answers may need the reasoning stripped
+    or the object searched in surrounding text. The path taken is counted in
+    app_llm_parse_total.
+
+    Args:
+        content: The raw answer.
+        layer: The LLM layer for logs and metrics, e.g. "enhancement".
+        *keys: The object must contain at least one of these keys.
+
+    Returns:
+        The parsed object, or None if the answer contains no object with the keys.
+    """
+    try:
+        parsed = json.loads(content)
+        if _has_key(parsed, keys):
+            LLM_PARSE_RESULTS.inc(layer=layer, path="json")
+            return parsed
+    except json.JSONDecodeError:
+        pass
+
+    cleaned = strip_reasoning(content)
+    try:
+        parsed = json.loads(cleaned)
+        if _has_key(parsed, keys):
+            LLM_PARSE_RESULTS.inc(layer=layer, path="stripped")
+            return parsed
+    except json.JSONDecodeError:
+        pass
+
+    for match in JSON_OBJECT_PATTERN.finditer(cleaned):
+        try:
+            parsed = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            continue
+        if _has_key(parsed, keys):
+            LLM_PARSE_RESULTS.inc(layer=layer, path="search")
+            return parsed
+
+    LLM_PARSE_RESULTS.inc(layer=layer, path="failed")
+    logger.warning("[%s] No JSON object with %s in the answer.", layer, " or ".join(keys))
+    return None
+
+
+def extract_enhanced_prompt(text: str) -> str:
+    """
+    Unwraps an enhanced prompt that is still a {"newEnhancedPrompt": ...} object.
+    enhance_prompt already returns plain text, so the JSON decode is only attempted
+    when the text looks like an object.
+
+    Args:
+        text: The result of enhance_prompt.
+
+    Returns:
+        The enhanced prompt.
+    """
+    if not text.startswith('{'):
+        return text
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError:
+        return text
+    if isinstance(parsed, dict) and isinstance(parsed.get("newEnhancedPrompt"), str):
+        return parsed["newEnhancedPrompt"]
+    return text
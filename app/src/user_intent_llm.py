@@ -1,12 +1,22 @@
-import json
-import re
-import ollama
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
 from logger.logging import logger
+from core.resilience import STAGE_TIMEOUTS
+from observability.metrics import HISTORY_TOKENS_SAVED
+from src.history import SessionHistory, compact_history
+from src.ollama_client import chat
+from src.prompt_templates import PromptTemplate
+from src.response_parser import message_content, parse_json_answer
+
+# Answer schema for structured-output mode
+INTENT_SCHEMA = {
+    "type": "object",
+    "properties": {"requiresMemory": {"type": "boolean"}},
+    "required": ["requiresMemory"],
+}
 
 # System prompt
-INTENT_ANALYZER_SYSTEM_PROMPT = """
+INTENT_ANALYZER_SYSTEM_PROMPT = PromptTemplate("""
 You are an AI assistant for an art generation system. Your job is to look at what the user is asking for and decide if they are talking about something from a previous conversation that happened before this current chat session.
 
 You will get the current chat session history as context. Use this to understand what has already been created or discussed in this current session.
@@ -42,15 +52,19 @@ Do not include any other text or explanations.
 
 **Example Response 2:** 
 {{"requiresMemory": false}}
-"""
+""")
+
+# The system prompt of a session without history, rendered once
+EMPTY_SESSION_SYSTEM_PROMPT = INTENT_ANALYZER_SYSTEM_PROMPT.render(
+    currentSessionContext="No previous conversation in this session.")
 
 # User prompt
-USER_PROMPT = "User's request: {userPrompt}"
+USER_PROMPT = PromptTemplate("User's request: {userPrompt}")
 
 
 def check_for_memory_intent(
     user_prompt: str,
-    current_session_history: Optional[List[Dict[str, str]]] = None
+    current_session_history: Optional[Union[List[Dict[str, str]], SessionHistory]] = None
 ) -> bool:
     """
     Uses an LLM to determine if a user's prompt requires long-term memory access.
@@ -62,63 +76,46 @@ def check_for_memory_intent(
     Returns:
         True if memory is required, False otherwise.
     """
-    current_session_history = current_session_history or []
-    
-    # Filtering to get only text entries from the session history
-    text_entries = [msg for msg in current_session_history if isinstance(msg.get('content'), str)]
+    # Only the text entries of the session, bounded to the history token budget
+    session_context, tokens_saved = compact_history(current_session_history, baseline="lines")
 
-    if text_entries:
-        context_lines = [f"{msg.get('role', 'unknown')}: {msg.get('content')}" for msg in text_entries]
-        session_context = "\n".join(context_lines)
-        logger.info(f"[Intent Analyzer] Current session context: {session_context}")
+    if session_context:
+        HISTORY_TOKENS_SAVED.inc(tokens_saved, stage="intent_analysis")
+        logger.info("[Intent Analyzer] Current session context (~%s prompt tokens saved): %s", tokens_saved, session_context)
+        formatted_system_prompt = INTENT_ANALYZER_SYSTEM_PROMPT.render(currentSessionContext=session_context)
 
     else:
-        session_context = "No previous conversation in this session."
+        formatted_system_prompt = EMPTY_SESSION_SYSTEM_PROMPT
     
     try:
         
-        formatted_system_prompt = INTENT_ANALYZER_SYSTEM_PROMPT.format(
-            currentSessionContext=session_context
-        )
-        
-        formatted_user_prompt = USER_PROMPT.format(userPrompt=user_prompt)
+        formatted_user_prompt = USER_PROMPT.render(userPrompt=user_prompt)
         
-        response = ollama.chat(
-            model="deepseek-r1:14b",
+        response = chat(
             messages=[
                 {"role": "system", "content": formatted_system_prompt},
                 {"role": "user", "content": formatted_user_prompt}
             ],
-            options={"temperature": 0.0} # We want a non creative response
+            options={"temperature": 0.0}, # We want a non creative response
+            timeout=STAGE_TIMEOUTS["intent_analysis"],
+            schema=INTENT_SCHEMA
         )
-        response_content = response['message']['content'].strip()
+        response_content = message_content(response)
         
-        logger.info(f"[Intent Analyzer] Raw response: '{response_content}'")
+        logger.debug("[Intent Analyzer] Raw response: '%s'", response_content)
 
-        # Remove <think> tags and any other reasoning wrapper tags
-        response_cleaned = re.sub(r'<think>.*?</think>', '', response_content, flags=re.DOTALL).strip()
-        
-
-        try:
-            response_json = json.loads(response_cleaned)
+        response_json = parse_json_answer(response_content, "intent_analysis", "requiresMemory")
+        if response_json is not None:
             requires_memory = response_json.get("requiresMemory", False)
-            logger.info(f"[Intent Analyzer] Parsed JSON response: {requires_memory}")
-        except json.JSONDecodeError:
-            
-            # Look for JSON object in the response
-            json_match = re.search(r'\{[^}]*"requiresMemory"[^}]*\}', response_content)
-            if json_match:
-                json_str = json_match.group(0)
-                response_json = json.loads(json_str)
-                requires_memory = response_json.get("requiresMemory", "")
-
-            else:
-                requires_memory = False
-                logger.warning(f"[Intent Analyzer] Could not parse response, defaulting to False: '{response_content}'")
-
-        logger.info(f"Intent Analyzer for prompt '{user_prompt}': requires_memory={requires_memory}")
+            logger.info("[Intent Analyzer] Parsed JSON response: %s", requires_memory)
+
+        else:
+            requires_memory = False
+            logger.warning("[Intent Analyzer] Could not parse response, defaulting to False: '%s'", response_content)
+
+        logger.info("Intent Analyzer for prompt '%s': requires_memory=%s", user_prompt, requires_memory)
         return requires_memory
 
     except Exception as e:
-        logger.error(f"[Intent Analyzer] Failed to analyze intent: {e}", exc_info=True)
+        logger.error("[Intent Analyzer] Failed to analyze intent: %s", e, exc_info=True)
         return False
\ No newline at end of file
@@ -6,8 +6,28 @@ echo "🔌 Starting Openfabric event server on port 8888…"
 poetry run python ./ignite.py &  
 IGNITE_PID=$!
 
-# Give the server a moment to come up
-sleep 2
+# Wait until the event server is warm (models loaded, apps connected)
+if [ "${WORKERS:-1}" -gt 1 ]; then
+  READY_URL="${READY_URL:-http://localhost:${WORKER_SIDECAR_BASE_PORT:-8950}/readyz}"
+else
+  READY_URL="${READY_URL:-http://localhost:8889/readyz}"
+fi
+READY_TIMEOUT="${READY_TIMEOUT:-600}"
+echo "⏳ Waiting for the event server to warm up ($READY_URL)…"
+for ((i = 0; i < READY_TIMEOUT; i++)); do
+  if python3 -c "import sys, urllib.request; urllib.request.urlopen(sys.argv[1], timeout=2)" "$READY_URL" 2>/dev/null; then
+    echo "✅ Event server is ready."
+    break
+  fi
+  if ! kill -0 "$IGNITE_PID" 2>/dev/null; then
+    echo "❌ Event server exited during the warm-up."
+    exit 1
+  fi
+  sleep 1
+done
+if (( i >= READY_TIMEOUT )); then
+  echo "⚠️ Event server is not ready after ${READY_TIMEOUT}s, starting Streamlit anyway."
+fi
 
 echo "🚀 Launching Streamlit app on port 8501…"
 exec poetry run streamlit run ./streamlit_app.py --server.port 8501 --server.headless true
@@ -1,20 +1,78 @@
+import os
 import base64
 import uuid
 import re
 import json
+import urllib.error
+import urllib.request
 import streamlit as st
 import streamlit.components.v1 as components
 
 from logger.logging import logger
 from utils import load_json
 
-from core.stub import Stub
+from core.resilience import STAGE_TIMEOUTS
+from core.stub import Stub, StubCallError
+from core.artifacts import save_artifact
+from server.artifacts import artifact_url
+from server.sidecar import ADMIN_TOKEN_HEADER, SIDECAR_ADMIN_TOKEN, start_sidecar
+from src.history import SessionHistory
 from src.llm import enhance_prompt
+from src.response_parser import extract_enhanced_prompt
 from src.user_intent_llm import check_for_memory_intent
-from database.memory_manager import find_similar_prompts, save_generation
+from database.writer import submit_generation
+from database.retrieval import retrieve_memory
+from warmup import start_background_warmup
+from workers import WORKER_SIDECAR_BASE_PORT, WORKERS
 
 st.set_page_config(layout="wide", page_title="AI Developer Challenge")
 
+# Sidecar URL of the ignite backend (e.g. http://localhost:8889). When set, prompts are
+# submitted there as jobs and polled, instead of running the pipeline in this process.
+BACKEND_URL = os.getenv("STREAMLIT_BACKEND_URL", "").rstrip('/')
+
+# With several workers only their memory writer process may write SQLite and ChromaDB,
+# so Streamlit cannot run the pipeline itself and submits to the first worker instead
+if not BACKEND_URL and WORKERS > 1:
+    BACKEND_URL = f"http://localhost:{WORKER_SIDECAR_BASE_PORT}"
+
+# Seconds between two status requests for a submitted job
+JOB_POLL_SECONDS = 1.0
+
+# Progress shown while a job is running, by the last stage it finished
+JOB_PROGRESS = {
+    None: "🧠 Analyzing your intent...",
+    "retrieval": "🎨 Enhancing your idea...",
+    "enhancement": "🖼️ Generating image...",
+    "text_to_image": "🧊 Generating 3D model... (this can take a moment)",
+}
+
+@st.cache_resource
+def start_warmup():
+    """Loads the heavy dependencies in the background once per Streamlit server process."""
+    return start_background_warmup()
+
+@st.cache_resource
+def start_artifact_server():
+    """Starts the sidecar that serves stored images and 3D models to the browser."""
+    return start_sidecar()
+
+# In client mode the backend holds the models and serves the artifacts
+if not BACKEND_URL:
+    start_warmup()
+    start_artifact_server()
+
+@st.cache_data(ttl=60)
+def load_state():
+    """
+    Loads config/state.json. The result is cached across reruns; failures are not
+    cached so a fixed file is picked up on the next interaction.
+
+    Returns:
+        The parsed state dictionary.
+    """
+    return load_json("config/state.json")
+
 def load_app_ids():
     """
     Loads Openfabric application IDs using the utility loader.
@@ -23,19 +81,58 @@ def load_app_ids():
         A list of application IDs, or an empty list on error.
     """
     try:
-        state = load_json("config/state.json")
+        state = load_state()
         return state.get("super-user", {}).get("app_ids", [])
     except (FileNotFoundError, json.JSONDecodeError) as e:
-        logger.error(f"Could not load or parse config/state.json: {e}")
+        logger.error("Could not load or parse config/state.json: %s", e)
         st.error(f"Could not load or parse config/state.json: {e}")
         return []
 
-def render_3d_model(model_bytes):
-    """Renders a 3D model using the model-viewer component."""
-    b64_model = base64.b64encode(model_bytes).decode("utf-8")
+@st.cache_resource
+def get_stub(app_ids):
+    """
+    Creates one Stub per set of app IDs and shares it across reruns and sessions,
+    so manifests, schemas and connections are only loaded once.
+
+    Args:
+        app_ids: A tuple of Openfabric application IDs.
+
+    Returns:
+        The shared Stub instance.
+    """
+    return Stub(list(app_ids))
+
+@st.cache_data
+def load_logo_b64():
+    """
+    Reads and base64-encodes the Openfabric logo once.
+
+    Returns:
+        The base64-encoded logo, or None if the file is missing.
+    """
+    try:
+        with open("assets/openfabric_logo.png", "rb") as img_file:
+            return base64.b64encode(img_file.read()).decode()
+    except FileNotFoundError:
+        return None
+
+def entry_url(entry):
+    """
+    Returns the browser URL of an image or 3D model history entry.
+
+    Args:
+        entry: The history entry. Entries of backend jobs carry the backend's URL.
+
+    Returns:
+        The URL of the stored artifact.
+    """
+    return entry.get('url') or artifact_url(entry['content'])
+
+def render_3d_model(model_url):
+    """Renders a stored 3D model using the model-viewer component, streamed from the artifact server."""
     model_viewer_html = f"""
         <script type="module" src="https://ajax.googleapis.com/ajax/libs/model-viewer/3.5.0/model-viewer.min.js"></script>
-        <model-viewer style="width: 100%; height: 400px;" src="data:model/gltf-binary;base64,{b64_model}"
+        <model-viewer style="width: 100%; height: 400px;" src="{model_url}"
         ar ar-modes="webxr scene-viewer quick-look" camera-controls tone-mapping="neutral"
         poster="https://placehold.co/600x400/eee/eee?text=Loading..." shadow-intensity="1"
         environment-image="neutral" auto-rotate>
@@ -43,30 +140,120 @@ def render_3d_model(model_bytes):
     """
     components.html(model_viewer_html, height=400)
 
+def submit_job(prompt, history):
+    """
+    Submits a prompt to the backend, which runs the pipeline on its shared models.
+
+    Args:
+        prompt: The user's prompt.
+        history: The earlier text messages of this session.
+
+    Returns:
+        The submitted job with its job_id and the url to poll.
+    """
+    body = json.dumps({
+        "prompt": prompt,
+        "session_id": st.session_state.session_id,
+        "history": history,
+    }).encode('utf-8')
+    headers = {"Content-Type": "application/json"}
+    if SIDECAR_ADMIN_TOKEN:
+        headers[ADMIN_TOKEN_HEADER] = SIDECAR_ADMIN_TOKEN
+    request = urllib.request.Request(f"{BACKEND_URL}/jobs", data=body, method="POST", headers=headers)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.load(response)
+
+def fetch_job(url):
+    """
+    Fetches the progress and the results published so far by a backend job.
+
+    Args:
+        url: The job URL returned by submit_job.
+
+    Returns:
+        The job state.
+    """
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.load(response)
+
+def finish_job(job):
+    """
+    Moves the results of a finished backend job into the session history.
+
+    Args:
+        job: The final job state.
+    """
+    results = job['results']
+    history = st.session_state.history
+    if results.get('enhanced_prompt'):
+        history.append({'type': 'text', 'role': 'assistant', 'content': f"**Enhanced Prompt:** {results['enhanced_prompt']}"})
+    if results.get('image_url'):
+        history.append({'type': 'image', 'role': 'assistant', 'content': results['image_ref'], 'url': results['image_url']})
+    if results.get('model_url'):
+        history.append({'type': '3d', 'role': 'assistant', 'content': results['model_ref'], 'url': results['model_url']})
+    if job['status'] == "failed" or not results.get('model_url'):
+        history.append({'type': 'text', 'role': 'assistant', 'content': f"⚠️ {results.get('message') or 'The generation did not complete.'}"})
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_active_job():
+    """
+    Shows the results of the running backend job as they are published. The page
+    stays responsive meanwhile; once the job finished its results move to the
+    history and the page is redrawn.
+    """
+    active = st.session_state.get("active_job")
+    if not active:
+        return
+
+    try:
+        job = fetch_job(active['url'])
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        logger.error("Could not poll job %s: %s", active['job_id'], e)
+        st.session_state.active_job = None
+        st.session_state.history.append({'type': 'text', 'role': 'assistant', 'content': f"⚠️ Lost the connection to the backend: {e}"})
+        st.rerun()
+
+    if job['status'] != "running":
+        st.session_state.active_job = None
+        finish_job(job)
+        st.rerun()
+
+    results = job['results']
+    with st.chat_message("assistant"):
+        memory = results.get('retrieved_memory')
+        if memory:
+            st.info(f"Found a related memory from {memory['timestamp']}:\n> {memory['enhanced_prompt']}")
+        if results.get('enhanced_prompt'):
+            st.markdown(f"**Enhanced Prompt:** {results['enhanced_prompt']}")
+        if results.get('image_url'):
+            st.image(results['image_url'], width=400)
+        st.caption(JOB_PROGRESS.get(job['stage'], "⏳ Working..."))
+
 
 # Initialize session state
 if "session_id" not in st.session_state:
     st.session_state.session_id = str(uuid.uuid4())
-    logger.info(f"New session started: {st.session_state.session_id}")
+    logger.info("New session started: %s", st.session_state.session_id)
 
 if "history" not in st.session_state:
-    st.session_state.history = [] # Will store dicts of {'type': 'text/imag/3d/, 'role': 'user'/'assistant', 'content':...}
+    st.session_state.history = [] # Will store dicts of {'type': 'text/imag/3d/, 'role': 'user'/'assistant', 'content':...}, artifacts are stored as references
+
+if "llm_history" not in st.session_state:
+    st.session_state.llm_history = SessionHistory() # Bounded, incrementally summarized view of the history for the LLM calls
 
 # Main app UI
-try:
-    with open("assets/openfabric_logo.png", "rb") as img_file:
-        img_bytes = img_file.read()
-        img_b64 = base64.b64encode(img_bytes).decode()
-        st.markdown(f"""
-            <div style='text-align: center; margin-bottom: 20px;'>
-                <h1 style='margin: 0; font-size: 3rem;'>🚀 AI Creative Partner</h1>
-                <div style='display: flex; align-items: center; justify-content: center; margin-top: 2px; margin-left: 500px;'>
-                    <span style='font-size: 18px; color: #666; margin-right: 8px;'>powered by</span>
-                    <img src='data:image/png;base64,{img_b64}' width='70' height='70'>
-                </div>
+logo_b64 = load_logo_b64()
+if logo_b64:
+    st.markdown(f"""
+        <div style='text-align: center; margin-bottom: 20px;'>
+            <h1 style='margin: 0; font-size: 3rem;'>🚀 AI Creative Partner</h1>
+            <div style='display: flex; align-items: center; justify-content: center; margin-top: 2px; margin-left: 500px;'>
+                <span style='font-size: 18px; color: #666; margin-right: 8px;'>powered by</span>
+                <img src='data:image/png;base64,{logo_b64}' width='70' height='70'>
             </div>
-        """, unsafe_allow_html=True)
-except FileNotFoundError:
+        </div>
+    """, unsafe_allow_html=True)
+else:
     # Fallback if logo file is not found
     st.markdown("""
         <div style='text-align: center; margin-bottom: 20px;'>
@@ -82,20 +269,38 @@ for entry in st.session_state.history:
             st.markdown(entry['content'])
 
     elif entry['type'] == 'image':
-        # display historical image
+        # display historical image, served and cached by the artifact server
         with st.chat_message('assistant'):
-            st.image(entry['content'], width=400)
+            st.image(entry_url(entry), width=400)
 
     elif entry['type'] == '3d':
         # render historical 3d model
         with st.chat_message('assistant'):
-            render_3d_model(entry['content'])
+            render_3d_model(entry_url(entry))
+
+if BACKEND_URL:
+    show_active_job()
 
-# Main chat input
-if prompt := st.chat_input("Describe what you want to create..."):
+# Main chat input, disabled while a backend job of this session is running
+if prompt := st.chat_input("Describe what you want to create...", disabled=bool(st.session_state.get("active_job"))):
+
+    # In client mode the backend runs the pipeline and the page polls the job
+    if BACKEND_URL:
+        history = [{'role': entry['role'], 'content': entry['content']}
+                   for entry in st.session_state.history if entry['type'] == 'text']
+        st.session_state.history.append({'type': 'text', 'role': 'user', 'content': prompt})
+        try:
+            job = submit_job(prompt, history)
+            st.session_state.active_job = {'job_id': job['job_id'], 'url': job['url']}
+            logger.info("Submitted job %s to %s.", job['job_id'], BACKEND_URL)
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            logger.error("Could not submit the prompt to %s: %s", BACKEND_URL, e)
+            st.session_state.history.append({'type': 'text', 'role': 'assistant', 'content': f"⚠️ Could not reach the backend: {e}"})
+        st.rerun()
 
     # 1. Add user message to history and display it
     st.session_state.history.append({'type': 'text', 'role': 'user', 'content': prompt})
+    st.session_state.llm_history.add_request(prompt)
     with st.chat_message("user"):
         st.markdown(prompt)
 
@@ -105,16 +310,15 @@ if prompt := st.chat_input("Describe what you want to create..."):
             # Meory retrieval logic
             retrieved_memory = None
 
-            # updating the text history to include only text messages
-            text_history = [m for m in st.session_state.history if m['type'] == 'text']
+            # The LLMs only see the bounded history
+            text_history = st.session_state.llm_history
             with st.spinner("🧠 Analyzing your intent..."):
                 requires_memory = check_for_memory_intent(prompt, text_history)
 
             if requires_memory:
                 with st.spinner("🧠 Accessing long-term memories..."):
-                    similar = find_similar_prompts(prompt, k=1)
-                    if similar:
-                        retrieved_memory = similar[0]
+                    retrieved_memory = retrieve_memory(prompt, session_id=st.session_state.session_id)
+                    if retrieved_memory:
                         st.info(f"Found a related memory from {retrieved_memory['timestamp']}:\n> {retrieved_memory['enhanced_prompt']}")
             
 
@@ -126,23 +330,12 @@ if prompt := st.chat_input("Describe what you want to create..."):
                     retrieved_memory=retrieved_memory
                 )
 
-                # Extract the enhanced prompt from JSON if it's in JSON format
-                try:
-                    # Try to parse as JSON first
-                    enhanced_json = json.loads(enhanced_response)
-                    if isinstance(enhanced_json, dict) and "newEnhancedPrompt" in enhanced_json:
-                        enhanced_prompt = enhanced_json["newEnhancedPrompt"]
-
-                    else:
-                        # If JSON doesn't have expected key, using the whole cleaned response
-                        enhanced_prompt = enhanced_response
-
-                except json.JSONDecodeError:
-                    # If it's not JSON, use the cleaned response as it is
-                    enhanced_prompt = enhanced_response
+                # Unwrap the enhanced prompt if it is still in JSON format
+                enhanced_prompt = extract_enhanced_prompt(enhanced_response)
 
                 # Save the *enhanced* prompt to the history for short-term memory
                 st.session_state.history.append({'type': 'text', 'role': 'assistant', 'content': f"**Enhanced Prompt:** {enhanced_prompt}"})
+                st.session_state.llm_history.add_enhanced_prompt(enhanced_prompt)
                 st.markdown(f"**Enhanced Prompt:** {enhanced_prompt}")
 
             # Openfabric app IDs loading
@@ -151,44 +344,58 @@ if prompt := st.chat_input("Describe what you want to create..."):
                 st.error("Two Openfabric app IDs are required. Check your config.")
                 st.stop()
 
-            stub = Stub(app_ids)
+            stub = get_stub(tuple(app_ids))
 
             # Call Text-to-Image App
             with st.spinner("🖼️ Generating image..."):
-                resp_img = stub.call(app_ids[0], {"prompt": enhanced_prompt}, uid="super-user")
+                try:
+                    resp_img = stub.call(app_ids[0], {"prompt": enhanced_prompt}, uid="super-user",
+                                         timeout=STAGE_TIMEOUTS["text_to_image"])
+                except StubCallError as e:
+                    st.error(f"Image generation failed: {e}")
+                    st.stop()
             img_bytes = resp_img.get("result") 
 
             if not img_bytes:
                 st.error("Failed to generate image. The response was empty.")
                 st.stop()
 
-            # Display image and add to history
-            st.image(img_bytes, width=400)
-            st.session_state.history.append({'type': 'image', 'role': 'assistant', 'content': img_bytes})
+            # Display image and add a reference to it to history
+            img_ref = save_artifact(img_bytes)
+            st.image(artifact_url(img_ref), width=400)
+            st.session_state.history.append({'type': 'image', 'role': 'assistant', 'content': img_ref})
 
             # Call Image-to-3D App
             with st.spinner("🧊 Generating 3D model... (this can take a moment)"):
                 img_b64 = base64.b64encode(img_bytes).decode('utf-8')
-                resp_3d = stub.call(app_ids[1], {"input_image": img_b64}, 'super-user')
-                model_bytes = resp_3d.get('generated_object')
+                try:
+                    resp_3d = stub.call(app_ids[1], {"input_image": img_b64}, 'super-user',
+                                        timeout=STAGE_TIMEOUTS["image_to_3d"])
+                    model_bytes = resp_3d.get('generated_object')
+                except StubCallError as e:
+                    logger.error("Image-to-3D failed: %s", e)
+                    model_bytes = None
 
             if not model_bytes:
                 st.warning("3D model generation finished, but no model data was returned.")
                 st.stop()
 
-            # Display 3D model and add to history
-            render_3d_model(model_bytes)
-            st.session_state.history.append({'type': '3d', 'role': 'assistant', 'content': model_bytes})
+            # Display 3D model and add a reference to it to history
+            model_ref = save_artifact(model_bytes, "glb")
+            render_3d_model(artifact_url(model_ref))
+            st.session_state.history.append({'type': '3d', 'role': 'assistant', 'content': model_ref})
 
             # 3. Save the enhanced prompt and user prompt to long-term memory
             with st.spinner("💾 Saving to long-term memory..."):
-                save_generation(
+                submit_generation(
                     session_id=st.session_state.session_id,
                     user_prompt=prompt,
-                    enhanced_prompt=enhanced_prompt
+                    enhanced_prompt=enhanced_prompt,
+                    image_ref=img_ref,
+                    model_ref=model_ref
                 )
             st.success("Creation saved to long-term memory!")
 
         except Exception as e:
-            logger.error(f"An error occurred in the main pipeline: {e}", exc_info=True)
+            logger.error("An error occurred in the main pipeline: %s", e, exc_info=True)
             st.error(f"An unexpected error occurred: {e}")
\ No newline at end of file
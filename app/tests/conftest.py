@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# The application modules import each other from the app directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def memory_db(tmp_path, monkeypatch):
+    """
+    Points the memory store at an empty SQLite database in a temporary directory,
+    with ChromaDB disabled and only the exact-hash duplicate check.
+    """
+    from database import memory_manager
+
+    monkeypatch.setattr(memory_manager, "DB_PATH", str(tmp_path / "memory.db"))
+    monkeypatch.setattr(memory_manager, "_sqlite_ready", False)
+    monkeypatch.setattr(memory_manager, "MEMORY_DEDUP_DISTANCE", 0.0)
+    monkeypatch.setattr(memory_manager, "init_chromadb", lambda: (None, None))
+    return memory_manager
@@ -0,0 +1,99 @@
+import http.client
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from core import artifacts
+from server.artifacts import parse_range
+from server.sidecar import SidecarRequestHandler
+
+DATA = bytes(range(256)) * 4
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 1023)),
+    ("bytes=1000-5000", (1000, 1023)),
+    ("bytes=-100", (924, 1023)),
+    ("bytes=-5000", (0, 1023)),
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1024) == expected
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1024-", 1024),
+    ("bytes=10-5", 1024),
+    ("bytes=-0", 1024),
+    ("bytes=-10", 0),
+    ("bytes=0-", 0),
+])
+def test_parse_range_rejects_unsatisfiable_ranges(header, size):
+    with pytest.raises(ValueError):
+        parse_range(header, size)
+
+
+@pytest.fixture
+def sidecar(tmp_path, monkeypatch):
+    """A sidecar on a free local port serving one stored artifact."""
+    monkeypatch.setattr(artifacts, "ARTIFACT_DIR", str(tmp_path))
+    reference = artifacts.save_artifact(DATA, "bin")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SidecarRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def get(**headers):
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+        try:
+            conn.request("GET", f"/artifacts/{reference}", headers=headers)
+            response = conn.getresponse()
+            return response.status, dict(response.getheaders()), response.read()
+        finally:
+            conn.close()
+
+    yield get
+    server.shutdown()
+    server.server_close()
+
+
+def test_artifact_is_served_with_its_etag(sidecar):
+    status, headers, body = sidecar()
+
+    assert status == 200
+    assert body == DATA
+    assert headers["ETag"].startswith('"')
+
+
+def test_matching_etag_answers_not_modified(sidecar):
+    etag = sidecar()[1]["ETag"]
+
+    status, headers, body = sidecar(**{"If-None-Match": etag})
+
+    assert status == 304
+    assert body == b""
+
+
+def test_range_returns_partial_content(sidecar):
+    status, headers, body = sidecar(Range="bytes=-4")
+
+    assert status == 206
+    assert headers["Content-Range"] == f"bytes 1020-1023/{len(DATA)}"
+    assert body == DATA[-4:]
+
+
+def test_stale_if_range_returns_the_whole_artifact(sidecar):
+    status, _, body = sidecar(Range="bytes=0-9", **{"If-Range": '"stale"'})
+
+    assert status == 200
+    assert body == DATA
+
+
+def test_unsatisfiable_range_answers_416(sidecar):
+    status, headers, body = sidecar(Range=f"bytes={len(DATA)}-")
+
+    assert status == 416
+    assert headers["Content-Range"] == f"bytes */{len(DATA)}"
+    assert body == b""
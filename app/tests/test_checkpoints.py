@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+
+import pytest
+
+from database import checkpoints
+
+PNG = b"\x89PNG\r\n\x1a\n image"
+GLB = b"glTF model"
+
+
+@pytest.fixture
+def checkpoint_db(memory_db, monkeypatch):
+    monkeypatch.setattr(checkpoints, "_checkpoints_ready", False)
+    return checkpoints
+
+
+class FakeStub:
+    """Answers both apps with canned bytes; the 3D app fails while fail_model is set."""
+
+    def __init__(self, fail_model=False):
+        self.fail_model = fail_model
+        self.calls = []
+
+    def call(self, app_id, inputs, uid, timeout=None):
+        from core.stub import StubCallError
+
+        self.calls.append(app_id)
+        if app_id == "image-app":
+            return {"result": PNG}
+        if self.fail_model:
+            raise StubCallError(app_id, "node unavailable")
+        return {"generated_object": GLB}
+
+
+@pytest.fixture
+def workflow(checkpoint_db, tmp_path, monkeypatch):
+    """main with canned LLM answers and apps, artifacts in a temporary directory and recorded saves."""
+    pytest.importorskip("marshmallow")
+    pytest.importorskip("openfabric_pysdk")
+    import main
+    from core import artifacts
+
+    stub = FakeStub()
+    saved = []
+    monkeypatch.setattr(artifacts, "ARTIFACT_DIR", str(tmp_path / "artifacts"))
+    monkeypatch.setattr(main, "get_config", lambda uid: SimpleNamespace(app_ids=["image-app", "model-app"]))
+    monkeypatch.setattr(main, "get_stub", lambda app_ids: stub)
+    monkeypatch.setattr(main, "check_for_memory_intent", lambda prompt, history: False)
+    monkeypatch.setattr(main, "enhance_prompt", lambda **kwargs: "A red dragon on a cliff")
+    monkeypatch.setattr(main, "lookup_generation", lambda user_prompt, enhanced_prompt: None)
+    monkeypatch.setattr(main, "submit_generation", lambda **generation: saved.append(generation))
+
+    def run(prompt="a dragon", key="key-1"):
+        response = main.OutputClass()
+        outcome = main._run_workflow(main.InputClass(prompt=prompt, idempotency_key=key), response, "s1")
+        return outcome, response
+
+    return SimpleNamespace(run=run, stub=stub, saved=saved)
+
+
+def test_save_checkpoint_only_overwrites_the_given_columns(checkpoint_db):
+    checkpoint_db.save_checkpoint("k", session_id="s1", prompt="a cat", stage=checkpoint_db.STAGE_ENHANCEMENT,
+                                  enhanced_prompt="A fluffy cat")
+    checkpoint_db.save_checkpoint("k", stage=checkpoint_db.STAGE_TEXT_TO_IMAGE, image_ref="img")
+
+    checkpoint = checkpoint_db.load_checkpoint("k")
+    assert checkpoint["stage"] == checkpoint_db.STAGE_TEXT_TO_IMAGE
+    assert checkpoint["enhanced_prompt"] == "A fluffy cat"
+    assert checkpoint["image_ref"] == "img"
+    assert checkpoint["persisted"] == 0
+    assert checkpoint_db.load_checkpoint("other") is None
+
+
+def test_save_checkpoint_rejects_unknown_columns(checkpoint_db):
+    with pytest.raises(ValueError):
+        checkpoint_db.save_checkpoint("k", colour="red")
+
+
+def test_retry_after_partial_run_resumes_at_the_3d_stage(workflow):
+    workflow.stub.fail_model = True
+    assert workflow.run()[0] == "partial"
+
+    workflow.stub.fail_model = False
+    workflow.stub.calls.clear()
+    outcome, response = workflow.run()
+
+    assert outcome == "success"
+    assert workflow.stub.calls == ["model-app"]
+    assert response.model_url.endswith(".glb")
+    # The retry adds the model to the saved row without counting another use
+    assert [generation["model_ref"] is not None for generation in workflow.saved] == [False, True]
+    assert workflow.saved[1]["count_use"] is False
+
+
+def test_retry_of_completed_run_replays_the_stored_result(workflow):
+    first_outcome, first = workflow.run()
+    workflow.stub.calls.clear()
+
+    outcome, replayed = workflow.run()
+
+    assert (outcome, first_outcome) == ("success", "success")
+    assert workflow.stub.calls == []
+    assert len(workflow.saved) == 1
+    assert replayed == first
+
+
+def test_idempotency_key_of_another_prompt_is_rejected(workflow):
+    workflow.run()
+
+    outcome, response = workflow.run(prompt="a castle")
+
+    assert outcome == "invalid"
+    assert "different prompt" in response.message
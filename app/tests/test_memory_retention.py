@@ -0,0 +1,58 @@
+from database.retention import _cold_ids
+
+
+def _set_times(conn, prompt_id, timestamp, last_used_at=None):
+    conn.execute("UPDATE prompts SET timestamp = ?, last_used_at = ? WHERE id = ?",
+                 (timestamp, last_used_at, prompt_id))
+    conn.commit()
+
+
+def test_exact_duplicate_updates_the_stored_record(memory_db):
+    first = memory_db.save_generation("s1", "a cat", "A  fluffy cat", user_id="alice")
+    second = memory_db.save_generation("s2", "cat", "a fluffy   CAT", image_ref="img", user_id="alice")
+
+    assert second == first
+    conn = memory_db.get_db_connection()
+    assert conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0] == 1
+    use_count, last_used_at, image_ref = conn.execute(
+        "SELECT use_count, last_used_at, image_ref FROM prompts WHERE id = ?", (first,)).fetchone()
+    assert use_count == 2
+    assert last_used_at is not None
+    assert image_ref == "img"
+
+
+def test_same_prompt_of_another_user_is_a_new_record(memory_db):
+    first = memory_db.save_generation("s1", "a cat", "A fluffy cat", user_id="alice")
+
+    assert memory_db.save_generation("s2", "a cat", "A fluffy cat", user_id="bob") != first
+    assert memory_db.save_generation("s3", "a cat", "A fluffy cat") != first
+
+
+def test_cap_keeps_the_most_recently_used_generations(memory_db):
+    ids = [memory_db.save_generation("s", f"p{i}", f"prompt {i}", user_id="alice") for i in range(3)]
+    conn = memory_db.get_db_connection()
+    _set_times(conn, ids[0], "2020-01-01 00:00:00", last_used_at="2030-01-01 00:00:00")
+    _set_times(conn, ids[1], "2021-01-01 00:00:00")
+    _set_times(conn, ids[2], "2022-01-01 00:00:00")
+
+    assert _cold_ids(conn, 0, 2, 100) == {ids[1]: "cap"}
+
+
+def test_cap_leaves_anonymous_generations_alone(memory_db):
+    anonymous = [memory_db.save_generation(f"s{i}", f"p{i}", f"prompt {i}") for i in range(3)]
+    owned = [memory_db.save_generation("s", f"q{i}", f"other {i}", user_id="alice") for i in range(2)]
+    conn = memory_db.get_db_connection()
+
+    cold = _cold_ids(conn, 0, 1, 100)
+
+    assert cold == {owned[0]: "cap"}
+    assert not set(anonymous) & set(cold)
+
+
+def test_ttl_counts_from_the_last_use(memory_db):
+    stale, reused = (memory_db.save_generation("s", f"p{i}", f"prompt {i}") for i in range(2))
+    conn = memory_db.get_db_connection()
+    _set_times(conn, stale, "2000-01-01 00:00:00")
+    _set_times(conn, reused, "2000-01-01 00:00:00", last_used_at="2999-01-01 00:00:00")
+
+    assert _cold_ids(conn, 30, 0, 100) == {stale: "ttl"}
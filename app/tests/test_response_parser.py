@@ -0,0 +1,47 @@
+import pytest
+
+from observability.metrics import LLM_PARSE_RESULTS
+from src.response_parser import extract_enhanced_prompt, parse_json_answer
+
+ANSWER = {"newEnhancedPrompt": "A red dragon on a cliff at dusk"}
+
+
+@pytest.mark.parametrize("content, path", [
+    ('{"newEnhancedPrompt": "A red dragon on a cliff at dusk"}', "json"),
+    ('<think>\nThe user wants {a dragon}.\n</think>\n{"newEnhancedPrompt": "A red dragon on a cliff at dusk"}',
+     "stripped"),
+    ('Sure! Here it is: {"newEnhancedPrompt": "A red dragon on a cliff at dusk"} Enjoy.', "search"),
+])
+def test_parse_json_answer_paths(content, path):
+    before = LLM_PARSE_RESULTS.value(layer="test", path=path)
+
+    assert parse_json_answer(content, "test", "newEnhancedPrompt") == ANSWER
+    assert LLM_PARSE_RESULTS.value(layer="test", path=path) == before + 1
+
+
+def test_parse_json_answer_needs_one_of_the_keys():
+    content = '{"requiresMemory": true} and then {"needs_memory": false}'
+
+    assert parse_json_answer(content, "test", "needs_memory", "needsMemory") == {"needs_memory": False}
+
+
+@pytest.mark.parametrize("content", [
+    "I cannot help with that.",
+    '{"unrelated": 1}',
+    '<think>{"newEnhancedPrompt": "only in the reasoning"}</think> no answer',
+])
+def test_parse_json_answer_fails_without_a_matching_object(content):
+    before = LLM_PARSE_RESULTS.value(layer="test", path="failed")
+
+    assert parse_json_answer(content, "test", "newEnhancedPrompt") is None
+    assert LLM_PARSE_RESULTS.value(layer="test", path="failed") == before + 1
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("A red dragon", "A red dragon"),
+    ('{"newEnhancedPrompt": "A red dragon"}', "A red dragon"),
+    ('{"newEnhancedPrompt": 3}', '{"newEnhancedPrompt": 3}'),
+    ("{not json", "{not json"),
+])
+def test_extract_enhanced_prompt(text, expected):
+    assert extract_enhanced_prompt(text) == expected
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from core import artifacts
+from database import semantic_cache
+
+
+class FakeCollection:
+    """Answers every query with fixed neighbours."""
+
+    def __init__(self, neighbours):
+        self.neighbours = neighbours
+
+    def query(self, query_texts, n_results):
+        ids, distances = zip(*self.neighbours[:n_results]) if self.neighbours else ((), ())
+        return {"ids": [list(ids)], "distances": [list(distances)]}
+
+
+@pytest.fixture
+def cache(memory_db, tmp_path, monkeypatch):
+    """Stores a generation with both artifacts and returns a function to set the nearest neighbours."""
+    monkeypatch.setattr(artifacts, "ARTIFACT_DIR", str(tmp_path / "artifacts"))
+    image_ref = artifacts.save_artifact(b"\x89PNG\r\n\x1a\n image")
+    model_ref = artifacts.save_artifact(b"glTF model")
+    prompt_id = memory_db.save_generation("s1", "a dragon", "A red dragon", image_ref=image_ref, model_ref=model_ref)
+
+    def neighbours(*pairs):
+        collection = FakeCollection(list(pairs))
+        monkeypatch.setattr(semantic_cache, "init_chromadb", lambda: (None, collection))
+
+    return prompt_id, image_ref, neighbours
+
+
+def test_close_generation_with_artifacts_is_a_hit(cache):
+    prompt_id, image_ref, neighbours = cache
+    neighbours(("999", 0.01), (str(prompt_id), 0.02))
+
+    record = semantic_cache.lookup_generation("a dragon", "A red dragon")
+
+    assert record["id"] == prompt_id
+    assert record["image_ref"] == image_ref
+    assert record["distance"] == 0.02
+
+
+def test_distant_generation_is_a_miss(cache):
+    prompt_id, _, neighbours = cache
+    neighbours((str(prompt_id), 0.3))
+
+    assert semantic_cache.lookup_generation("a dragon", "A blue whale") is None
+
+
+def test_generation_with_deleted_artifacts_is_a_miss(cache):
+    prompt_id, image_ref, neighbours = cache
+    neighbours((str(prompt_id), 0.01))
+    os.remove(artifacts.artifact_path(image_ref))
+
+    assert semantic_cache.lookup_generation("a dragon", "A red dragon") is None
+
+
+def test_zero_threshold_disables_the_cache(cache):
+    prompt_id, _, neighbours = cache
+    neighbours((str(prompt_id), 0.0))
+
+    assert semantic_cache.lookup_generation("a dragon", "A red dragon", threshold=0) is None
+
+
+def test_unavailable_vector_store_is_a_miss(cache, monkeypatch):
+    monkeypatch.setattr(semantic_cache, "init_chromadb", lambda: (None, None))
+
+    assert semantic_cache.lookup_generation("a dragon", "A red dragon") is None
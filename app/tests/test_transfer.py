@@ -0,0 +1,114 @@
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pytest.importorskip("numpy")
+
+from database import transfer  # noqa: E402
+
+
+class FakeCollection:
+    """Keeps vectors in a dict, with the parts of the ChromaDB collection API the transfer uses."""
+
+    def __init__(self):
+        self.vectors = {}
+
+    def get(self, ids, include):
+        found = [doc_id for doc_id in ids if doc_id in self.vectors]
+        return {"ids": found,
+                "embeddings": [self.vectors[doc_id]["embedding"] for doc_id in found],
+                "metadatas": [self.vectors[doc_id]["metadata"] for doc_id in found]}
+
+    def upsert(self, ids, documents, metadatas, embeddings=None):
+        for i, doc_id in enumerate(ids):
+            embedding = [float(value) for value in embeddings[i]] if embeddings is not None else None
+            self.vectors[doc_id] = {"embedding": embedding, "document": documents[i], "metadata": metadatas[i]}
+
+
+@pytest.fixture
+def store(memory_db, tmp_path, monkeypatch):
+    """Switches the memory store, and the vector index the transfer sees, to a new directory."""
+    monkeypatch.setattr(transfer, "ARCHIVE_DB_PATH", str(tmp_path / "archive.db"))
+
+    def use(name):
+        collection = FakeCollection()
+        monkeypatch.setattr(memory_db, "DB_PATH", str(tmp_path / f"{name}.db"))
+        monkeypatch.setattr(memory_db, "_sqlite_ready", False)
+        monkeypatch.setattr(transfer, "init_chromadb", lambda: (None, collection))
+        memory_db.init_sqlite()
+        return collection
+
+    return use
+
+
+def _rows(memory_db):
+    conn = memory_db.get_db_connection()
+    try:
+        return conn.execute(
+            "SELECT id, session_id, user_id, user_prompt, enhanced_prompt, image_ref FROM prompts ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def exported(memory_db, store, tmp_path):
+    """Exports three generations, the last one without a stored vector."""
+    source = store("source")
+    for i, user_id in enumerate(["alice", None, "bob"]):
+        prompt_id = memory_db.save_generation(f"s{i}", f"p{i}", f"prompt {i}", image_ref=f"img{i}", user_id=user_id)
+        if i < 2:
+            source.upsert([str(prompt_id)], [f"prompt {i}"], [memory_db.vector_metadata(f"s{i}", user_id)],
+                          embeddings=[[float(i), 0.5, -1.0]])
+    path = str(tmp_path / "memory.arrow")
+    assert transfer.export_memory(path, batch_size=2) == 3
+    return path, _rows(memory_db), source.vectors
+
+
+def test_export_import_round_trip(memory_db, store, exported):
+    path, rows, vectors = exported
+    target = store("target")
+
+    counts = transfer.import_memory(path, keep_ids=True)
+
+    assert counts == {"imported": 3, "skipped": 0, "embedded": 2, "reembedded": 1}
+    assert _rows(memory_db) == rows
+    for doc_id, vector in vectors.items():
+        assert target.vectors[doc_id] == vector
+    # The row exported without a vector gets its metadata rebuilt from the columns
+    assert target.vectors[str(rows[2][0])]["metadata"] == {"session_id": "s2", "user_id": "bob"}
+
+
+def test_import_with_kept_ids_skips_existing_rows(memory_db, store, exported):
+    path, rows, _ = exported
+    store("target")
+    transfer.import_memory(path, keep_ids=True)
+
+    counts = transfer.import_memory(path, keep_ids=True)
+
+    assert counts["imported"] == 0
+    assert counts["skipped"] == 3
+    assert _rows(memory_db) == rows
+
+
+def test_import_appends_after_the_existing_ids(memory_db, store, exported):
+    path, rows, _ = exported
+    target = store("target")
+    existing = memory_db.save_generation("local", "local", "a local generation")
+
+    assert transfer.import_memory(path)["imported"] == 3
+
+    imported = _rows(memory_db)[1:]
+    assert [row[0] for row in imported] == [existing + 1, existing + 2, existing + 3]
+    assert [row[1:] for row in imported] == [row[1:] for row in rows]
+    assert set(target.vectors) == {str(row[0]) for row in imported}
+
+
+def test_import_with_kept_ids_rejects_rows_without_an_id(memory_db, store, tmp_path):
+    store("target")
+    path = str(tmp_path / "no-ids.arrow")
+    batch = pa.RecordBatch.from_pydict({"session_id": ["s"], "user_prompt": ["p"], "enhanced_prompt": ["prompt"]})
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+
+    with pytest.raises(ValueError):
+        transfer.import_memory(path, keep_ids=True)
+    assert _rows(memory_db) == []
@@ -0,0 +1,244 @@
+import importlib
+import os
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from logger.logging import logger
+from observability.tracing import span
+
+# Heavy third-party modules that are imported lazily on first use
+HEAVY_MODULES = ["requests", "ollama", "chromadb", "sentence_transformers"]
+
+# Seconds between retries of the warm-up checks that failed
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "15"))
+
+# Send one synthetic request through retrieval, intent analysis and enhancement
+WARMUP_SYNTHETIC_REQUEST = os.getenv("WARMUP_SYNTHETIC_REQUEST", "1").lower() in ("1", "true", "yes")
+
+# Checks whose failure does not keep the server from reporting ready
+WARMUP_OPTIONAL_CHECKS = {name.strip() for name in os.getenv("WARMUP_OPTIONAL_CHECKS", "cross_encoder").split(",") if name.strip()}
+
+# Prompt of the synthetic request
+WARMUP_PROMPT = "a red apple on a wooden table"
+
+# Openfabric user whose app IDs are connected during the warm-up
+WARMUP_UID = "super-user"
+
+_checks: Dict[str, Dict[str, Any]] = {}
+_checks_lock = threading.Lock()
+_ready = threading.Event()
+_started_at = time.time()
+
+
+class CheckSkipped(Exception):
+    """Raised by a warm-up check that does not apply to this configuration."""
+
+
+def wait_for_port(host: str, port: int, timeout: float = 60.0) -> bool:
+    """
+    Blocks until something is listening on the given address.
+
+    Args:
+        host: The host to connect to.
+        port: The port to connect to.
+        timeout: Maximum number of seconds to wait.
+
+    Returns:
+        True if the port accepted a connection before the timeout, False otherwise.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def _check_sqlite() -> None:
+    from database.memory_manager import init_sqlite
+
+    init_sqlite()
+
+
+def _check_embedding() -> None:
+    from database.memory_manager import preload_embedding_model
+
+    if not preload_embedding_model():
+        raise RuntimeError("The embedding model could not be loaded")
+
+
+def _check_chroma() -> None:
+    from database.memory_manager import init_chromadb
+
+    _, collection = init_chromadb()
+    if collection is None:
+        raise RuntimeError("The ChromaDB collection could not be opened")
+
+
+def _check_cross_encoder() -> None:
+    from database.retrieval import RETRIEVAL_CROSS_ENCODER, prime_cross_encoder
+
+    if not RETRIEVAL_CROSS_ENCODER:
+        raise CheckSkipped("No cross-encoder is configured")
+    if not prime_cross_encoder():
+        raise RuntimeError(f"The cross-encoder {RETRIEVAL_CROSS_ENCODER} could not be loaded")
+
+
+def _check_ollama() -> None:
+    from src.ollama_client import chat
+
+    # Loads the model into memory; a single token is enough
+    chat(messages=[{"role": "user", "content": "Reply with OK."}], options={"num_predict": 1})
+
+
+def _check_synthetic_request() -> None:
+    from database.retrieval import retrieve_memory
+    from src import llm, user_intent_llm
+    from src.ollama_client import chat
+
+    if not WARMUP_SYNTHETIC_REQUEST:
+        raise CheckSkipped("WARMUP_SYNTHETIC_REQUEST is disabled")
+
+    # The stages run with their real system prompts, so Ollama has them cached for
+    # the first request; the answers themselves are not needed
+    with span("warmup.retrieval"):
+        retrieve_memory(WARMUP_PROMPT)
+    with span("warmup.intent_analysis"):
+        chat(messages=[
+            {"role": "system", "content": user_intent_llm.EMPTY_SESSION_SYSTEM_PROMPT},
+            {"role": "user", "content": user_intent_llm.USER_PROMPT.render(userPrompt=WARMUP_PROMPT)}
+        ], options={"temperature": 0.0, "num_predict": 1})
+    with span("warmup.enhancement"):
+        chat(messages=[
+            {"role": "system", "content": llm.SCRATCH_SYSTEM_PROMPT},
+            {"role": "user", "content": llm.USER_PROMPT.render(userPrompt=WARMUP_PROMPT)}
+        ], options={"temperature": 0.7, "num_predict": 1})
+
+
+def _check_openfabric() -> None:
+    from core.stub import get_stub
+    from database.config_store import load_config
+
+    app_ids = (load_config(WARMUP_UID) or {}).get("app_ids")
+    if not app_ids:
+        raise CheckSkipped(f"No app IDs are configured for '{WARMUP_UID}' yet")
+    if not get_stub(app_ids).is_connected():
+        raise RuntimeError(f"Could not connect to all of {', '.join(app_ids)}")
+
+
+# Warm-up checks in the order they run
+CHECKS: List[Tuple[str, Callable[[], None]]] = [
+    ("sqlite", _check_sqlite),
+    ("embedding", _check_embedding),
+    ("chroma", _check_chroma),
+    ("cross_encoder", _check_cross_encoder),
+    ("ollama", _check_ollama),
+    ("synthetic_request", _check_synthetic_request),
+    ("openfabric", _check_openfabric),
+]
+
+
+def _run_check(name: str, check: Callable[[], None]) -> Dict[str, Any]:
+    """Runs one check and records its status, duration and error."""
+    started = time.monotonic()
+    try:
+        with span(f"warmup.{name}"):
+            check()
+        result = {"status": "ok"}
+    except CheckSkipped as e:
+        result = {"status": "skipped", "reason": str(e)}
+    except Exception as e:
+        logger.warning("[Warm-up] Check %s failed: %s", name, e)
+        result = {"status": "failed", "error": str(e)}
+    result["seconds"] = round(time.monotonic() - started, 3)
+    with _checks_lock:
+        _checks[name] = result
+    return result
+
+
+def warmup() -> bool:
+    """
+    Loads the heavy dependencies ahead of the first request: the third-party
+    modules, the SQLite schema, the embedding model and ChromaDB collection, the
+    retrieval cross-encoder and the Ollama model, then sends a synthetic request
+    through the retrieval and LLM stages and connects to the configured Openfabric
+    apps. Checks that already passed are not repeated on a retry.
+
+    Returns:
+        True if the server is warm, i.e. every required check passed or was skipped.
+    """
+    started = time.monotonic()
+
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning("[Warm-up] Could not import %s: %s", name, e)
+
+    with _checks_lock:
+        for name, _ in CHECKS:
+            _checks.setdefault(name, {"status": "pending"})
+
+    for name, check in CHECKS:
+        if _checks[name]["status"] != "ok":
+            _run_check(name, check)
+
+    with _checks_lock:
+        failed = [name for name, result in _checks.items()
+                  if result["status"] not in ("ok", "skipped") and name not in WARMUP_OPTIONAL_CHECKS]
+    if failed:
+        logger.warning("[Warm-up] Not ready after %.2fs, failed checks: %s", time.monotonic() - started, ", ".join(failed))
+        return False
+
+    _ready.set()
+    logger.info("[Warm-up] Completed in %.2fs, the server is ready.", time.monotonic() - started)
+    return True
+
+
+def readiness() -> Dict[str, Any]:
+    """
+    Returns whether the server is warm, with the status of each warm-up check.
+
+    Returns:
+        A dict with "ready", "uptime_seconds" and "checks".
+    """
+    with _checks_lock:
+        checks = {name: dict(result) for name, result in _checks.items()}
+    return {
+        "ready": _ready.is_set(),
+        "uptime_seconds": round(time.time() - _started_at, 3),
+        "checks": checks,
+    }
+
+
+def start_background_warmup(host: Optional[str] = None, port: Optional[int] = None) -> threading.Thread:
+    """
+    Runs the warm-up on a daemon thread, optionally after the server port is bound
+    so that warming up never delays the server start. Failed checks are retried
+    every WARMUP_RETRY_SECONDS until the server is ready.
+
+    Args:
+        host: Host of the server to wait for.
+        port: Port of the server to wait for, or None to start warming up immediately.
+
+    Returns:
+        The started thread.
+    """
+    def run():
+        if port is not None and not wait_for_port(host or "127.0.0.1", port):
+            logger.warning("[Warm-up] Port %s was not bound in time, warming up anyway.", port)
+        while True:
+            try:
+                if warmup():
+                    return
+            except Exception as e:
+                logger.error("[Warm-up] Failed: %s", e, exc_info=True)
+            time.sleep(WARMUP_RETRY_SECONDS)
+
+    thread = threading.Thread(target=run, name="warmup", daemon=True)
+    thread.start()
+    return thread
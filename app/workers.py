@@ -0,0 +1,188 @@
+"""
+Multi-worker deployment of the Openfabric app.
+
+The supervisor preloads the heavy modules and the embedding model, freezes the
+garbage collector's view of them and forks:
+
+- one memory writer process, the only process writing to memory.db and ChromaDB
+  (it also runs the periodic maintenance job),
+- WORKERS worker processes, each running the Openfabric starter on
+  WORKER_BASE_PORT + i and its own sidecar on WORKER_SIDECAR_BASE_PORT + i.
+
+Forked workers share the preloaded model pages copy-on-write instead of loading
+one copy each. Configurations are kept in memory.db, so a config posted to any
+worker is seen by all of them. Workers that exit are restarted.
+
+Put a load balancer with sticky sessions in front of the worker ports; the
+Openfabric starter speaks Socket.IO.
+
+Usage (from the ``app`` directory):
+    WORKERS=4 python ignite.py
+    python workers.py --workers 4
+"""
+import argparse
+import gc
+import importlib
+import multiprocessing
+import os
+import signal
+import time
+from typing import Dict, Optional
+
+from logger.logging import logger
+from database import memory_manager
+from database.checkpoints import init_checkpoints
+from database.config_store import init_config_store
+from database.writer import run_writer, stop_writer, use_writer
+from warmup import HEAVY_MODULES, start_background_warmup
+
+# Multi-worker configuration
+WORKERS = int(os.getenv("WORKERS", "1"))
+WORKER_BASE_PORT = int(os.getenv("WORKER_BASE_PORT", "8900"))
+WORKER_SIDECAR_BASE_PORT = int(os.getenv("WORKER_SIDECAR_BASE_PORT", "8950"))
+WORKER_MEMORY_REFRESH_SECONDS = float(os.getenv("MEMORY_REFRESH_SECONDS", "30"))
+
+# Minimum seconds between two restarts of the same worker
+RESTART_BACKOFF = 5.0
+
+
+def preload() -> None:
+    """
+    Loads everything the workers share before forking: the heavy modules, the
+    embedding model and the SQLite schema. ChromaDB itself is opened after the
+    fork, because its client must not be shared between processes.
+    """
+    started = time.monotonic()
+    for name in HEAVY_MODULES + ["openfabric_pysdk.starter"]:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning("[Workers] Could not preload %s: %s", name, e)
+
+    memory_manager.init_sqlite()
+    init_config_store()
+    init_checkpoints()
+    memory_manager.preload_embedding_model()
+
+    # Objects allocated so far are never collected, so the collector does not
+    # touch (and copy) their pages in the children
+    gc.freeze()
+    logger.info("[Workers] Preloaded shared state in %.2fs", time.monotonic() - started)
+
+
+def run_writer_process(generations: multiprocessing.Queue, maintenance_interval: float) -> None:
+    """
+    Entry point of the memory writer process.
+
+    Args:
+        generations: The queue the workers submit generations to.
+        maintenance_interval: Seconds between maintenance runs, 0 to disable.
+    """
+    # Ctrl+C reaches the whole process group; the writer stops via its queue instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if maintenance_interval > 0:
+        from database.maintenance import start_background_maintenance
+
+        start_background_maintenance(maintenance_interval)
+    run_writer(generations)
+
+
+def run_worker_process(port: int, sidecar_port: int, generations: multiprocessing.Queue) -> None:
+    """
+    Entry point of a worker process.
+
+    Args:
+        port: The port of the Openfabric starter.
+        sidecar_port: The port of the worker's sidecar.
+        generations: The queue of the memory writer.
+    """
+    from openfabric_pysdk.starter import Starter
+    from server.sidecar import set_public_url, start_sidecar
+
+    # Restarted workers inherit the supervisor's handlers
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    use_writer(generations)
+    memory_manager.MEMORY_REFRESH_SECONDS = WORKER_MEMORY_REFRESH_SECONDS
+
+    # Job URLs must point at the sidecar of the worker that runs the job
+    if "SIDECAR_PUBLIC_URL" not in os.environ:
+        set_public_url(f"http://localhost:{sidecar_port}")
+    start_sidecar(port=sidecar_port)
+    start_background_warmup("127.0.0.1", port)
+
+    Starter.ignite(debug=False, host="0.0.0.0", port=port)
+
+
+def run_workers(num_workers: int = WORKERS, base_port: int = WORKER_BASE_PORT,
+                sidecar_base_port: int = WORKER_SIDECAR_BASE_PORT, maintenance_interval: float = 0) -> None:
+    """
+    Starts the writer and the workers and supervises them until SIGINT or SIGTERM.
+
+    Args:
+        num_workers: The number of worker processes.
+        base_port: The port of the first worker.
+        sidecar_base_port: The sidecar port of the first worker.
+        maintenance_interval: Seconds between maintenance runs, 0 to disable.
+    """
+    # Only fork shares the preloaded pages; spawn and forkserver start from scratch
+    context = multiprocessing.get_context("fork")
+    preload()
+
+    generations = context.Queue()
+    writer = context.Process(target=run_writer_process, args=(generations, maintenance_interval),
+                             name="memory-writer")
+    writer.start()
+
+    workers: Dict[int, multiprocessing.Process] = {}
+    started_at: Dict[int, float] = {}
+
+    def spawn(index: int) -> None:
+        port, sidecar_port = base_port + index, sidecar_base_port + index
+        process = context.Process(target=run_worker_process, args=(port, sidecar_port, generations),
+                                  name=f"worker-{index}")
+        process.start()
+        workers[index], started_at[index] = process, time.monotonic()
+        logger.info("[Workers] Worker %s (pid %s) on port %s, sidecar on %s.", index, process.pid, port, sidecar_port)
+
+    for index in range(num_workers):
+        spawn(index)
+
+    stopping = False
+
+    def request_stop(signum: int, frame: Optional[object]) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    while not stopping:
+        for index, process in list(workers.items()):
+            if not process.is_alive() and time.monotonic() - started_at[index] >= RESTART_BACKOFF:
+                logger.warning("[Workers] Worker %s exited with code %s, restarting.", index, process.exitcode)
+                spawn(index)
+        if not writer.is_alive():
+            logger.error("[Workers] Memory writer exited with code %s, shutting down.", writer.exitcode)
+            break
+        time.sleep(1)
+
+    logger.info("[Workers] Stopping %s workers.", len(workers))
+    for process in workers.values():
+        process.terminate()
+    for process in workers.values():
+        process.join(10)
+    if writer.is_alive():
+        stop_writer(writer, generations)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=max(WORKERS, 1))
+    parser.add_argument("--base-port", type=int, default=WORKER_BASE_PORT)
+    parser.add_argument("--sidecar-base-port", type=int, default=WORKER_SIDECAR_BASE_PORT)
+    args = parser.parse_args()
+
+    run_workers(args.workers, args.base_port, args.sidecar_base_port,
+                float(os.getenv("MEMORY_MAINTENANCE_INTERVAL", "0")))